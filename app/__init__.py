@@ -27,6 +27,18 @@ def create_app():
     login_manager.init_app(app)
     migrate.init_app(app, db)
 
+    # Contagem/tempo de SQL por request, Server-Timing e /admin/perf
+    from app.utils.perf import init_perf
+    init_perf(app)
+
+    # Métricas Prometheus em /metrics
+    from app.utils.metricas import init_metricas
+    init_metricas(app)
+
+    # Invalidação de caches/feeds após commit (OS, estoque, ponto, chamados)
+    from app.utils.invalidacao import init_invalidacao
+    init_invalidacao(app)
+
     # Inicializa Celery
     app.celery = make_celery(app)
 
@@ -2,11 +2,11 @@
 from app.models.models import Usuario, Unidade, RegistroPonto
 from app.models.estoque_models import CategoriaEstoque, Estoque, Equipamento, OrdemServico
 from app.models.terceirizados_models import Terceirizado, ChamadoExterno, HistoricoNotificacao
-from app.models.whatsapp_models import RegrasAutomacao, TokenAcesso, EstadoConversa, ConfiguracaoWhatsApp, MetricasWhatsApp
+from app.models.whatsapp_models import RegrasAutomacao, TokenAcesso, EstadoConversa, ConfiguracaoWhatsApp, MetricasWhatsApp, TemplateMensagem, NotificacaoDeadLetter
 
 __all__ = [
     'Usuario', 'Unidade', 'RegistroPonto',
     'CategoriaEstoque', 'Estoque', 'Equipamento', 'OrdemServico',
     'Terceirizado', 'ChamadoExterno', 'HistoricoNotificacao',
-    'RegrasAutomacao', 'TokenAcesso', 'EstadoConversa', 'ConfiguracaoWhatsApp', 'MetricasWhatsApp'
+    'RegrasAutomacao', 'TokenAcesso', 'EstadoConversa', 'ConfiguracaoWhatsApp', 'MetricasWhatsApp', 'TemplateMensagem', 'NotificacaoDeadLetter'
 ]
@@ -1,6 +1,8 @@
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import event
+from sqlalchemy import event, func, bindparam, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 from app.extensions import db
 from app.models.models import Usuario, Unidade
 
@@ -51,6 +53,10 @@ class OrdemServico(db.Model):
     descricao_solucao = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(20), default='aberta')
     prazo_conclusao = db.Column(db.DateTime, nullable=False)
+
+    # Derivadas de prioridade/status (ver sincronizar_ordenacao_os), para ordenar a fila do técnico pelo índice
+    prioridade_nivel = db.Column(db.SmallInteger, nullable=False, default=1, server_default='1')
+    encerrada = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
     
     # Mantemos JSON como legado ou backup, mas usaremos a tabela AnexosOS
     fotos_antes = db.Column(db.JSON, nullable=True)
@@ -67,13 +73,23 @@ class OrdemServico(db.Model):
     # [cite_start]NOVO RELACIONAMENTO (PRD 3.2.1) [cite: 1093-1103]
     anexos_list = db.relationship('AnexosOS', backref='os', lazy=True, cascade="all, delete-orphan")
 
-    @property
-    def custo_total(self):
-        total = Decimal('0.00')
-        for mov in self.movimentacoes:
-            if mov.tipo_movimentacao == 'consumo' and mov.estoque.valor_unitario:
-                total += (mov.quantidade * mov.estoque.valor_unitario)
-        return total
+    # custo_total: column_property calculada em SQL (definida após MovimentacaoEstoque)
+
+    __table_args__ = (
+        # Alertas de prazo (notificações / dashboard): OS ainda não concluídas por prazo
+        db.Index('ix_ordens_servico_nao_concluidas_prazo', 'prazo_conclusao',
+                 sqlite_where=db.text("status <> 'concluida'"),
+                 postgresql_where=db.text("status <> 'concluida'")),
+        db.Index('ix_ordens_servico_status_prazo', 'status', 'prazo_conclusao'),
+        # Produtividade por técnico e MTTR (status + período de conclusão)
+        db.Index('ix_ordens_servico_tecnico_status_conclusao', 'tecnico_id', 'status', 'data_conclusao'),
+        db.Index('ix_ordens_servico_status_conclusao', 'status', 'data_conclusao'),
+        # Listagens recentes e KPIs por período / unidade
+        db.Index('ix_ordens_servico_data_abertura', 'data_abertura'),
+        db.Index('ix_ordens_servico_unidade_abertura', 'unidade_id', 'data_abertura'),
+        # Fila do técnico: abertas primeiro, depois prioridade e mais recentes (paginação por cursor)
+        db.Index('ix_ordens_servico_tecnico_fila', tecnico_id, encerrada, prioridade_nivel.desc(), id.desc()),
+    )
 
 # [cite_start]NOVA TABELA (PRD 3.2.1) [cite: 1094]
 class AnexosOS(db.Model):
@@ -204,15 +220,139 @@ class MovimentacaoEstoque(db.Model):
     usuario = db.relationship('Usuario')
     unidade = db.relationship('Unidade')
 
-@event.listens_for(MovimentacaoEstoque, 'after_insert')
-def atualizar_saldo_estoque(mapper, connection, target):
-    tabela_estoque = Estoque.__table__
-    fator = 1
-    if target.tipo_movimentacao in ['consumo', 'saida']:
-        fator = -1
-    qtd_ajuste = target.quantidade * fator
-    connection.execute(
-        tabela_estoque.update()
-        .where(tabela_estoque.c.id == target.estoque_id)
-        .values(quantidade_atual=tabela_estoque.c.quantidade_atual + qtd_ajuste)
-    )
\ No newline at end of file
+# Custo das peças consumidas na OS, como subquery correlacionada.
+# Deferred: só é calculado quando acessado ou com .options(undefer(OrdemServico.custo_total)),
+# o que em listagens vira uma única query para todas as OS.
+OrdemServico.custo_total = db.column_property(
+    db.select(
+        func.coalesce(func.sum(MovimentacaoEstoque.quantidade * func.coalesce(Estoque.valor_unitario, 0)), 0)
+    ).select_from(MovimentacaoEstoque)
+    .join(Estoque, Estoque.id == MovimentacaoEstoque.estoque_id)
+    .where(
+        MovimentacaoEstoque.os_id == OrdemServico.id,
+        MovimentacaoEstoque.tipo_movimentacao == 'consumo'
+    )
+    .correlate_except(MovimentacaoEstoque, Estoque)
+    .scalar_subquery(),
+    deferred=True
+)
+
+NIVEIS_PRIORIDADE = {'baixa': 0, 'media': 1, 'alta': 2, 'urgente': 3}
+STATUS_OS_ENCERRADOS = ('concluida', 'cancelada')
+
+@event.listens_for(OrdemServico, 'before_insert')
+@event.listens_for(OrdemServico, 'before_update')
+def sincronizar_ordenacao_os(mapper, connection, target):
+    target.prioridade_nivel = NIVEIS_PRIORIDADE.get(target.prioridade or 'media', 1)
+    target.encerrada = (target.status or 'aberta') in STATUS_OS_ENCERRADOS
+
+# ---- Ledger de estoque ----
+# MovimentacaoEstoque é a fonte da verdade; Estoque.quantidade_atual (global) e
+# EstoqueSaldo.quantidade (por unidade) são projeções dela, atualizadas pelo
+# after_flush abaixo: um UPDATE em lote para o global e um upsert em lote por
+# unidade, por flush. Nenhum serviço altera esses saldos diretamente.
+
+TIPOS_SAIDA_ESTOQUE = ('consumo', 'saida')  # Baixam o saldo; os demais somam a quantidade (assinada, em ajustes)
+
+class SaldoInsuficienteError(ValueError):
+    """Consumo/saída deixaria o saldo da unidade negativo (transação desfeita)."""
+
+    def __init__(self, faltas):
+        self.faltas = faltas  # [(estoque_id, unidade_id, saldo_resultante)]
+        super().__init__("Saldo insuficiente: " + ", ".join(
+            f"item #{estoque_id} na unidade #{unidade_id} ({saldo})" for estoque_id, unidade_id, saldo in faltas
+        ))
+
+def quantidade_assinada():
+    """Expressão SQL da quantidade com o sinal do tipo de movimentação."""
+    return db.case(
+        (MovimentacaoEstoque.tipo_movimentacao.in_(TIPOS_SAIDA_ESTOQUE), -MovimentacaoEstoque.quantidade),
+        else_=MovimentacaoEstoque.quantidade
+    )
+
+def deltas_movimentacoes(movimentacoes):
+    """
+    Soma as movimentações (objetos ou dicts) em deltas:
+    ({estoque_id: delta}, {(estoque_id, unidade_id): delta}, {chaves que exigem saldo})
+    """
+    globais, por_unidade, exigir_saldo = {}, {}, set()
+    for mov in movimentacoes:
+        if not isinstance(mov, dict):
+            mov = {'estoque_id': mov.estoque_id, 'unidade_id': mov.unidade_id,
+                   'tipo_movimentacao': mov.tipo_movimentacao, 'quantidade': mov.quantidade}
+        saida = mov['tipo_movimentacao'] in TIPOS_SAIDA_ESTOQUE
+        quantidade = Decimal(str(mov['quantidade'])) * (-1 if saida else 1)
+        estoque_id, unidade_id = mov['estoque_id'], mov.get('unidade_id')
+        globais[estoque_id] = globais.get(estoque_id, 0) + quantidade
+        if unidade_id is not None:
+            por_unidade[(estoque_id, unidade_id)] = por_unidade.get((estoque_id, unidade_id), 0) + quantidade
+            if saida:
+                exigir_saldo.add((estoque_id, unidade_id))
+    return globais, por_unidade, exigir_saldo
+
+def aplicar_deltas(session, globais, por_unidade, exigir_saldo=()):
+    """
+    Aplica deltas às projeções em lote (chaves ordenadas, para evitar deadlock
+    entre transações concorrentes). Se algum saldo em exigir_saldo ficar
+    negativo, levanta SaldoInsuficienteError: no Postgres as linhas alteradas
+    ficam travadas até o fim da transação, então a verificação vale sob concorrência.
+    """
+    globais = {k: v for k, v in globais.items() if v}
+    por_unidade = {k: v for k, v in por_unidade.items() if v}
+
+    if globais:
+        tabela = Estoque.__table__
+        session.execute(
+            tabela.update()
+            .where(tabela.c.id == bindparam('b_id'))
+            .values(quantidade_atual=tabela.c.quantidade_atual + bindparam('b_delta', type_=tabela.c.quantidade_atual.type)),
+            [{'b_id': k, 'b_delta': v} for k, v in sorted(globais.items())]
+        )
+
+    if por_unidade:
+        tabela = EstoqueSaldo.__table__
+        linhas = [{'estoque_id': e, 'unidade_id': u, 'quantidade': q} for (e, u), q in sorted(por_unidade.items())]
+        insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(session.get_bind().dialect.name)
+        if insert is not None:
+            upsert = insert(tabela)
+            session.execute(upsert.on_conflict_do_update(
+                index_elements=['estoque_id', 'unidade_id'],
+                set_={'quantidade': tabela.c.quantidade + upsert.excluded.quantidade}
+            ), linhas)
+        else:
+            existentes = set(session.execute(
+                select(tabela.c.estoque_id, tabela.c.unidade_id)
+                .where(tuple_(tabela.c.estoque_id, tabela.c.unidade_id).in_(list(por_unidade)))
+            ).all())
+            novas = [l for l in linhas if (l['estoque_id'], l['unidade_id']) not in existentes]
+            if novas:
+                session.execute(tabela.insert(), [dict(l, quantidade=0) for l in novas])
+            session.execute(
+                tabela.update()
+                .where(tabela.c.estoque_id == bindparam('b_estoque'), tabela.c.unidade_id == bindparam('b_unidade'))
+                .values(quantidade=tabela.c.quantidade + bindparam('b_delta', type_=tabela.c.quantidade.type)),
+                [{'b_estoque': e, 'b_unidade': u, 'b_delta': q} for (e, u), q in sorted(por_unidade.items())]
+            )
+
+    verificar = [k for k in exigir_saldo if por_unidade.get(k, 0) < 0]
+    if verificar:
+        tabela = EstoqueSaldo.__table__
+        faltas = session.execute(
+            select(tabela.c.estoque_id, tabela.c.unidade_id, tabela.c.quantidade)
+            .where(tuple_(tabela.c.estoque_id, tabela.c.unidade_id).in_(verificar), tabela.c.quantidade < 0)
+        ).all()
+        if faltas:
+            raise SaldoInsuficienteError([tuple(f) for f in faltas])
+
+    # Objetos já carregados na sessão passam a ler o saldo projetado
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, Estoque) and obj.id in globais:
+            session.expire(obj, ['quantidade_atual'])
+        elif isinstance(obj, EstoqueSaldo) and (obj.estoque_id, obj.unidade_id) in por_unidade:
+            session.expire(obj, ['quantidade'])
+
+@event.listens_for(Session, 'after_flush')
+def projetar_saldos_estoque(session, flush_context):
+    movimentacoes = [obj for obj in session.new if isinstance(obj, MovimentacaoEstoque)]
+    if movimentacoes:
+        aplicar_deltas(session, *deltas_movimentacoes(movimentacoes))
\ No newline at end of file
@@ -79,3 +79,12 @@ class HistoricoNotificacao(db.Model):
     mensagem_hash = db.Column(db.String(64), index=True)
     prioridade = db.Column(db.Integer, default=0, index=True)
     criado_em = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Parcial: só as linhas ainda na fila (backlog de envio)
+        db.Index('ix_historico_notificacoes_pendentes', 'criado_em',
+                 sqlite_where=db.text("status_envio = 'pendente'"),
+                 postgresql_where=db.text("status_envio = 'pendente'")),
+        db.Index('ix_historico_notificacoes_direcao_criado', 'direcao', 'criado_em'),
+        db.Index('ix_historico_notificacoes_status_enviado', 'status_envio', 'enviado_em'),
+    )
@@ -79,3 +79,28 @@ class MetricasWhatsApp(db.Model):
     taxa_entrega = db.Column(db.Numeric(5, 2), default=0.0)
     tempo_medio_resposta = db.Column(db.Integer, default=0) # Segundos
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class TemplateMensagem(db.Model):
+    __tablename__ = 'whatsapp_templates'
+    id = db.Column(db.Integer, primary_key=True)
+    nome = db.Column(db.String(50), nullable=False, index=True) # novo_chamado, lembrete, cobranca
+    locale = db.Column(db.String(10), nullable=False, default='pt_BR')
+    conteudo = db.Column(db.Text, nullable=False) # Placeholders no formato {variavel}
+    ativo = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('nome', 'locale', name='uq_whatsapp_templates_nome_locale'),
+    )
+
+class NotificacaoDeadLetter(db.Model):
+    __tablename__ = 'whatsapp_dead_letter'
+    id = db.Column(db.Integer, primary_key=True)
+    notificacao_id = db.Column(db.Integer, db.ForeignKey('historico_notificacoes.id', ondelete='CASCADE'), nullable=False, index=True)
+    classe_erro = db.Column(db.String(30), nullable=False, index=True) # telefone_invalido, timeout, http_5xx...
+    erro = db.Column(db.Text) # Última resposta da API (JSON)
+    tentativas = db.Column(db.Integer, default=0)
+    criado_em = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    reprocessado_em = db.Column(db.DateTime, nullable=True, index=True) # NULL = aguardando re-drive
+
+    notificacao = db.relationship('HistoricoNotificacao', backref=db.backref('dead_letters', passive_deletes=True))
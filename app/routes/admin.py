@@ -1,6 +1,7 @@
+import codecs
 import csv
 import io
-from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, jsonify, Response
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort, jsonify, Response, current_app
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
 from app.models.models import Unidade, Usuario
@@ -8,6 +9,7 @@ from app.models.estoque_models import Equipamento, Fornecedor, CatalogoFornecedo
 from datetime import datetime
 from app.models.terceirizados_models import Terceirizado
 from app.services.estoque_service import EstoqueService
+from app.utils.ip_allowlist import ListaIPs
 from app.extensions import db
 from sqlalchemy import func
 
@@ -177,10 +179,17 @@ def novo_equipamento():
 @bp.route('/unidade/nova', methods=['POST'])
 @login_required
 def nova_unidade():
+    faixa_ip = request.form.get('faixa_ip', '')
+    try:
+        ListaIPs.compilar(faixa_ip, estrito=True)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.dashboard', tab='unidades'))
+
     nova_un = Unidade(
         nome=request.form.get('nome'),
         endereco=request.form.get('endereco'),
-        faixa_ip_permitida=request.form.get('faixa_ip'),
+        faixa_ip_permitida=faixa_ip,
         razao_social=request.form.get('razao_social'),
         cnpj=request.form.get('cnpj'),
         telefone=request.form.get('telefone')
@@ -486,27 +495,7 @@ def receber_pedido(id):
         pedido.data_chegada = agora # Data Real da Chegada
         pedido.recebedor_id = current_user.id
         
-        # 2. Atualiza Saldo Global (Estoque)
-        estoque = Estoque.query.get(pedido.estoque_id)
-        estoque.quantidade_atual += pedido.quantidade
-        
-        # 3. Atualiza Saldo por Unidade (EstoqueSaldo)
-        saldo_unidade = EstoqueSaldo.query.filter_by(
-            estoque_id=pedido.estoque_id, 
-            unidade_id=unidade_id
-        ).first()
-        
-        if not saldo_unidade:
-            saldo_unidade = EstoqueSaldo(
-                estoque_id=pedido.estoque_id,
-                unidade_id=unidade_id,
-                quantidade=pedido.quantidade
-            )
-            db.session.add(saldo_unidade)
-        else:
-            saldo_unidade.quantidade += pedido.quantidade
-            
-        # 4. Registra Movimentação (entrada)
+        # 2. Registra Movimentação (entrada): o ledger soma no saldo global e no da unidade
         mov = MovimentacaoEstoque(
             estoque_id=pedido.estoque_id,
             usuario_id=current_user.id,
@@ -518,7 +507,7 @@ def receber_pedido(id):
         )
         db.session.add(mov)
         
-        # 5. Atualiza Métricas do Fornecedor (Média Ponderada)
+        # 3. Atualiza Métricas do Fornecedor (Média Ponderada)
         forn = pedido.fornecedor
         if forn:
             total_envios = forn.total_pedidos_entregues or 0
@@ -647,4 +636,62 @@ def exportar_movimentacoes_csv():
         output.getvalue(),
         mimetype="text/csv",
         headers={"Content-disposition": f"attachment; filename=movimentacoes_{datetime.now().strftime('%Y%m%d')}.csv"}
-    )
\ No newline at end of file
+    )
+
+@bp.route('/perf')
+@login_required
+def perf():
+    """Últimos requests deste processo: queries, tempo de banco e suspeitas de N+1"""
+    from app.utils.perf import historico, resumo_por_endpoint
+    
+    return render_template('admin/perf.html',
+                         requests_recentes=historico(),
+                         resumo=resumo_por_endpoint(),
+                         limiar_lenta=current_app.config.get('SQL_SLOW_QUERY_MS', 200),
+                         limiar_n1=current_app.config.get('PERF_N_MAIS_1_LIMIAR', 5))
+
+@bp.route('/api/ponto/importar', methods=['POST'])
+@login_required
+def importar_ponto():
+    """
+    Importa registros de ponto de um CSV/JSONL (campo 'arquivo').
+    ?validar=1 só valida. Para arquivos muito grandes use o script importar_ponto.py.
+    """
+    from app.services.ponto_import_service import PontoImportService
+
+    arquivo = request.files.get('arquivo')
+    if not arquivo or not arquivo.filename:
+        return jsonify({'success': False, 'erro': 'Envie o arquivo no campo "arquivo".'}), 400
+
+    formato = 'jsonl' if arquivo.filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+    # TextIOWrapper exige readable(), que o SpooledTemporaryFile dos uploads
+    # grandes só tem a partir do Python 3.11; antes disso, StreamReader (só read())
+    if hasattr(arquivo.stream, 'readable'):
+        texto = io.TextIOWrapper(arquivo.stream, encoding='utf-8-sig', newline='')
+    else:
+        texto = codecs.getreader('utf-8-sig')(arquivo.stream)
+    fuso_horas = request.form.get('fuso_horas', type=int)
+    try:
+        resumo = PontoImportService.importar(
+            texto, formato=formato,
+            # Relógios/planilhas trazem hora local sem offset
+            fuso_horas=current_app.config['TIMESHEET_FUSO_HORAS'] if fuso_horas is None else fuso_horas,
+            validar_apenas=request.args.get('validar') == '1'
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'erro': str(e)}), 400
+
+    resumo['erros'] = [{'linha': linha, 'erro': erro} for linha, erro in resumo['erros']]
+    if resumo.get('interrompido'):
+        # Lotes anteriores já foram gravados: devolve o resumo parcial
+        sucesso = bool(resumo['importadas'])
+        return jsonify({'success': sucesso, 'erro': f"Importação interrompida: {resumo['interrompido']}", **resumo}), 200 if sucesso else 400
+    return jsonify({'success': True, **resumo})
+
+@bp.route('/api/estoque/reconciliar', methods=['POST'])
+@login_required
+def reconciliar_estoque():
+    """Confere os saldos contra o ledger de movimentações; ?reparar=1 corrige as divergências."""
+    relatorio = EstoqueService.reconciliar_saldos(reparar=request.args.get('reparar') == '1')
+    return jsonify({'success': True, **relatorio})
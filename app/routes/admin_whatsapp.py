@@ -49,6 +49,128 @@ def criar_regra():
         'id': regra.id
     })
 
+# --- Templates de Mensagem ---
+
+from app.models.whatsapp_models import TemplateMensagem
+from app.services.template_service import TemplateService
+
+@bp.route('/admin/whatsapp/templates', methods=['GET'])
+@login_required
+def listar_templates():
+    """Templates cadastrados no banco (os embutidos servem de fallback)"""
+    if current_user.tipo != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    templates = TemplateMensagem.query.order_by(TemplateMensagem.nome, TemplateMensagem.locale).all()
+    
+    return jsonify({
+        'templates': [{
+            'id': t.id,
+            'nome': t.nome,
+            'locale': t.locale,
+            'conteudo': t.conteudo,
+            'ativo': t.ativo
+        } for t in templates],
+        'embutidos': sorted(TemplateService.TEMPLATES.keys())
+    })
+
+@bp.route('/admin/whatsapp/templates', methods=['POST'])
+@login_required
+def salvar_template():
+    """Cria ou atualiza um template (nome + locale)"""
+    if current_user.tipo != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.json or {}
+    nome = data.get('nome')
+    conteudo = data.get('conteudo')
+    locale = data.get('locale') or TemplateService.LOCALE_PADRAO
+    
+    if not nome or not conteudo:
+        return jsonify({'error': 'Nome e conteúdo obrigatórios'}), 400
+    
+    # Valida placeholders antes de salvar: um template quebrado pararia os envios
+    try:
+        TemplateService.validar(nome, conteudo)
+    except ValueError as e:
+        return jsonify({'error': f'Template inválido: {e}'}), 400
+    
+    template = TemplateMensagem.query.filter_by(nome=nome, locale=locale).first()
+    if not template:
+        template = TemplateMensagem(nome=nome, locale=locale)
+        db.session.add(template)
+    
+    template.conteudo = conteudo
+    template.ativo = data.get('ativo', True)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'id': template.id
+    })
+
+# --- Dead-letter ---
+
+from app.services.dead_letter_service import DeadLetterService
+
+@bp.route('/admin/whatsapp/dead-letter', methods=['GET'])
+@login_required
+def listar_dead_letter():
+    """Notificações que esgotaram os retries, aguardando re-drive"""
+    if current_user.tipo != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    entradas = DeadLetterService.listar(
+        classe_erro=request.args.get('classe'),
+        limite=request.args.get('limite', 100, type=int)
+    )
+    
+    return jsonify({
+        'resumo': DeadLetterService.resumo(),
+        'itens': [{
+            'id': e.id,
+            'notificacao_id': e.notificacao_id,
+            'classe_erro': e.classe_erro,
+            'tentativas': e.tentativas,
+            'erro': e.erro,
+            'criado_em': e.criado_em.isoformat() if e.criado_em else None
+        } for e in entradas]
+    })
+
+@bp.route('/admin/whatsapp/dead-letter/reprocessar', methods=['POST'])
+@login_required
+def reprocessar_dead_letter():
+    """Re-drive em massa: {'ids': [...]} ou {'classe': 'http_5xx', 'limite': 200}"""
+    if current_user.tipo != 'admin':
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.json or {}
+    limite = data.get('limite')
+    if limite is not None:
+        try:
+            limite = int(limite)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'limite deve ser um número inteiro'}), 400
+        if limite < 1:
+            return jsonify({'error': 'limite deve ser maior que zero'}), 400
+        limite = min(limite, DeadLetterService.LIMITE_REDRIVE)
+    
+    ids = data.get('ids')
+    if ids is not None and not isinstance(ids, list):
+        return jsonify({'error': 'ids deve ser uma lista'}), 400
+    
+    resultado = DeadLetterService.reprocessar(
+        ids=ids,
+        classe_erro=data.get('classe'),
+        limite=limite
+    )
+    
+    return jsonify({
+        'success': True,
+        'reprocessadas': resultado['reprocessadas'],
+        'reenfileiradas': len(resultado['notificacoes'])
+    })
+
 # --- Dashboard & Métricas ---
 
 from datetime import datetime, timedelta
@@ -56,6 +178,8 @@ from app.models.whatsapp_models import ConfiguracaoWhatsApp
 from app.models.terceirizados_models import HistoricoNotificacao
 from app.services.circuit_breaker import CircuitBreaker
 from app.services.rate_limiter import RateLimiter
+from app.services.filas_service import FilaService
+from app.services.backlog_service import BacklogService
 
 @bp.route('/admin/whatsapp/dashboard')
 @login_required
@@ -92,13 +216,15 @@ def dashboard():
     # Rate Limit
     pode_enviar, restantes = RateLimiter.check_limit()
     
-    # Mensagens pendentes
-    pendentes = HistoricoNotificacao.query.filter_by(
-        status_envio='pendente'
-    ).count()
+    # Mensagens pendentes (contador mantido nas transições de status)
+    pendentes = BacklogService.pendentes()
+    
+    # Profundidade por faixa de envio (urgente, normal, lote)
+    filas = FilaService.profundidades()
     
     return render_template('admin/whatsapp_dashboard.html',
         config=config,
+        filas=filas,
         total_enviadas=total_enviadas,
         total_entregues=total_entregues,
         taxa_entrega=round(taxa_entrega, 1),
@@ -87,6 +87,27 @@ def api_tecnico_logs_diarios(usuario_id):
     data = AnalyticsService.get_daily_logs(usuario_id, start_date, end_date)
     return jsonify(data)
 
+@bp.route('/api/ponto/folha')
+@login_required
+def api_folha_ponto():
+    """Folha mensal da equipe inteira (?mes=AAAA-MM&unidade_id=)."""
+    from app.services.timesheet_service import TimesheetService
+
+    if current_user.tipo not in ['admin', 'gerente', 'comprador']:
+        return jsonify({'success': False, 'erro': 'Acesso negado'}), 403
+
+    unidade_id = request.args.get('unidade_id', type=int)
+    if current_user.tipo == 'gerente':
+        # Gerente só vê a folha da própria unidade
+        unidade_id = current_user.unidade_padrao_id
+    mes_str = request.args.get('mes')
+    try:
+        referencia = datetime.strptime(mes_str, '%Y-%m') if mes_str else datetime.utcnow()
+    except ValueError:
+        return jsonify({'success': False, 'erro': 'mes deve estar no formato AAAA-MM'}), 400
+
+    return jsonify(TimesheetService.folha_equipe(referencia.year, referencia.month, unidade_id))
+
 @bp.route('/api/export/csv')
 @login_required
 def export_csv():
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, abort
 from flask_login import login_required
 from app.models.estoque_models import Equipamento, OrdemServico, MovimentacaoEstoque
 from sqlalchemy import desc
+from sqlalchemy.orm import joinedload
 
 bp = Blueprint('equipamentos', __name__, url_prefix='/equipamentos')
 
@@ -29,6 +30,7 @@ def detalhes(id):
     
     # 2. Peças Trocadas (Via Movimentações ligadas às OSs do equipamento)
     pecas_trocadas = MovimentacaoEstoque.query.join(OrdemServico)\
+        .options(joinedload(MovimentacaoEstoque.estoque))\
         .filter(OrdemServico.equipamento_id == id, MovimentacaoEstoque.tipo_movimentacao == 'consumo')\
         .order_by(MovimentacaoEstoque.data_movimentacao.desc()).all()
     
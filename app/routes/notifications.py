@@ -1,56 +1,71 @@
-from flask import Blueprint, jsonify
-from flask_login import login_required, current_user
-from app.models.estoque_models import OrdemServico, Estoque
-from datetime import datetime, timedelta
+from flask import Blueprint, jsonify, Response, current_app
+from flask_login import login_required
+import json
+import time
+import redis
 from app.extensions import db
+from app.services.feed_alertas_service import FeedAlertasService
 
 bp = Blueprint('notifications', __name__, url_prefix='/api')
 
 @bp.route('/notifications', methods=['GET'])
 @login_required
 def get_notifications():
-    alerts = []
-    
-    # 1. OSs Vencidas ou Vencendo Hoje/Amanhã
-    # Consideramos "Urgente" se vencer em menos de 24h ou já venceu
-    agora = datetime.utcnow()
-    limite_urgencia = agora + timedelta(hours=24)
-    
-    oss_pendentes = OrdemServico.query.filter(
-        OrdemServico.status != 'concluida',
-        OrdemServico.prazo_conclusao <= limite_urgencia
-    ).all()
-    
-    for os in oss_pendentes:
-        delta = os.prazo_conclusao - agora
-        if delta.total_seconds() < 0:
-            msg = f"OS #{os.numero_os} está ATRASADA!"
-            tipo = "urgent"
-        else:
-            horas = int(delta.total_seconds() // 3600)
-            msg = f"OS #{os.numero_os} vence em {horas}h"
-            tipo = "warning"
-            
-        alerts.append({
-            "type": tipo,
-            "message": msg,
-            "url": f"/os/{os.id}/detalhes",
-            "timestamp": os.prazo_conclusao.isoformat()
-        })
-
-    # 2. Estoque Baixo
-    # Itens onde qtd_atual <= qtd_minima
-    itens_baixo = Estoque.query.filter(Estoque.quantidade_atual <= Estoque.quantidade_minima).limit(10).all()
-    
-    for item in itens_baixo:
-        alerts.append({
-            "type": "warning",
-            "message": f"Estoque baixo: {item.nome} ({item.quantidade_atual} {item.unidade_medida})",
-            "url": "/os/painel-estoque",
-            "timestamp": datetime.utcnow().isoformat()
-        })
-
-    return jsonify({
-        "count": len(alerts),
-        "alerts": alerts
+    # Snapshot compartilhado (Redis), recalculado só quando OS/estoque mudam.
+    # Mantido para clientes sem EventSource; o navegador usa /notifications/stream.
+    return jsonify(FeedAlertasService.formatar(FeedAlertasService.snapshot()))
+
+def _evento_sse(payload, evento='alertas'):
+    return f"event: {evento}\ndata: {json.dumps(payload)}\n\n"
+
+@bp.route('/notifications/stream', methods=['GET'])
+@login_required
+def stream_notifications():
+    """
+    Server-Sent Events: envia o feed atual e depois cada recálculo publicado
+    no Redis. A conexão é encerrada após SSE_MAX_SEGUNDOS (o EventSource
+    reconecta sozinho) para não prender um worker indefinidamente.
+    """
+    duracao_max = current_app.config.get('SSE_MAX_SEGUNDOS', 300)
+    heartbeat = current_app.config.get('SSE_HEARTBEAT_SEGUNDOS', 15)
+    links = FeedAlertasService.links()
+    inicial = FeedAlertasService.formatar(FeedAlertasService.snapshot(), links=links)
+
+    try:
+        pubsub = FeedAlertasService._get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(FeedAlertasService.CANAL)
+    except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+        current_app.logger.warning("Redis Unavailable: SSE de alertas em modo de consulta periódica.")
+        pubsub = None
+
+    logger = current_app.logger
+
+    def gerar():
+        # Sem Redis: entrega o feed e pede reconexão em 60s (vira polling espaçado)
+        yield f"retry: {5000 if pubsub else 60000}\n"
+        yield _evento_sse(inicial)
+        if pubsub is None:
+            return
+
+        fim = time.monotonic() + duracao_max
+        try:
+            while time.monotonic() < fim:
+                mensagem = pubsub.get_message(timeout=heartbeat)
+                if mensagem is None:
+                    yield ": heartbeat\n\n"
+                    continue
+                if mensagem.get('type') != 'message':
+                    continue
+                yield _evento_sse(FeedAlertasService.formatar(json.loads(mensagem['data']), links=links))
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError) as e:
+            logger.warning(f"Redis Unavailable: SSE de alertas encerrado ({e}).")
+        finally:
+            pubsub.close()
+
+    # O gerador não usa contexto nem banco: devolve a conexão (user_loader,
+    # snapshot sem Redis) ao pool em vez de prendê-la durante todo o stream
+    db.session.remove()
+    return Response(gerar(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # nginx: não bufferizar o stream
     })
@@ -1,13 +1,15 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from datetime import datetime
+from sqlalchemy import or_
+from sqlalchemy.orm import joinedload, selectinload, load_only, undefer
 from app.extensions import db
 from app.models.models import Unidade, Usuario
 from app.models.estoque_models import OrdemServico, Estoque, CategoriaEstoque, Equipamento, AnexosOS, PedidoCompra, EstoqueSaldo, MovimentacaoEstoque
 from app.models.terceirizados_models import Terceirizado, ChamadoExterno
 from app.services.os_service import OSService
 from app.services.estoque_service import EstoqueService
-from app.services.whatsapp_service import WhatsAppService # [Novo] Import
+from app.services.notification_service import NotificationService
 
 bp = Blueprint('os', __name__, url_prefix='/os')
 
@@ -60,25 +62,33 @@ def nova_os():
 @bp.route('/<int:id>', methods=['GET'])
 @login_required
 def detalhes(id):
-    os_obj = OrdemServico.query.get_or_404(id)
-    categorias = CategoriaEstoque.query.all()
+    # Tudo que o template percorre vem em poucas queries fixas (sem lazy load por linha)
+    os_obj = OrdemServico.query.options(
+        joinedload(OrdemServico.unidade),
+        joinedload(OrdemServico.tecnico),
+        joinedload(OrdemServico.equipamento_rel),
+        selectinload(OrdemServico.movimentacoes).joinedload(MovimentacaoEstoque.estoque),
+        selectinload(OrdemServico.chamados_externos).joinedload(ChamadoExterno.terceirizado),
+        undefer(OrdemServico.custo_total)
+    ).filter_by(id=id).first_or_404()
     
-    # Carregar todas as peças para o modal de solicitação
-    todas_pecas = Estoque.query.order_by(Estoque.nome).all()
+    # Peças não são mais enviadas na página: o modal usa o typeahead /os/api/pecas/buscar
     
     # Filtra terceirizados: Globais (abrangencia_global=True) OU que atendam a Unidade da OS
-    terceirizados = Terceirizado.query.filter(
+    terceirizados = Terceirizado.query.options(
+        load_only(Terceirizado.id, Terceirizado.nome, Terceirizado.especialidades)
+    ).filter(
         (Terceirizado.abrangencia_global == True) | 
         (Terceirizado.unidades.any(id=os_obj.unidade_id))
     ).filter_by(ativo=True).order_by(Terceirizado.nome).all()
 
     # [Novo] Carrega usuários para o select de notificação na transferência
-    usuarios = Usuario.query.filter_by(ativo=True).order_by(Usuario.nome).all()
+    usuarios = Usuario.query.options(
+        load_only(Usuario.id, Usuario.nome, Usuario.tipo)
+    ).filter_by(ativo=True).order_by(Usuario.nome).all()
     
     return render_template('os_detalhes.html', 
                          os=os_obj, 
-                         categorias=categorias,
-                         todas_pecas=todas_pecas,
                          terceirizados=terceirizados,
                          usuarios=usuarios)
 
@@ -119,7 +129,7 @@ def adicionar_peca(id):
             quantidade=data['quantidade'],
             usuario_id=current_user.id
         )
-        os_obj = OrdemServico.query.get(id)
+        custo_total = db.session.query(OrdemServico.custo_total).filter_by(id=id).scalar() or 0
         
         msg = "Peça adicionada."
         if alerta_minimo:
@@ -128,7 +138,7 @@ def adicionar_peca(id):
         return jsonify({
             'success': True, 
             'novo_estoque': float(novo_saldo), 
-            'custo_total_os': float(os_obj.custo_total),
+            'custo_total_os': float(custo_total),
             'mensagem': msg,
             'alerta': alerta_minimo
         })
@@ -252,6 +262,34 @@ def entrada_estoque():
     except Exception as e:
         return jsonify({'success': False, 'erro': f"Erro interno: {str(e)}"}), 500
 
+@bp.route('/api/estoque/lote', methods=['POST'])
+@login_required
+def movimentar_estoque_lote():
+    """
+    Movimentação em lote (inventário/recebimentos): {"itens": [...], "unidade_id": 1, "parcial": false}.
+    Ver EstoqueService.movimentar_lote para o formato das linhas.
+    """
+    if current_user.tipo not in ['admin', 'gerente', 'comprador']:
+         return jsonify({'success': False, 'erro': 'Acesso negado'}), 403
+
+    data = request.get_json(silent=True) or {}
+    itens = data.get('itens')
+    if not isinstance(itens, list):
+        return jsonify({'success': False, 'erro': 'Informe a lista "itens".'}), 400
+
+    try:
+        resumo = EstoqueService.movimentar_lote(
+            itens,
+            usuario_id=current_user.id,
+            unidade_id=data.get('unidade_id'),
+            parcial=bool(data.get('parcial'))
+        )
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'erro': str(e)}), 400
+
+    return jsonify({'success': resumo['aplicado'], **resumo}), 200 if resumo['aplicado'] else 400
+
 # [NOVA ROTA] Upload de Anexos em OS Aberta
 @bp.route('/<int:id>/anexos', methods=['POST'])
 @login_required
@@ -307,9 +345,14 @@ def disponibilidade_estoque(id):
 @bp.route('/api/pecas/buscar')
 @login_required
 def buscar_pecas():
-    termo = request.args.get('q', '')
+    termo = request.args.get('q', '').strip()
     if len(termo) < 2: return jsonify([])
-    pecas = Estoque.query.filter(Estoque.nome.ilike(f'%{termo}%')).limit(10).all()
+    limite = min(request.args.get('limite', 10, type=int), 30)
+    pecas = Estoque.query.options(
+        load_only(Estoque.id, Estoque.nome, Estoque.unidade_medida, Estoque.quantidade_atual)
+    ).filter(
+        or_(Estoque.nome.ilike(f'%{termo}%'), Estoque.codigo.ilike(f'{termo}%'))
+    ).order_by(Estoque.nome).limit(limite).all()
     return jsonify([{'id': p.id, 'nome': p.nome, 'unidade': p.unidade_medida, 'saldo': float(p.quantidade_atual)} for p in pecas])
 
 @bp.route('/estoque/painel')
@@ -414,7 +457,11 @@ def solicitar_transferencia():
                        f"Solicitante: {current_user.nome}\n"
                        f"Status: {solicitacao.status.upper()}")
 
-                WhatsAppService.enviar_mensagem(responsavel.telefone, msg)
+                NotificationService.enqueue(
+                    destinatario=responsavel.telefone,
+                    mensagem=msg,
+                    tipo='transferencia'
+                )
         
         msg = 'Transferência realizada com sucesso!' if solicitacao.status == 'concluida' else 'Solicitação criada'
         return jsonify({'success': True, 'msg': msg})
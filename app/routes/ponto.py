@@ -1,8 +1,9 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
 from app.extensions import db
-from app.models.models import Unidade, RegistroPonto
-from app.models.estoque_models import OrdemServico, Estoque
+from app.models.models import RegistroPonto
+from app.services.dashboard_cache_service import DashboardCacheService
+from app.services.os_service import OSService
 from app.utils.decorators import require_unit_ip
 from datetime import datetime, timedelta
 
@@ -11,43 +12,26 @@ bp = Blueprint('ponto', __name__, url_prefix='/dashboard')
 @bp.route('/')
 @login_required
 def index():
-    unidades = Unidade.query.filter_by(ativa=True).all()
-    registro_aberto = RegistroPonto.query.filter_by(
-        usuario_id=current_user.id, 
-        data_hora_saida=None
-    ).first()
-    
-    if current_user.tipo == 'tecnico':
-        minhas_os = OrdemServico.query.filter_by(tecnico_id=current_user.id).order_by(OrdemServico.prioridade.desc()).all()
-    else:
-        minhas_os = OrdemServico.query.order_by(OrdemServico.data_abertura.desc()).limit(20).all()
+    # Fragmentos do painel vêm do cache (Redis), invalidado por commits em OS/ponto/estoque
+    painel = DashboardCacheService.obter(current_user)
+    return render_template('dashboard.html', **painel)
 
-    # --- Lógica de Alertas (Notificações) ---
-    alertas_os = []
-    alertas_estoque = []
-    
-    # 1. OSs Vencendo (Prazo < 24h) ou Atrasadas
-    if current_user.tipo != 'tecnico': # Remove filtro se quiser que todos vejam
-        agora = datetime.utcnow()
-        limite_critico = agora + timedelta(hours=24)
-        
-        alertas_os = OrdemServico.query.filter(
-            OrdemServico.status == 'aberta',
-            OrdemServico.prazo_conclusao != None,
-            OrdemServico.prazo_conclusao <= limite_critico
-        ).order_by(OrdemServico.prazo_conclusao).limit(5).all()
-        
-        # 2. Estoque Baixo
-        alertas_estoque = Estoque.query.filter(
-            Estoque.quantidade_atual <= Estoque.quantidade_minima
-        ).limit(5).all()
+@bp.route('/minhas-os', methods=['GET'])
+@login_required
+def minhas_os():
+    """Próximas páginas da fila do técnico (cursor devolvido pela página anterior)."""
+    limite = min(request.args.get('limite', 20, type=int), 50)
+    try:
+        ordens, proximo = OSService.fila_tecnico(current_user.id, request.args.get('cursor'), limite)
+    except ValueError as e:
+        return jsonify({'success': False, 'erro': str(e)}), 400
 
-    return render_template('dashboard.html', 
-                         unidades=unidades, 
-                         registro_aberto=registro_aberto,
-                         minhas_os=minhas_os,
-                         alertas_os=alertas_os,
-                         alertas_estoque=alertas_estoque)
+    itens = []
+    for o in ordens:
+        item = OSService.item_listagem(o)
+        item['url'] = url_for('os.detalhes', id=o.id)
+        itens.append(item)
+    return jsonify({'success': True, 'itens': itens, 'proximo_cursor': proximo})
 
 @bp.route('/checkin', methods=['POST'])
 @login_required
@@ -4,7 +4,7 @@ from datetime import datetime
 from app.extensions import db
 from app.models.terceirizados_models import Terceirizado, ChamadoExterno, HistoricoNotificacao
 from app.models.estoque_models import OrdemServico
-from app.tasks import enviar_whatsapp_task
+from app.services.notification_service import NotificationService
 
 bp = Blueprint('terceirizados', __name__, url_prefix='/terceirizados')
 
@@ -89,20 +89,13 @@ def criar_chamado():
                    f"{detalhes_os}\n"
                    f"📝 *Descrição:*\n{novo_chamado.descricao}")
             
-            # Registra no Histórico
-            notif = HistoricoNotificacao(
-                chamado_id=novo_chamado.id,
-                tipo='criacao',
+            # Registra no Histórico e envia assíncrono
+            NotificationService.enqueue(
                 destinatario=terceirizado.telefone,
                 mensagem=msg,
-                status_envio='pendente',
-                direcao='outbound'
+                chamado_id=novo_chamado.id,
+                tipo='criacao'
             )
-            db.session.add(notif)
-            db.session.commit()
-            
-            # Envia assíncrono
-            enviar_whatsapp_task.delay(notif.id)
             flash('Chamado criado e notificação enviada.', 'success')
         else:
             flash('Chamado criado com sucesso.', 'success')
@@ -143,19 +136,13 @@ def cobrar_terceirizado(id):
            f"Título: {chamado.titulo}\n"
            f"Previsão de conclusão?")
     
-    notif = HistoricoNotificacao(
-        chamado_id=chamado.id,
-        tipo='cobranca',
-        destinatario=chamado.terceirizado.telefone,
-        mensagem=msg,
-        status_envio='pendente',
-        direcao='outbound'
-    )
-    db.session.add(notif)
-    db.session.commit()
-    
     try:
-        enviar_whatsapp_task.delay(notif.id)
+        NotificationService.enqueue(
+            destinatario=chamado.terceirizado.telefone,
+            mensagem=msg,
+            chamado_id=chamado.id,
+            tipo='cobranca'
+        )
         return jsonify({'success': True, 'msg': 'Cobrança enviada com sucesso!'})
     except Exception as e:
         return jsonify({'success': False, 'msg': f'Erro ao enviar: {str(e)}'}), 500
@@ -173,19 +160,13 @@ def responder_manual(id):
         return jsonify({'success': False, 'msg': 'Mensagem vazia.'}), 400
 
     try:
-        notif = HistoricoNotificacao(
-            chamado_id=chamado.id,
-            tipo='manual_outbound',
-            remetente=current_user.nome,
+        NotificationService.enqueue(
             destinatario=chamado.terceirizado.telefone,
             mensagem=mensagem,
-            status_envio='pendente',
-            direcao='outbound'
+            chamado_id=chamado.id,
+            tipo='manual_outbound',
+            remetente=current_user.nome
         )
-        db.session.add(notif)
-        db.session.commit()
-        
-        enviar_whatsapp_task.delay(notif.id)
         
         return jsonify({
             'success': True, 
@@ -6,6 +6,7 @@ from flask import Blueprint, request, jsonify, current_app
 from app.extensions import db
 from app.models.terceirizados_models import HistoricoNotificacao
 from app.tasks.whatsapp_tasks import processar_mensagem_inbound
+from app.services.filas_service import FilaService
 
 bp = Blueprint('webhook', __name__)
 logger = logging.getLogger(__name__)
@@ -106,6 +107,10 @@ def webhook_whatsapp():
 
     # 4. Processar assincronamente
     # We pass the heavy lifting to Celery
-    processar_mensagem_inbound.delay(remetente, texto, timestamp)
+    # Fila particionada por remetente: mesmo telefone -> mesma fila -> ordem preservada
+    processar_mensagem_inbound.apply_async(
+        args=[remetente, texto, timestamp],
+        queue=FilaService.fila_inbound(remetente)
+    )
     
     return jsonify({'success': True, 'processed_at': datetime.utcnow().isoformat()})
@@ -1,13 +1,12 @@
-import hashlib
 import secrets
 from datetime import datetime, timedelta
 from flask import Blueprint, jsonify, request, render_template, current_app
 from flask_login import login_required, current_user
 from app.extensions import db
-from app.models.terceirizados_models import ChamadoExterno, HistoricoNotificacao
+from app.models.terceirizados_models import ChamadoExterno
 from app.models.whatsapp_models import TokenAcesso
 from app.services.template_service import TemplateService
-from app.tasks.whatsapp_tasks import enviar_whatsapp_task
+from app.services.notification_service import NotificationService
 
 bp = Blueprint('whatsapp', __name__)
 
@@ -43,34 +42,29 @@ def notificar_terceirizado(id):
     chamado = ChamadoExterno.query.get_or_404(id)
     
     # Renderizar mensagem usando o TemplateService
-    mensagem = TemplateService.render('novo_chamado',
-        numero_chamado=chamado.numero_chamado,
-        titulo=chamado.titulo,
-        prazo=chamado.prazo_combinado.strftime('%d/%m %H:%M'),
-        descricao=chamado.descricao,
-        link_aceite=gerar_link_aceite(chamado)
-    )
+    try:
+        mensagem = TemplateService.render('novo_chamado',
+            numero_chamado=chamado.numero_chamado,
+            titulo=chamado.titulo,
+            prazo=chamado.prazo_combinado.strftime('%d/%m %H:%M'),
+            descricao=chamado.descricao,
+            link_aceite=gerar_link_aceite(chamado)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    # Criar registro de notificação
-    notif = HistoricoNotificacao(
-        chamado_id=chamado.id,
-        tipo='criacao',
+    # Criar registro de notificação e enfileirar envio assíncrono
+    notificacao_id = NotificationService.enqueue(
         destinatario=chamado.terceirizado.telefone,
         mensagem=mensagem,
-        mensagem_hash=hashlib.sha256(mensagem.encode()).hexdigest(),
-        status_envio='pendente',
-        direcao='outbound'
+        chamado_id=chamado.id,
+        tipo='criacao'
     )
-    db.session.add(notif)
-    db.session.commit()
-    
-    # Enfileirar envio assíncrono
-    enviar_whatsapp_task.delay(notif.id)
     
     return jsonify({
         'success': True, 
         'message': 'Notificação enfileirada com sucesso',
-        'notificacao_id': notif.id
+        'notificacao_id': notificacao_id
     })
 
 @bp.route('/api/link/<token>')
@@ -0,0 +1,191 @@
+import json
+import time
+import redis
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from app.models.estoque_models import OrdemServico
+from app.models.terceirizados_models import ChamadoExterno
+from app.utils.invalidacao import ao_alterar
+
+class AgendaPrazosService:
+    """
+    Agenda de prazos (timer wheel) de OS e chamados externos no Redis.
+    - prazos:agenda (ZSET): membros "<tipo>:<id>:<fase>" com score = instante
+      do evento. 'aviso' = entrada na janela de alerta, 'atraso' = prazo vencido.
+    - prazos:estado:<tipo> (HASH): id -> {prazo, fase, numero} dos itens em aberto.
+    Mantida após o commit de criação/edição (hooks de invalidação) e
+    reconstruída diariamente. processar() retira da agenda os eventos vencidos:
+    o ZREM garante que cada evento seja emitido uma única vez, mesmo com vários
+    workers. Os alertas (feed, dashboard) leem o estado em vez de varrer as tabelas.
+    """
+
+    AGENDA = 'prazos:agenda'
+    ESTADO = 'prazos:estado:{}'
+    CONSTRUIDA = 'prazos:construida'
+    FASES = ('agendado', 'aviso', 'atraso')
+
+    # tipo -> (model, coluna do número, coluna do prazo, status encerrados, config da janela em horas)
+    TIPOS = {
+        'os': (OrdemServico, 'numero_os', 'prazo_conclusao', ('concluida', 'cancelada'), 'PRAZO_AVISO_OS_HORAS'),
+        'chamado': (ChamadoExterno, 'numero_chamado', 'prazo_combinado', ('concluido', 'cancelado'), 'PRAZO_AVISO_CHAMADO_HORAS'),
+    }
+
+    @staticmethod
+    def _get_redis():
+        return redis.from_url(current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+
+    @staticmethod
+    def _janela(tipo) -> timedelta:
+        chave = AgendaPrazosService.TIPOS[tipo][4]
+        return timedelta(hours=current_app.config.get(chave, 24 if tipo == 'os' else 48))
+
+    @staticmethod
+    def _epoch(data: datetime) -> float:
+        # Prazos são gravados em UTC sem timezone
+        return data.replace(tzinfo=timezone.utc).timestamp()
+
+    @staticmethod
+    def _carregar(tipo, ids=None):
+        """Itens em aberto (id, número, prazo). ids=None carrega todos."""
+        model, col_numero, col_prazo, encerrados, _ = AgendaPrazosService.TIPOS[tipo]
+        query = model.query.with_entities(
+            model.id, getattr(model, col_numero), getattr(model, col_prazo)
+        ).filter(model.status.notin_(encerrados), getattr(model, col_prazo) != None)
+        if ids is not None:
+            query = query.filter(model.id.in_(ids))
+        return {linha[0]: (linha[1], linha[2]) for linha in query.all()}
+
+    @staticmethod
+    def _agendar(pipe, tipo, item_id, numero, prazo, fase):
+        """Grava o estado e agenda os eventos ainda não emitidos para o item."""
+        pipe.hset(AgendaPrazosService.ESTADO.format(tipo), item_id, json.dumps({
+            'prazo': prazo.isoformat(), 'fase': fase, 'numero': numero
+        }))
+        if fase == 'agendado':
+            pipe.zadd(AgendaPrazosService.AGENDA, {
+                f"{tipo}:{item_id}:aviso": AgendaPrazosService._epoch(prazo - AgendaPrazosService._janela(tipo))
+            })
+        if fase in ('agendado', 'aviso'):
+            pipe.zadd(AgendaPrazosService.AGENDA, {
+                f"{tipo}:{item_id}:atraso": AgendaPrazosService._epoch(prazo)
+            })
+
+    @staticmethod
+    def _desagendar(pipe, tipo, item_id):
+        pipe.zrem(AgendaPrazosService.AGENDA, f"{tipo}:{item_id}:aviso", f"{tipo}:{item_id}:atraso")
+
+    @staticmethod
+    def sincronizar(tipo, ids) -> int:
+        """
+        Atualiza a agenda dos itens criados/editados/removidos.
+        Prazo inalterado preserva a fase (não reemite eventos); prazo novo recomeça.
+        Retorna quantos itens mudaram de fase.
+        """
+        ids = [i for i in ids if i is not None]
+        if not ids:
+            return 0
+        abertos = AgendaPrazosService._carregar(tipo, ids)
+        r = AgendaPrazosService._get_redis()
+        anteriores = r.hmget(AgendaPrazosService.ESTADO.format(tipo), ids)
+
+        mudancas = 0
+        pipe = r.pipeline()
+        for item_id, anterior in zip(ids, anteriores):
+            anterior = json.loads(anterior) if anterior else None
+            AgendaPrazosService._desagendar(pipe, tipo, item_id)
+            if item_id not in abertos:
+                pipe.hdel(AgendaPrazosService.ESTADO.format(tipo), item_id)
+                if anterior and anterior['fase'] != 'agendado':
+                    mudancas += 1
+                continue
+
+            numero, prazo = abertos[item_id]
+            fase = 'agendado'
+            if anterior and anterior['prazo'] == prazo.isoformat():
+                fase = anterior['fase']
+            elif anterior and anterior['fase'] != 'agendado':
+                mudancas += 1
+            AgendaPrazosService._agendar(pipe, tipo, item_id, numero, prazo, fase)
+        pipe.execute()
+        return mudancas
+
+    @staticmethod
+    def reconstruir() -> dict:
+        """Regrava a agenda inteira a partir do banco, preservando fases já emitidas."""
+        r = AgendaPrazosService._get_redis()
+        totais = {}
+        for tipo in AgendaPrazosService.TIPOS:
+            abertos = AgendaPrazosService._carregar(tipo)
+            chave = AgendaPrazosService.ESTADO.format(tipo)
+            anteriores = {int(k): json.loads(v) for k, v in r.hgetall(chave).items()}
+
+            pipe = r.pipeline()
+            for item_id in set(anteriores) - set(abertos):
+                AgendaPrazosService._desagendar(pipe, tipo, item_id)
+                pipe.hdel(chave, item_id)
+            for item_id, (numero, prazo) in abertos.items():
+                anterior = anteriores.get(item_id)
+                fase = anterior['fase'] if anterior and anterior['prazo'] == prazo.isoformat() else 'agendado'
+                AgendaPrazosService._desagendar(pipe, tipo, item_id)
+                AgendaPrazosService._agendar(pipe, tipo, item_id, numero, prazo, fase)
+            pipe.execute()
+            totais[tipo] = len(abertos)
+
+        r.set(AgendaPrazosService.CONSTRUIDA, datetime.utcnow().isoformat())
+        return totais
+
+    @staticmethod
+    def processar(limite: int = 500) -> list:
+        """
+        Emite os eventos vencidos. Retorna [(tipo, id, fase)] dos que este
+        processo removeu da agenda (os demais já foram emitidos por outro worker).
+        """
+        r = AgendaPrazosService._get_redis()
+        vencidos = r.zrangebyscore(AgendaPrazosService.AGENDA, '-inf', time.time(), start=0, num=limite)
+
+        eventos = []
+        for membro in vencidos:
+            if not r.zrem(AgendaPrazosService.AGENDA, membro):
+                continue
+            tipo, item_id, fase = membro.decode().split(':')
+            chave = AgendaPrazosService.ESTADO.format(tipo)
+            estado = r.hget(chave, item_id)
+            if estado is None:
+                continue
+            estado = json.loads(estado)
+            # Fase só avança (o 'aviso' pode chegar depois do 'atraso' se o prazo foi encurtado)
+            if AgendaPrazosService.FASES.index(fase) <= AgendaPrazosService.FASES.index(estado['fase']):
+                continue
+            estado['fase'] = fase
+            r.hset(chave, item_id, json.dumps(estado))
+            eventos.append((tipo, int(item_id), fase))
+        return eventos
+
+    @staticmethod
+    def em_alerta(tipo) -> list:
+        """
+        Itens na janela de aviso ou atrasados, por prazo: [{id, numero, prazo, fase}].
+        None se a agenda ainda não foi construída ou o Redis está fora (chamador consulta o banco).
+        """
+        try:
+            r = AgendaPrazosService._get_redis()
+            if not r.exists(AgendaPrazosService.CONSTRUIDA):
+                return None
+            itens = []
+            for item_id, estado in r.hgetall(AgendaPrazosService.ESTADO.format(tipo)).items():
+                estado = json.loads(estado)
+                if estado['fase'] != 'agendado':
+                    itens.append({'id': int(item_id), **estado})
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: agenda de prazos indisponível, consultando o banco.")
+            return None
+        return sorted(itens, key=lambda item: item['prazo'])
+
+@ao_alterar('os', 'chamado')
+def _sincronizar_agenda(alteracoes):
+    from app.tasks.system_tasks import sincronizar_prazos_task
+    if any(None in ids for ids in alteracoes.values()):
+        # Alteração em massa sem ids: reconstrói tudo
+        sincronizar_prazos_task.delay(None)
+    else:
+        sincronizar_prazos_task.delay({tipo: sorted(ids) for tipo, ids in alteracoes.items()})
@@ -6,6 +6,7 @@ from app.extensions import db
 from app.models.terceirizados_models import HistoricoNotificacao
 from app.models.whatsapp_models import ConfiguracaoWhatsApp
 from app.services.circuit_breaker import CircuitBreaker
+from app.services.backlog_service import BacklogService
 
 logger = logging.getLogger(__name__)
 
@@ -55,10 +56,8 @@ class AlertaService:
             })
         
         # 3. Queue Size
-        # 'pendente' status
-        pendentes = HistoricoNotificacao.query.filter_by(
-            status_envio='pendente'
-        ).count()
+        # Contador de 'pendente' mantido pelo NotificationService/enviar_whatsapp_task
+        pendentes = BacklogService.pendentes()
         
         if pendentes > 100:
             alertas.append({
@@ -5,6 +5,7 @@ from app.extensions import db
 from app.models.models import Usuario, Unidade, RegistroPonto
 from app.models.estoque_models import OrdemServico, MovimentacaoEstoque, Estoque, EstoqueSaldo
 from app.models.terceirizados_models import ChamadoExterno
+from app.services.timesheet_service import TimesheetService
 
 class AnalyticsService:
     @staticmethod
@@ -147,28 +148,19 @@ class AnalyticsService:
 
     @staticmethod
     def get_daily_logs(usuario_id, start_date, end_date):
-        registros = RegistroPonto.query.filter(
-            RegistroPonto.usuario_id == usuario_id,
-            RegistroPonto.data_hora_entrada >= start_date,
-            RegistroPonto.data_hora_entrada <= end_date
-        ).order_by(RegistroPonto.data_hora_entrada.desc()).all()
-        
-        result = []
-        for r in registros:
-            total_horas = 0
-            if r.data_hora_saida:
-                diff = r.data_hora_saida - r.data_hora_entrada
-                total_horas = diff.total_seconds() / 3600
-                
-            result.append({
-                'data': r.data_hora_entrada.strftime('%d/%m/%Y'),
-                'entrada': r.data_hora_entrada.strftime('%H:%M'),
-                'saida': r.data_hora_saida.strftime('%H:%M') if r.data_hora_saida else '--:--',
-                'total_horas': round(total_horas, 2),
-                'status': 'normal' if 7.8 <= total_horas <= 8.5 else ('insuficiente' if total_horas < 7.8 else 'extra')
-            })
-            
-        return result
+        """Um registro por dia trabalhado (end_date exclusivo), mais recente primeiro."""
+        dias = TimesheetService.periodo(
+            start_date.date(), (end_date - timedelta(microseconds=1)).date(), usuario_ids=[usuario_id]
+        )
+        return [{
+            'data': datetime.strptime(d['dia'], '%Y-%m-%d').strftime('%d/%m/%Y'),
+            'entrada': d['entrada'],
+            'saida': d['saida'] or '--:--',
+            'registros': d['registros'],
+            'total_horas': d['horas'],
+            'horas_extra': d['horas_extra'],
+            'status': d['status']
+        } for d in reversed(dias)]
 
     @staticmethod
     def get_stock_metrics(unidade_id=None):
@@ -0,0 +1,195 @@
+import os
+import gzip
+import json
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import literal_column
+from app.extensions import db
+from app.models.terceirizados_models import HistoricoNotificacao
+from app.models.whatsapp_models import NotificacaoDeadLetter
+
+class ArquivoService:
+    """
+    Arquivamento frio do historico_notificacoes.
+    Linhas antigas (e que já saíram de 'pendente') são movidas em lotes para
+    arquivos JSONL comprimidos, um por mês de criação:
+        <ARQUIVO_HISTORICO_DIR>/historico_notificacoes_AAAA-MM.jsonl.gz
+    A tabela quente fica restrita à janela recente usada pelos health checks;
+    `consultar(..., incluir_arquivo=True)` é o único caminho que lê o arquivo.
+    """
+
+    PREFIXO = 'historico_notificacoes_'
+    EXTENSAO = '.jsonl.gz'
+    LOTE = 1000
+
+    COLUNAS = (
+        'id', 'chamado_id', 'tipo', 'remetente', 'destinatario', 'mensagem',
+        'status_envio', 'resposta_api', 'tentativas', 'enviado_em', 'direcao',
+        'mensagem_hash', 'prioridade', 'criado_em'
+    )
+    COLUNAS_DATA = ('enviado_em', 'criado_em')
+
+    @staticmethod
+    def diretorio() -> str:
+        caminho = current_app.config.get('ARQUIVO_HISTORICO_DIR') or os.path.join(current_app.instance_path, 'arquivo_historico')
+        os.makedirs(caminho, exist_ok=True)
+        return caminho
+
+    @staticmethod
+    def limite_retencao(dias: int = None) -> datetime:
+        dias = dias if dias is not None else int(current_app.config.get('ARQUIVO_HISTORICO_DIAS', 90))
+        return datetime.utcnow() - timedelta(days=dias)
+
+    @staticmethod
+    def _caminho_mes(mes: str) -> str:
+        return os.path.join(ArquivoService.diretorio(), f"{ArquivoService.PREFIXO}{mes}{ArquivoService.EXTENSAO}")
+
+    @staticmethod
+    def _serializar(registro) -> dict:
+        linha = {}
+        for coluna in ArquivoService.COLUNAS:
+            valor = getattr(registro, coluna)
+            linha[coluna] = valor.isoformat() if isinstance(valor, datetime) else valor
+        return linha
+
+    @staticmethod
+    def _desserializar(linha: dict) -> dict:
+        for coluna in ArquivoService.COLUNAS_DATA:
+            if linha.get(coluna):
+                linha[coluna] = datetime.fromisoformat(linha[coluna])
+        linha['arquivado'] = True
+        return linha
+
+    @staticmethod
+    def _gravar(por_mes: dict):
+        """
+        Acrescenta um membro gzip por mês (gzip.open lê membros concatenados).
+        Grava e sincroniza em disco antes de qualquer DELETE no banco.
+        """
+        for mes, linhas in por_mes.items():
+            with open(ArquivoService._caminho_mes(mes), 'ab') as bruto:
+                with gzip.GzipFile(fileobj=bruto, mode='ab') as arquivo:
+                    for linha in linhas:
+                        arquivo.write((json.dumps(linha, ensure_ascii=False) + '\n').encode('utf-8'))
+                bruto.flush()
+                os.fsync(bruto.fileno())
+
+    @staticmethod
+    def arquivar(dias: int = None, lote: int = None, max_lotes: int = None) -> dict:
+        """
+        Move para o arquivo as notificações criadas antes da retenção.
+        Trabalha em lotes curtos (uma transação por lote) para não segurar
+        locks na tabela quente. Retorna {'arquivadas', 'lotes', 'limite'}.
+        """
+        limite = ArquivoService.limite_retencao(dias)
+        lote = lote or ArquivoService.LOTE
+        total = 0
+        lotes = 0
+
+        while max_lotes is None or lotes < max_lotes:
+            registros = HistoricoNotificacao.query.filter(
+                HistoricoNotificacao.criado_em < limite,
+                # Nunca arquiva o que ainda está na fila de envio
+                HistoricoNotificacao.status_envio != literal_column("'pendente'"),
+                # ...nem falhas aguardando re-drive na dead-letter
+                ~HistoricoNotificacao.dead_letters.any(NotificacaoDeadLetter.reprocessado_em.is_(None))
+            ).order_by(HistoricoNotificacao.id).limit(lote).all()
+
+            if not registros:
+                break
+
+            por_mes = {}
+            for registro in registros:
+                mes = (registro.criado_em or limite).strftime('%Y-%m')
+                por_mes.setdefault(mes, []).append(ArquivoService._serializar(registro))
+
+            ids = [r.id for r in registros]
+            try:
+                ArquivoService._gravar(por_mes)
+                HistoricoNotificacao.query.filter(
+                    HistoricoNotificacao.id.in_(ids)
+                ).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception:
+                # Se o arquivo já foi gravado, a próxima execução regrava o lote;
+                # a leitura descarta IDs repetidos.
+                db.session.rollback()
+                raise
+
+            total += len(ids)
+            lotes += 1
+            db.session.expunge_all()
+
+        current_app.logger.info(f"Arquivamento de notificações: {total} linhas em {lotes} lotes (antes de {limite:%Y-%m-%d}).")
+        return {'arquivadas': total, 'lotes': lotes, 'limite': limite.isoformat()}
+
+    @staticmethod
+    def meses_arquivados() -> list:
+        meses = []
+        for nome in os.listdir(ArquivoService.diretorio()):
+            if nome.startswith(ArquivoService.PREFIXO) and nome.endswith(ArquivoService.EXTENSAO):
+                meses.append(nome[len(ArquivoService.PREFIXO):-len(ArquivoService.EXTENSAO)])
+        return sorted(meses)
+
+    @staticmethod
+    def _ler_arquivo(inicio: datetime = None, fim: datetime = None, filtros: dict = None, ignorar: set = None):
+        """Gera as linhas arquivadas do período, abrindo só os meses envolvidos."""
+        mes_inicio = inicio.strftime('%Y-%m') if inicio else None
+        mes_fim = fim.strftime('%Y-%m') if fim else None
+        vistos = set(ignorar or ())
+
+        for mes in ArquivoService.meses_arquivados():
+            if (mes_inicio and mes < mes_inicio) or (mes_fim and mes > mes_fim):
+                continue
+            with gzip.open(ArquivoService._caminho_mes(mes), 'rt', encoding='utf-8') as arquivo:
+                for texto in arquivo:
+                    linha = json.loads(texto)
+                    if linha['id'] in vistos:
+                        continue
+                    vistos.add(linha['id'])
+                    if filtros and any(linha.get(campo) != valor for campo, valor in filtros.items()):
+                        continue
+                    linha = ArquivoService._desserializar(linha)
+                    criado = linha.get('criado_em')
+                    if inicio and (criado is None or criado < inicio):
+                        continue
+                    if fim and (criado is None or criado >= fim):
+                        continue
+                    yield linha
+
+    @staticmethod
+    def consultar(inicio: datetime = None, fim: datetime = None, incluir_arquivo: bool = False, limite: int = None, **filtros) -> list:
+        """
+        Histórico de notificações como dicts, mais recentes primeiro.
+        `filtros` são igualdades em colunas (destinatario, remetente, chamado_id, tipo...).
+        Por padrão lê apenas a tabela quente; com `incluir_arquivo=True` também
+        percorre os meses arquivados que cruzam [inicio, fim).
+        """
+        for campo in filtros:
+            if campo not in ArquivoService.COLUNAS:
+                raise ValueError(f"Filtro inválido: {campo}")
+
+        query = HistoricoNotificacao.query.filter_by(**filtros)
+        if inicio:
+            query = query.filter(HistoricoNotificacao.criado_em >= inicio)
+        if fim:
+            query = query.filter(HistoricoNotificacao.criado_em < fim)
+        query = query.order_by(HistoricoNotificacao.criado_em.desc())
+        if limite and not incluir_arquivo:
+            query = query.limit(limite)
+
+        resultado = [dict(ArquivoService._serializar(r), arquivado=False) for r in query.all()]
+        for linha in resultado:
+            for coluna in ArquivoService.COLUNAS_DATA:
+                if linha[coluna]:
+                    linha[coluna] = datetime.fromisoformat(linha[coluna])
+
+        if incluir_arquivo:
+            # Ignora IDs ainda presentes na tabela quente (lote regravado após falha)
+            quentes = {linha['id'] for linha in resultado}
+            resultado.extend(ArquivoService._ler_arquivo(inicio, fim, filtros, quentes))
+            resultado.sort(key=lambda l: l.get('criado_em') or datetime.min, reverse=True)
+            if limite:
+                resultado = resultado[:limite]
+
+        return resultado
@@ -0,0 +1,69 @@
+import redis
+from flask import current_app
+from sqlalchemy import func, literal_column
+from app.extensions import db
+from app.models.terceirizados_models import HistoricoNotificacao
+
+class BacklogService:
+    """
+    Contador atômico (Redis) de notificações com status 'pendente'.
+    Atualizado nas transições de estado (NotificationService ao criar,
+    enviar_whatsapp_task ao sair de 'pendente'), para que health check e
+    dashboard leiam a fila em O(1) em vez de COUNT(*) no histórico.
+    """
+
+    CHAVE = 'whatsapp:backlog:pendentes'
+
+    @staticmethod
+    def _get_redis():
+        return redis.from_url(current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+
+    @staticmethod
+    def incrementar(n: int = 1):
+        if n <= 0:
+            return
+        try:
+            BacklogService._get_redis().incrby(BacklogService.CHAVE, n)
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: contador de pendentes não incrementado (reconciliação corrige).")
+
+    @staticmethod
+    def decrementar(n: int = 1):
+        if n <= 0:
+            return
+        try:
+            BacklogService._get_redis().decrby(BacklogService.CHAVE, n)
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: contador de pendentes não decrementado (reconciliação corrige).")
+
+    @staticmethod
+    def contar_no_banco() -> int:
+        """
+        COUNT usando o índice parcial ix_historico_notificacoes_pendentes.
+        O literal (e não um bind param) permite ao SQLite casar o WHERE do índice parcial.
+        """
+        return db.session.query(func.count(HistoricoNotificacao.id)).filter(
+            HistoricoNotificacao.status_envio == literal_column("'pendente'")
+        ).scalar() or 0
+
+    @staticmethod
+    def pendentes() -> int:
+        """Tamanho atual da fila. Sem contador no Redis, recalcula pelo índice."""
+        try:
+            valor = BacklogService._get_redis().get(BacklogService.CHAVE)
+            if valor is not None:
+                return max(0, int(valor))
+            return BacklogService.reconciliar()
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: contando pendentes direto no banco.")
+            return BacklogService.contar_no_banco()
+
+    @staticmethod
+    def reconciliar() -> int:
+        """Regrava o contador com o valor real (corrige deriva após falhas do Redis)."""
+        total = BacklogService.contar_no_banco()
+        try:
+            BacklogService._get_redis().set(BacklogService.CHAVE, total)
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: contador de pendentes não reconciliado.")
+        return total
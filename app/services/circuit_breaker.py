@@ -1,4 +1,6 @@
+import os
 import time
+import threading
 import redis
 from flask import current_app
 
@@ -6,77 +8,237 @@ class CircuitBreaker:
     """
     Implements Circuit Breaker pattern with 3 states:
     - CLOSED: Normal operation
-    - OPEN: Blocked after multiple failures
-    - HALF_OPEN: Testing recovery after timeout
+    - OPEN: Blocked after too many failures in the rolling window
+    - HALF_OPEN: Testing recovery after timeout (at most MAX_PROBES sends)
+
+    The state lives in Redis and is cached per process for CACHE_TTL seconds.
+    Transitions are published on CHANNEL; a background subscriber refreshes
+    the local cache right away, so healthy sends do not read Redis.
     """
-    
+
     STATES = ['CLOSED', 'OPEN', 'HALF_OPEN']
-    THRESHOLD = 5
+    THRESHOLD = 5  # Minimum failures in the window before opening
+    FAILURE_RATE = 0.5  # ...and minimum failure rate
     TIMEOUT = 600 # 10 minutes in seconds
 
+    # Rolling window: WINDOW seconds split into buckets of BUCKET seconds
+    WINDOW = 60
+    BUCKET = 10
+
+    # Half-open: probes admitted per recovery attempt; a probe that never
+    # reports back frees its slot after PROBE_TTL
+    MAX_PROBES = 3
+    PROBE_TTL = 30
+
+    CACHE_TTL = 5
+    CHANNEL = 'whatsapp:cb:events'
+
+    KEY_STATE = 'whatsapp:cb:state'
+    KEY_OPENED_AT = 'whatsapp:cb:opened_at'
+
+    # Per-process state: {'state', 'opened_at', 'expires'}
+    _cache = {'state': None, 'opened_at': None, 'expires': 0.0}
+    _subscriber = {'pid': None, 'thread': None}
+    _lock = threading.Lock()
+
     @staticmethod
     def _get_redis():
         return redis.from_url(current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
 
+    # ---- local cache / pub-sub ----
+
+    @staticmethod
+    def _cache_set(state: str, opened_at: float = None):
+        CircuitBreaker._cache = {
+            'state': state,
+            'opened_at': opened_at,
+            'expires': time.monotonic() + CircuitBreaker.CACHE_TTL
+        }
+
+    @staticmethod
+    def _publish(r, state: str, opened_at: float = None):
+        CircuitBreaker._cache_set(state, opened_at)
+        r.publish(CircuitBreaker.CHANNEL, f"{state}|{opened_at or ''}")
+
+    @staticmethod
+    def _listen(url: str):
+        """Subscriber thread body: applies published transitions to the cache."""
+        while True:
+            try:
+                pubsub = redis.from_url(url).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CircuitBreaker.CHANNEL)
+                for message in pubsub.listen():
+                    state, _, opened_at = message['data'].decode('utf-8').partition('|')
+                    if state in CircuitBreaker.STATES:
+                        CircuitBreaker._cache_set(state, float(opened_at) if opened_at else None)
+            except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+                # Until reconnected, the cache TTL bounds staleness
+                time.sleep(CircuitBreaker.CACHE_TTL)
+
+    @staticmethod
+    def _ensure_subscriber():
+        """Starts the subscriber once per process (again after a fork)."""
+        if CircuitBreaker._subscriber['pid'] == os.getpid():
+            return
+        with CircuitBreaker._lock:
+            if CircuitBreaker._subscriber['pid'] == os.getpid():
+                return
+            url = current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+            thread = threading.Thread(target=CircuitBreaker._listen, args=(url,), name='circuit-breaker-sub', daemon=True)
+            thread.start()
+            CircuitBreaker._subscriber = {'pid': os.getpid(), 'thread': thread}
+
+    # ---- state ----
+
+    @staticmethod
+    def _load_state(r):
+        """Reads the state from Redis, handling automatic transition to HALF_OPEN"""
+        state, opened_at = r.mget(CircuitBreaker.KEY_STATE, CircuitBreaker.KEY_OPENED_AT)
+        state = state.decode('utf-8') if state else 'CLOSED'
+        opened_at = float(opened_at) if opened_at else None
+
+        # Missing opened_at (expired key) must not leave the circuit open forever
+        if state == 'OPEN' and (not opened_at or (time.time() - opened_at) >= CircuitBreaker.TIMEOUT):
+            # Only one process performs (and announces) the transition
+            if r.set(f"whatsapp:cb:half_open:{opened_at}", 1, nx=True, ex=CircuitBreaker.TIMEOUT):
+                r.set(CircuitBreaker.KEY_STATE, 'HALF_OPEN')
+                CircuitBreaker._publish(r, 'HALF_OPEN', opened_at)
+            state = 'HALF_OPEN'
+
+        CircuitBreaker._cache_set(state, opened_at)
+        return state, opened_at
+
+    @staticmethod
+    def _current():
+        """(state, opened_at) from the local cache, reloading from Redis when stale."""
+        cache = CircuitBreaker._cache
+        if cache['state'] and cache['expires'] > time.monotonic():
+            recovering = (
+                cache['state'] == 'OPEN' and cache['opened_at']
+                and (time.time() - cache['opened_at']) >= CircuitBreaker.TIMEOUT
+            )
+            if not recovering:
+                return cache['state'], cache['opened_at']
+
+        CircuitBreaker._ensure_subscriber()
+        return CircuitBreaker._load_state(CircuitBreaker._get_redis())
+
     @staticmethod
     def get_state() -> str:
-        """Retrieves current state from Redis, handling automatic transition to HALF_OPEN"""
+        """Current state (cached in-process for up to CACHE_TTL seconds)"""
         try:
-            r = CircuitBreaker._get_redis()
-            state = r.get('whatsapp:cb:state')
-            
-            if not state:
-                return 'CLOSED'
-            
-            state = state.decode('utf-8')
-            
-            if state == 'OPEN':
-                opened_at = r.get('whatsapp:cb:opened_at')
-                if opened_at and (time.time() - float(opened_at)) >= CircuitBreaker.TIMEOUT:
-                    # Transition to HALF_OPEN automatically after timeout
-                    r.set('whatsapp:cb:state', 'HALF_OPEN')
-                    return 'HALF_OPEN'
-            
-            return state
+            return CircuitBreaker._current()[0]
         except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
             current_app.logger.warning("Redis Unavailable: returning default CLOSED state for CircuitBreaker.")
+            CircuitBreaker._cache_set('CLOSED')
             return 'CLOSED'
 
+    # ---- rolling window ----
+
+    @staticmethod
+    def _bucket_keys(now: float = None):
+        now = now or time.time()
+        current = int(now // CircuitBreaker.BUCKET)
+        count = CircuitBreaker.WINDOW // CircuitBreaker.BUCKET
+        return [f"whatsapp:cb:window:{current - i}" for i in range(count)]
+
+    @staticmethod
+    def _count(r, field: str):
+        """Increments ok/fail in the current bucket (one round trip)."""
+        key = CircuitBreaker._bucket_keys()[0]
+        pipe = r.pipeline()
+        pipe.hincrby(key, field, 1)
+        pipe.expire(key, CircuitBreaker.WINDOW + CircuitBreaker.BUCKET)
+        pipe.execute()
+
+    @staticmethod
+    def window_stats() -> dict:
+        """Successes/failures over the rolling window (for dashboards and the open decision)."""
+        r = CircuitBreaker._get_redis()
+        pipe = r.pipeline()
+        for key in CircuitBreaker._bucket_keys():
+            pipe.hmget(key, 'ok', 'fail')
+        ok = fail = 0
+        for bucket_ok, bucket_fail in pipe.execute():
+            ok += int(bucket_ok or 0)
+            fail += int(bucket_fail or 0)
+        total = ok + fail
+        return {'ok': ok, 'fail': fail, 'rate': (fail / total) if total else 0.0}
+
+    @staticmethod
+    def _open(r, reason: str):
+        opened_at = time.time()
+        pipe = r.pipeline()
+        pipe.set(CircuitBreaker.KEY_STATE, 'OPEN')
+        pipe.set(CircuitBreaker.KEY_OPENED_AT, opened_at, ex=CircuitBreaker.TIMEOUT * 2)
+        pipe.execute()
+        CircuitBreaker._publish(r, 'OPEN', opened_at)
+        # Log critical event
+        current_app.logger.critical(f"WhatsApp Circuit Breaker is now OPEN ({reason}).")
+
+    @staticmethod
+    def _close(r):
+        pipe = r.pipeline()
+        pipe.set(CircuitBreaker.KEY_STATE, 'CLOSED')
+        pipe.delete(CircuitBreaker.KEY_OPENED_AT, *CircuitBreaker._bucket_keys())
+        pipe.execute()
+        CircuitBreaker._publish(r, 'CLOSED')
+        current_app.logger.info("WhatsApp Circuit Breaker is now CLOSED (probe succeeded).")
+
+    # ---- public API ----
+
     @staticmethod
     def record_success():
-        """Resets failures and returns state to CLOSED"""
+        """Counts a success; a successful half-open probe closes the circuit"""
         try:
+            state, _ = CircuitBreaker._current()
             r = CircuitBreaker._get_redis()
-            r.set('whatsapp:cb:state', 'CLOSED')
-            r.delete('whatsapp:cb:failures')
-            r.delete('whatsapp:cb:opened_at')
+            if state == 'HALF_OPEN':
+                CircuitBreaker._close(r)
+            else:
+                CircuitBreaker._count(r, 'ok')
         except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
              current_app.logger.warning("Redis Unavailable: could not record success in CircuitBreaker.")
 
     @staticmethod
     def record_failure():
-        """Increments failure count and opens circuit if threshold reached"""
+        """Counts a failure and opens the circuit when the window crosses the thresholds"""
         try:
+            state, _ = CircuitBreaker._current()
             r = CircuitBreaker._get_redis()
-            failures = r.incr('whatsapp:cb:failures')
-            
-            # Set expiry for failure counter if first failure
-            if failures == 1:
-                r.expire('whatsapp:cb:failures', 300) # 5 minutes TTL
-                
-            if failures >= CircuitBreaker.THRESHOLD:
-                r.set('whatsapp:cb:state', 'OPEN')
-                r.set('whatsapp:cb:opened_at', time.time())
-                r.expire('whatsapp:cb:opened_at', CircuitBreaker.TIMEOUT + 60) # Buffer
-                # Log critical event
-                current_app.logger.critical("WhatsApp Circuit Breaker is now OPEN (Threshold reached).")
+            if state == 'HALF_OPEN':
+                CircuitBreaker._open(r, 'half-open probe failed')
+                return
+            if state == 'OPEN':
+                return
+
+            CircuitBreaker._count(r, 'fail')
+            stats = CircuitBreaker.window_stats()
+            if stats['fail'] >= CircuitBreaker.THRESHOLD and stats['rate'] >= CircuitBreaker.FAILURE_RATE:
+                CircuitBreaker._open(r, f"{stats['fail']} failures, {stats['rate']:.0%} in {CircuitBreaker.WINDOW}s")
         except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
              current_app.logger.warning("Redis Unavailable: could not record failure in CircuitBreaker.")
 
+    @staticmethod
+    def _admit_probe(opened_at: float) -> bool:
+        """Reserves one of the MAX_PROBES half-open slots for this recovery attempt."""
+        r = CircuitBreaker._get_redis()
+        key = f"whatsapp:cb:probes:{opened_at}"
+        admitted = r.incr(key)
+        if admitted == 1:
+            r.expire(key, CircuitBreaker.PROBE_TTL)
+        return admitted <= CircuitBreaker.MAX_PROBES
+
     @staticmethod
     def should_attempt() -> bool:
         """Returns True if request should be attempted based on circuit state"""
-        state = CircuitBreaker.get_state()
-        if state == 'OPEN':
-            return False
-        return True
+        try:
+            state, opened_at = CircuitBreaker._current()
+            if state == 'CLOSED':
+                return True
+            if state == 'OPEN':
+                return False
+            return CircuitBreaker._admit_probe(opened_at)
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: CircuitBreaker allowing traffic by default.")
+            return True
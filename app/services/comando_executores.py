@@ -13,13 +13,20 @@ from app.models.estoque_models import Estoque
 # I will verify file structure after this if needed. For now, implement assuming it matches recent work.
 
 from app.models.terceirizados_models import Terceirizado, ChamadoExterno
+from app.services.comando_parser import ComandoParser
 
 class ComandoExecutores:
     """
     Executes business logic for WhatsApp commands.
+    Each executor declares its grammar via ComandoParser.registrar.
     """
     
     @staticmethod
+    @ComandoParser.registrar(
+        'COMPRA',
+        r'#COMPRA\s+(?P<item>[A-Z0-9\-]+)\s+(?P<quantidade>\d+\.?\d*)',
+        conversores={'quantidade': float}
+    )
     def executar_compra(params: dict, solicitante: Terceirizado) -> dict:
         """
         Creates a purchase request (stubbed for now if model missing).
@@ -55,7 +62,8 @@ class ComandoExecutores:
             }
     
     @staticmethod
-    def executar_status(solicitante: Terceirizado) -> dict:
+    @ComandoParser.registrar('STATUS', r'#STATUS')
+    def executar_status(params: dict, solicitante: Terceirizado) -> dict:
         """
         Lists active tickets for the requester.
         """
@@ -82,7 +90,8 @@ class ComandoExecutores:
         }
     
     @staticmethod
-    def executar_ajuda() -> dict:
+    @ComandoParser.registrar('AJUDA', r'#AJUDA')
+    def executar_ajuda(params: dict = None, solicitante: Terceirizado = None) -> dict:
         """
         Returns the help menu.
         """
@@ -3,20 +3,58 @@ import re
 class ComandoParser:
     """
     Parses structured commands from text messages.
+    Commands are declared with their grammar and executor together through
+    ComandoParser.registrar (see comando_executores.py). All grammars are
+    combined into a single compiled pattern, so dispatch is one match
+    regardless of how many commands exist.
     Supports:
     - #COMPRA [CODE] [QUANTITY]
     - #STATUS
     - #AJUDA
     """
-    
-    COMANDOS = {
-        '#COMPRA': r'#COMPRA\s+([A-Z0-9\-]+)\s+(\d+\.?\d*)',
-        '#STATUS': r'#STATUS',
-        '#AJUDA': r'#AJUDA'
-    }
-    
-    @staticmethod
-    def parse(texto: str) -> dict:
+
+    # nome -> {'padrao', 'executor', 'conversores'}; ordem de registro = ordem de tentativa
+    COMANDOS = {}
+
+    _regex = None
+    _GRUPO_PARAM = re.compile(r'\(\?P<(\w+)>')
+    _SEPARADOR = '__'
+
+    @classmethod
+    def registrar(cls, nome: str, padrao: str, conversores: dict = None):
+        """
+        Decorator that registers an executor for a command.
+        `padrao` may use named groups (?P<param>...) that become params;
+        `conversores` maps param names to callables (e.g. {'quantidade': float}).
+        Executors receive (params, solicitante).
+        """
+        def decorator(executor):
+            cls.COMANDOS[nome] = {
+                'padrao': padrao,
+                'executor': executor,
+                'conversores': conversores or {}
+            }
+            cls._regex = None  # Recompila no próximo parse
+            return executor
+        return decorator
+
+    @classmethod
+    def _compilar(cls):
+        """
+        Builds ^(?:(?P<COMPRA>...)|(?P<STATUS>...)|...) with param groups
+        prefixed by the command name so group names stay unique.
+        """
+        alternativas = []
+        for nome, cmd in cls.COMANDOS.items():
+            padrao = cls._GRUPO_PARAM.sub(
+                lambda m: f"(?P<{nome}{cls._SEPARADOR}{m.group(1)}>", cmd['padrao']
+            )
+            alternativas.append(f"(?P<{nome}>{padrao})")
+        cls._regex = re.compile('(?:' + '|'.join(alternativas) + ')') if alternativas else None
+        return cls._regex
+
+    @classmethod
+    def parse(cls, texto: str) -> dict:
         """
         Parses the text and returns a dictionary with the command and parameters.
         Returns None if no command is found.
@@ -29,25 +67,38 @@ class ComandoParser:
         """
         if not texto:
             return None
-            
+
+        regex = cls._regex or cls._compilar()
+        if regex is None:
+            return None
+
         texto = texto.strip().upper()
-        
-        for cmd, pattern in ComandoParser.COMANDOS.items():
-            match = re.match(pattern, texto)
-            if match:
-                resultado = {
-                    'comando': cmd.replace('#', ''),
-                    'texto_original': texto
-                }
-                
-                if cmd == '#COMPRA':
-                    resultado['params'] = {
-                        'item': match.group(1),
-                        'quantidade': float(match.group(2))
-                    }
-                else:
-                    resultado['params'] = {}
-                
-                return resultado
-        
-        return None
+        match = regex.match(texto)
+        if not match:
+            return None
+
+        # O grupo externo do comando é o último a fechar
+        nome = match.lastgroup
+        cmd = cls.COMANDOS[nome]
+        prefixo = nome + cls._SEPARADOR
+
+        params = {}
+        for grupo, valor in match.groupdict().items():
+            if valor is not None and grupo.startswith(prefixo):
+                param = grupo[len(prefixo):]
+                conversor = cmd['conversores'].get(param)
+                params[param] = conversor(valor) if conversor else valor
+
+        return {
+            'comando': nome,
+            'params': params,
+            'texto_original': texto
+        }
+
+    @classmethod
+    def executar(cls, comando: dict, solicitante) -> dict:
+        """Runs the executor registered for a parsed command."""
+        cmd = cls.COMANDOS.get(comando['comando'])
+        if not cmd:
+            return {'sucesso': False, 'resposta': 'Comando desconhecido.'}
+        return cmd['executor'](comando['params'], solicitante)
@@ -0,0 +1,172 @@
+import json
+import redis
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from flask import current_app
+from sqlalchemy.orm import joinedload
+from app.models.models import Unidade, RegistroPonto
+from app.models.estoque_models import OrdemServico, Estoque
+from app.services.agenda_prazos_service import AgendaPrazosService
+from app.services.os_service import OSService
+from app.utils.invalidacao import ao_alterar
+
+class DashboardCacheService:
+    """
+    Cache do painel (ponto.index) por fragmento, no Redis.
+    Cada fragmento tem TTL próprio e depende de tópicos de invalidação; a chave
+    inclui a versão (INCR) de cada tópico, então um commit em OS/ponto/estoque
+    invalida só os fragmentos afetados, sem varrer chaves. Com todos os
+    fragmentos em cache a página é montada com 2 round-trips ao Redis e nenhum ao banco.
+    """
+
+    VERSAO = 'dashboard:v:{}'
+    CHAVE = 'dashboard:{}:{}:{}'
+
+    # nome -> (escopo, tópicos, TTL em segundos)
+    FRAGMENTOS = {
+        'unidades': ('global', ('unidade',), 600),
+        'registro_aberto': ('usuario', ('ponto',), 300),
+        'minhas_os': ('usuario', ('os',), 120),
+        'alertas_os': ('global', ('os',), 60),  # TTL curto: OS entram na janela com o tempo
+        'alertas_estoque': ('global', ('estoque',), 120),
+    }
+
+    # Campos serializados como ISO e devolvidos como datetime
+    DATAS = ('data_hora_entrada', 'prazo_conclusao')
+
+    @staticmethod
+    def _get_redis():
+        return redis.from_url(current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+
+    # ---- Montagem dos fragmentos (banco) ----
+
+    @staticmethod
+    def _unidades(usuario):
+        return [{'id': u.id, 'nome': u.nome} for u in Unidade.query.filter_by(ativa=True).all()]
+
+    @staticmethod
+    def _registro_aberto(usuario):
+        registro = RegistroPonto.query.filter_by(usuario_id=usuario.id, data_hora_saida=None).first()
+        if registro is None:
+            return None
+        return {'id': registro.id, 'data_hora_entrada': registro.data_hora_entrada.isoformat()}
+
+    @staticmethod
+    def _minhas_os(usuario):
+        """Primeira página da lista + cursor da próxima + total de pendências."""
+        if usuario.tipo == 'tecnico':
+            ordens, proximo = OSService.fila_tecnico(usuario.id)
+            pendencias = OrdemServico.query.filter_by(tecnico_id=usuario.id, status='aberta').count()
+        else:
+            ordens = OrdemServico.query.options(
+                joinedload(OrdemServico.unidade), joinedload(OrdemServico.equipamento_rel)
+            ).order_by(OrdemServico.data_abertura.desc()).limit(20).all()
+            proximo = None
+            pendencias = sum(1 for o in ordens if o.status == 'aberta')
+        return {
+            'itens': [OSService.item_listagem(o) for o in ordens],
+            'proximo_cursor': proximo,
+            'pendencias': pendencias
+        }
+
+    @staticmethod
+    def _alertas_os(usuario):
+        # Agenda de prazos já sabe quais OS estão na janela: busca só essas pela PK
+        em_alerta = AgendaPrazosService.em_alerta('os')
+        if em_alerta is not None:
+            if not em_alerta:
+                return []
+            ordens = OrdemServico.query.filter(
+                OrdemServico.id.in_([item['id'] for item in em_alerta]),
+                OrdemServico.status == 'aberta'
+            ).order_by(OrdemServico.prazo_conclusao).limit(5).all()
+        else:
+            ordens = OrdemServico.query.filter(
+                OrdemServico.status == 'aberta',
+                OrdemServico.prazo_conclusao != None,
+                OrdemServico.prazo_conclusao <= datetime.utcnow() + timedelta(hours=24)
+            ).order_by(OrdemServico.prazo_conclusao).limit(5).all()
+        return [{'id': o.id, 'numero_os': o.numero_os, 'prazo_conclusao': o.prazo_conclusao.isoformat()} for o in ordens]
+
+    @staticmethod
+    def _alertas_estoque(usuario):
+        itens = Estoque.query.filter(Estoque.quantidade_atual <= Estoque.quantidade_minima).limit(5).all()
+        return [{'nome': e.nome, 'quantidade_atual': float(e.quantidade_atual)} for e in itens]
+
+    # ---- Cache ----
+
+    @staticmethod
+    def _objeto(valor):
+        """JSON do cache -> objetos com atributos (o template usa a.numero_os, os.unidade.nome...)."""
+        if isinstance(valor, list):
+            return [DashboardCacheService._objeto(v) for v in valor]
+        if isinstance(valor, dict):
+            return SimpleNamespace(**{
+                k: datetime.fromisoformat(v) if k in DashboardCacheService.DATAS and v else DashboardCacheService._objeto(v)
+                for k, v in valor.items()
+            })
+        return valor
+
+    @staticmethod
+    def fragmentos_para(usuario) -> list:
+        """Alertas só aparecem para não técnicos."""
+        nomes = ['unidades', 'registro_aberto', 'minhas_os']
+        if usuario.tipo != 'tecnico':
+            nomes += ['alertas_os', 'alertas_estoque']
+        return nomes
+
+    @staticmethod
+    def obter(usuario) -> dict:
+        """Contexto do template dashboard.html, lendo do cache o que houver."""
+        nomes = DashboardCacheService.fragmentos_para(usuario)
+        valores = {}
+        try:
+            r = DashboardCacheService._get_redis()
+            topicos = sorted({t for nome in nomes for t in DashboardCacheService.FRAGMENTOS[nome][1]})
+            versoes = dict(zip(topicos, r.mget([DashboardCacheService.VERSAO.format(t) for t in topicos])))
+
+            chaves = {}
+            for nome in nomes:
+                escopo, deps, _ = DashboardCacheService.FRAGMENTOS[nome]
+                dono = usuario.id if escopo == 'usuario' else 'todos'
+                if nome == 'minhas_os' and usuario.tipo != 'tecnico':
+                    dono = 'todos'  # Lista geral (20 mais recentes) é a mesma para todos os não técnicos
+                versao = '.'.join((versoes[t] or b'0').decode() for t in deps)
+                chaves[nome] = DashboardCacheService.CHAVE.format(nome, dono, versao)
+
+            em_cache = r.mget(list(chaves.values()))
+            pipe = r.pipeline()
+            for nome, dados in zip(chaves, em_cache):
+                if dados is not None:
+                    valores[nome] = json.loads(dados)
+                    continue
+                valores[nome] = getattr(DashboardCacheService, f"_{nome}")(usuario)
+                pipe.set(chaves[nome], json.dumps(valores[nome]), ex=DashboardCacheService.FRAGMENTOS[nome][2])
+            pipe.execute()
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: painel montado direto do banco.")
+            valores = {nome: valores.get(nome) or getattr(DashboardCacheService, f"_{nome}")(usuario) for nome in nomes}
+
+        contexto = {'alertas_os': [], 'alertas_estoque': []}
+        contexto.update({nome: DashboardCacheService._objeto(valor) for nome, valor in valores.items()})
+        # minhas_os traz a página e os metadados da listagem
+        lista = valores['minhas_os']
+        contexto['minhas_os'] = DashboardCacheService._objeto(lista['itens'])
+        contexto['minhas_os_cursor'] = lista['proximo_cursor']
+        contexto['pendencias_os'] = lista['pendencias']
+        return contexto
+
+    @staticmethod
+    def invalidar(*topicos):
+        """Avança a versão dos tópicos: fragmentos dependentes viram miss (e expiram pelo TTL)."""
+        try:
+            pipe = DashboardCacheService._get_redis().pipeline()
+            for topico in topicos:
+                pipe.incr(DashboardCacheService.VERSAO.format(topico))
+            pipe.execute()
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: cache do painel não invalidado (expira pelo TTL).")
+
+@ao_alterar('os', 'ponto', 'estoque', 'unidade')
+def _invalidar_painel(alteracoes):
+    DashboardCacheService.invalidar(*alteracoes)
@@ -0,0 +1,77 @@
+from datetime import datetime
+from app.extensions import db
+from app.models.terceirizados_models import HistoricoNotificacao
+from app.models.whatsapp_models import NotificacaoDeadLetter
+from app.services.backlog_service import BacklogService
+from app.services.filas_service import FilaService
+from app.services.notification_service import NotificationService
+
+class DeadLetterService:
+    """
+    Notificações que esgotaram a política de retry (RetryPolicy).
+    O re-drive devolve as notificações para 'pendente' e as publica na faixa
+    de lote, onde o rate limiter e a concorrência da faixa drenam o volume
+    sem competir com envios novos.
+    """
+
+    LIMITE_REDRIVE = 500
+
+    @staticmethod
+    def listar(classe_erro: str = None, limite: int = 100) -> list:
+        query = NotificacaoDeadLetter.query.filter(NotificacaoDeadLetter.reprocessado_em.is_(None))
+        if classe_erro:
+            query = query.filter_by(classe_erro=classe_erro)
+        return query.order_by(NotificacaoDeadLetter.criado_em.desc()).limit(limite).all()
+
+    @staticmethod
+    def resumo() -> dict:
+        """Quantidade aguardando re-drive por classe de erro."""
+        linhas = db.session.query(
+            NotificacaoDeadLetter.classe_erro, db.func.count(NotificacaoDeadLetter.id)
+        ).filter(
+            NotificacaoDeadLetter.reprocessado_em.is_(None)
+        ).group_by(NotificacaoDeadLetter.classe_erro).all()
+        return {classe: total for classe, total in linhas}
+
+    @staticmethod
+    def reprocessar(ids: list = None, classe_erro: str = None, limite: int = None) -> dict:
+        """
+        Re-drive em massa. Sem `ids`, pega as entradas mais antigas (opcionalmente
+        de uma classe) até `limite`. Retorna {'reprocessadas', 'notificacoes'}.
+        """
+        limite = min(limite or DeadLetterService.LIMITE_REDRIVE, DeadLetterService.LIMITE_REDRIVE)
+
+        query = NotificacaoDeadLetter.query.filter(NotificacaoDeadLetter.reprocessado_em.is_(None))
+        if ids:
+            query = query.filter(NotificacaoDeadLetter.id.in_(ids))
+        if classe_erro:
+            query = query.filter_by(classe_erro=classe_erro)
+        # skip_locked: dois re-drives simultâneos não pegam as mesmas entradas (Postgres)
+        entradas = query.order_by(NotificacaoDeadLetter.id).limit(limite).with_for_update(skip_locked=True).all()
+
+        if not entradas:
+            return {'reprocessadas': 0, 'notificacoes': []}
+
+        agora = datetime.utcnow()
+        notificacao_ids = sorted({e.notificacao_id for e in entradas})
+        try:
+            for entrada in entradas:
+                entrada.reprocessado_em = agora
+            # Só reabre o que ainda está como falha (evita reenviar algo já entregue)
+            reabertas = HistoricoNotificacao.query.filter(
+                HistoricoNotificacao.id.in_(notificacao_ids),
+                HistoricoNotificacao.status_envio == 'falhou'
+            ).with_entities(HistoricoNotificacao.id).all()
+            reabertas = [r.id for r in reabertas]
+            if reabertas:
+                HistoricoNotificacao.query.filter(
+                    HistoricoNotificacao.id.in_(reabertas)
+                ).update({'status_envio': 'pendente', 'tentativas': 0}, synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        BacklogService.incrementar(len(reabertas))
+        NotificationService.despachar(reabertas, FilaService.FILA_LOTE)
+        return {'reprocessadas': len(entradas), 'notificacoes': reabertas}
@@ -1,10 +1,19 @@
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
+from flask import current_app
+from sqlalchemy import update, insert, func, and_, bindparam
 from app.extensions import db
-from app.models.estoque_models import Estoque, MovimentacaoEstoque, OrdemServico, EstoqueSaldo, SolicitacaoTransferencia
-from app.models.models import Usuario
+from app.models.estoque_models import (
+    Estoque, MovimentacaoEstoque, OrdemServico, EstoqueSaldo, SolicitacaoTransferencia,
+    SaldoInsuficienteError, quantidade_assinada, aplicar_deltas, deltas_movimentacoes
+)
+from app.models.models import Usuario, Unidade
+from app.utils.invalidacao import marcar
 
 class EstoqueService:
+    TIPOS_LOTE = ('entrada', 'ajuste', 'contagem')  # movimentar_lote
+    OBS_ABERTURA = "Saldo de abertura (ledger)"  # abrir_saldos_ledger e migração f2c8d4a6b913
+
     @staticmethod
     def consumir_item(os_id, estoque_id, quantidade, usuario_id):
         # ... (Manter o código existente do método consumir_item corrigido anteriormente)
@@ -27,14 +36,28 @@ class EstoqueService:
             raise ValueError("A quantidade deve ser maior que zero.")
 
         unidade_id = os_obj.unidade_id
-        saldo_local = EstoqueSaldo.query.filter_by(
-            estoque_id=estoque_id, 
-            unidade_id=unidade_id
-        ).first()
-
-        qtd_disponivel_local = saldo_local.quantidade if saldo_local else Decimal(0)
+        mov = MovimentacaoEstoque(
+            os_id=os_id,
+            estoque_id=estoque_id,
+            usuario_id=usuario_id,
+            unidade_id=unidade_id,
+            tipo_movimentacao='consumo',
+            quantidade=qtd_decimal,
+            observacao=f"Consumo na OS #{os_obj.numero_os}"
+        )
+        db.session.add(mov)
 
-        if saldo_local is None or qtd_disponivel_local < qtd_decimal:
+        try:
+            # O ledger baixa o saldo da unidade no flush e recusa saldo negativo
+            # (linha travada até o commit: consumos simultâneos não vendem a descoberto)
+            db.session.flush()
+        except SaldoInsuficienteError:
+            db.session.rollback()
+            saldo_local = EstoqueSaldo.query.filter_by(
+                estoque_id=estoque_id,
+                unidade_id=unidade_id
+            ).first()
+            qtd_disponivel_local = saldo_local.quantidade if saldo_local else Decimal(0)
             total_global = item.quantidade_atual
             
             if total_global >= qtd_decimal:
@@ -48,20 +71,7 @@ class EstoqueService:
                 msg += "Solicite compra."
             
             raise ValueError(msg)
-            
-        saldo_local.quantidade -= qtd_decimal
-        
-        mov = MovimentacaoEstoque(
-            os_id=os_id,
-            estoque_id=estoque_id,
-            usuario_id=usuario_id,
-            unidade_id=unidade_id,
-            tipo_movimentacao='consumo',
-            quantidade=qtd_decimal,
-            observacao=f"Consumo na OS #{os_obj.numero_os}"
-        )
-        
-        db.session.add(mov)
+
         db.session.commit()
         
         alerta = False
@@ -90,14 +100,6 @@ class EstoqueService:
         if valor_novo is not None:
             item.valor_unitario = Decimal(str(valor_novo))
 
-        saldo_local = EstoqueSaldo.query.filter_by(estoque_id=estoque_id, unidade_id=unidade_id).first()
-        
-        if not saldo_local:
-            saldo_local = EstoqueSaldo(estoque_id=estoque_id, unidade_id=unidade_id, quantidade=0)
-            db.session.add(saldo_local)
-        
-        saldo_local.quantidade += qtd_decimal
-
         # Define tipo de movimentação: se negativo ou se motivo contiver "Ajuste", vira 'ajuste'
         # Caso contrário, se for positivo e manual, mantemos 'entrada'
         tipo = 'entrada'
@@ -116,7 +118,7 @@ class EstoqueService:
         db.session.add(mov)
         db.session.commit()
         
-        # Refresh para garantir que o saldo global atualizado pelo evento seja retornado
+        # Refresh para garantir que o saldo global projetado pelo ledger seja retornado
         db.session.refresh(item)
         
         return item.quantidade_atual
@@ -134,14 +136,15 @@ class EstoqueService:
         if str(unidade_origem_id) == str(unidade_destino_id):
              raise ValueError("Origem e Destino devem ser diferentes.")
 
-        # Verificar Disponibilidade na Origem
-        saldo_origem = EstoqueSaldo.query.filter_by(
-            estoque_id=estoque_id, 
-            unidade_id=unidade_origem_id
-        ).first()
-        
-        if not saldo_origem or saldo_origem.quantidade < qtd_decimal:
-             raise ValueError('Saldo insuficiente na unidade de origem.')
+        # Verificar Disponibilidade na Origem (na aprovação automática, o ledger verifica na baixa)
+        if not aprovacao_automatica:
+            saldo_origem = EstoqueSaldo.query.filter_by(
+                estoque_id=estoque_id,
+                unidade_id=unidade_origem_id
+            ).first()
+
+            if not saldo_origem or saldo_origem.quantidade < qtd_decimal:
+                 raise ValueError('Saldo insuficiente na unidade de origem.')
 
         solicitacao = SolicitacaoTransferencia(
             estoque_id=estoque_id,
@@ -158,22 +161,7 @@ class EstoqueService:
             solicitacao.status = 'concluida'
             solicitacao.data_conclusao = datetime.utcnow()
             
-            # 1. Executa a Movimentação Física (Saída Origem)
-            saldo_origem.quantidade -= qtd_decimal
-            
-            # 2. Executa a Movimentação Física (Entrada Destino)
-            saldo_destino = EstoqueSaldo.query.filter_by(
-                estoque_id=estoque_id, 
-                unidade_id=unidade_destino_id
-            ).first()
-            
-            if not saldo_destino:
-                saldo_destino = EstoqueSaldo(estoque_id=estoque_id, unidade_id=unidade_destino_id, quantidade=0)
-                db.session.add(saldo_destino)
-            
-            saldo_destino.quantidade += qtd_decimal
-            
-            # 3. Registra Histórico (Saída na Origem)
+            # 1. Saída na Origem (o ledger baixa o saldo da origem)
             mov_saida = MovimentacaoEstoque(
                 estoque_id=estoque_id, 
                 usuario_id=solicitante_id, 
@@ -184,7 +172,7 @@ class EstoqueService:
             )
             db.session.add(mov_saida)
 
-            # 4. Registra Histórico (Entrada no Destino)
+            # 2. Entrada no Destino
             mov_entrada = MovimentacaoEstoque(
                 estoque_id=estoque_id, 
                 usuario_id=solicitante_id, 
@@ -196,6 +184,11 @@ class EstoqueService:
             db.session.add(mov_entrada)
 
         db.session.add(solicitacao)
+        try:
+            db.session.flush()
+        except SaldoInsuficienteError:
+            db.session.rollback()
+            raise ValueError('Saldo insuficiente na unidade de origem.')
         db.session.commit()
         
         return solicitacao
@@ -212,36 +205,22 @@ class EstoqueService:
         if sol.status != 'pendente':
             raise ValueError(f"Esta solicitação já está {sol.status}.")
 
-        # Vínculo do saldo de origem
-        saldo_origem = EstoqueSaldo.query.filter_by(
-            estoque_id=sol.estoque_id, 
-            unidade_id=sol.unidade_origem_id
-        ).first()
-
-        if not saldo_origem or saldo_origem.quantidade < sol.quantidade:
-            raise ValueError("Saldo insuficiente na origem para aprovação.")
-
-        # Executa Transferência
-        sol.status = 'concluida'
-        sol.data_conclusao = datetime.utcnow()
+        # Executa Transferência: a troca de status é condicional, então dois
+        # aprovadores simultâneos não movimentam o estoque duas vezes
+        agora = datetime.utcnow()
+        concluida = db.session.execute(
+            update(SolicitacaoTransferencia)
+            .where(SolicitacaoTransferencia.id == sol.id, SolicitacaoTransferencia.status == 'pendente')
+            .values(status='concluida', data_conclusao=agora)
+            .execution_options(synchronize_session=False)
+        )
+        if not concluida.rowcount:
+            db.session.rollback()
+            raise ValueError("Esta solicitação já foi processada.")
         # Nota: SolicitacaoTransferencia não tem campo aprovador_id no seu modelo atual, 
         # mas poderíamos adicionar se necessário. Por agora apenas concluímos.
 
-        # Movimentação Física
-        saldo_origem.quantidade -= sol.quantidade
-        
-        saldo_destino = EstoqueSaldo.query.filter_by(
-            estoque_id=sol.estoque_id, 
-            unidade_id=sol.unidade_destino_id
-        ).first()
-        
-        if not saldo_destino:
-            saldo_destino = EstoqueSaldo(estoque_id=sol.estoque_id, unidade_id=sol.unidade_destino_id, quantidade=0)
-            db.session.add(saldo_destino)
-            
-        saldo_destino.quantidade += sol.quantidade
-        
-        # Histórico
+        # Movimentação Física (saldos projetados pelo ledger)
         mov_saida = MovimentacaoEstoque(
             estoque_id=sol.estoque_id, 
             usuario_id=aprovador_id, 
@@ -262,6 +241,11 @@ class EstoqueService:
         )
         db.session.add(mov_entrada)
 
+        try:
+            db.session.flush()
+        except SaldoInsuficienteError:
+            db.session.rollback()
+            raise ValueError("Saldo insuficiente na origem para aprovação.")
         db.session.commit()
         return sol
 
@@ -301,26 +285,8 @@ class EstoqueService:
         consumos = [m for m in os_obj.movimentacoes if m.tipo_movimentacao == 'consumo']
 
         for mov in consumos:
-            # 2. Localiza o saldo da peça na unidade da OS
-            saldo_local = EstoqueSaldo.query.filter_by(
-                estoque_id=mov.estoque_id, 
-                unidade_id=mov.unidade_id
-            ).first()
-
-            if saldo_local:
-                # 3. Estorna a quantidade para o saldo local
-                saldo_local.quantidade += mov.quantidade
-            else:
-                # Caso raro: se o registro de saldo desapareceu, recria
-                saldo_local = EstoqueSaldo(
-                    estoque_id=mov.estoque_id, 
-                    unidade_id=mov.unidade_id, 
-                    quantidade=mov.quantidade
-                )
-                db.session.add(saldo_local)
-
-            # 4. Registra a devolução no histórico geral (MovimentacaoEstoque)
-            # Nota: O trigger after_insert de MovimentacaoEstoque atualizará o Estoque.quantidade_atual (global)
+            # 2. Registra a devolução no histórico geral (MovimentacaoEstoque)
+            # Nota: o ledger devolve a quantidade ao saldo da unidade e ao global no flush
             estorno = MovimentacaoEstoque(
                 os_id=os_id,
                 estoque_id=mov.estoque_id,
@@ -332,8 +298,335 @@ class EstoqueService:
             )
             db.session.add(estorno)
 
-        # 5. Atualiza o status da OS
+        # 3. Atualiza o status da OS
         os_obj.status = 'cancelada'
         db.session.commit()
         
-        return os_obj
\ No newline at end of file
+        return os_obj
+
+    @staticmethod
+    def movimentar_lote(linhas, usuario_id, unidade_id=None, parcial=False):
+        """
+        Movimenta centenas/milhares de itens numa transação (recebimentos, ajustes
+        e contagens de inventário). Cada linha: tipo ('entrada', 'ajuste' ou
+        'contagem'), estoque_id ou codigo, quantidade (na contagem, a quantidade
+        contada), unidade_id (padrão: o do lote), motivo e valor_unitario opcionais.
+
+        Valida tudo de uma vez (peças, unidades e saldos lidos em poucas queries,
+        travados para a contagem), grava as movimentações com um INSERT em lote e
+        aplica os saldos pelo ledger (aplicar_deltas). Sem parcial, qualquer linha
+        inválida cancela o lote inteiro. Retorna o resultado por linha.
+        """
+        limite = current_app.config.get('ESTOQUE_LOTE_MAX', 5000)
+        if not linhas:
+            raise ValueError("Nenhuma linha informada.")
+        if len(linhas) > limite:
+            raise ValueError(f"Máximo de {limite} linhas por lote.")
+
+        if not unidade_id:
+            usuario = Usuario.query.get(usuario_id)
+            unidade_id = usuario.unidade_padrao_id if usuario else None
+
+        # Referências do lote inteiro em poucas queries
+        codigos = {str(l.get('codigo')).strip() for l in linhas if isinstance(l, dict) and l.get('codigo')}
+        por_codigo = dict(db.session.query(Estoque.codigo, Estoque.id).filter(Estoque.codigo.in_(codigos)).all()) if codigos else {}
+
+        resultados, validas = [], []
+        for numero, linha in enumerate(linhas, start=1):
+            try:
+                if not isinstance(linha, dict):
+                    raise ValueError("Linha deve ser um objeto.")
+                tipo = linha.get('tipo') or 'entrada'
+                if tipo not in EstoqueService.TIPOS_LOTE:
+                    raise ValueError(f"Tipo inválido: {tipo}.")
+                estoque_id = linha.get('estoque_id') or por_codigo.get(str(linha.get('codigo') or '').strip())
+                if not estoque_id:
+                    raise ValueError("Item não encontrado.")
+                try:
+                    estoque_id = int(str(estoque_id))
+                except ValueError:
+                    raise ValueError("Item inválido.")
+                unidade = linha.get('unidade_id') or unidade_id
+                if not unidade:
+                    raise ValueError("É necessário informar a unidade.")
+                try:
+                    unidade = int(str(unidade))
+                except ValueError:
+                    raise ValueError("Unidade inválida.")
+                try:
+                    quantidade = Decimal(str(linha.get('quantidade')))
+                except InvalidOperation:
+                    raise ValueError("Quantidade inválida.")
+                if not quantidade.is_finite():
+                    raise ValueError("Quantidade inválida.")
+                if tipo == 'entrada' and quantidade <= 0:
+                    raise ValueError("A quantidade deve ser maior que zero.")
+                if tipo == 'contagem' and quantidade < 0:
+                    raise ValueError("A quantidade contada não pode ser negativa.")
+                valor = linha.get('valor_unitario')
+                try:
+                    valor = Decimal(str(valor)) if valor not in (None, '') else None
+                except InvalidOperation:
+                    raise ValueError("Valor unitário inválido.")
+                validas.append({
+                    'numero': numero, 'tipo': tipo, 'estoque_id': estoque_id, 'unidade_id': unidade,
+                    'quantidade': quantidade, 'motivo': linha.get('motivo'), 'valor_unitario': valor
+                })
+                resultados.append({'linha': numero, 'status': 'ok'})
+            except (ValueError, TypeError) as e:
+                resultados.append({'linha': numero, 'status': 'erro', 'erro': str(e)})
+
+        itens = {l['estoque_id'] for l in validas}
+        unidades = {l['unidade_id'] for l in validas}
+        itens_existentes = {i for (i,) in db.session.query(Estoque.id).filter(Estoque.id.in_(itens)).all()} if itens else set()
+        unidades_ativas = {u for (u,) in db.session.query(Unidade.id).filter(Unidade.id.in_(unidades), Unidade.ativa == True).all()} if unidades else set()
+
+        # Saldos atuais das chaves do lote, travados até o commit (a contagem vira delta sobre eles)
+        chaves = {(l['estoque_id'], l['unidade_id']) for l in validas}
+        saldos = {}
+        if chaves:
+            consulta = db.session.query(EstoqueSaldo.estoque_id, EstoqueSaldo.unidade_id, EstoqueSaldo.quantidade).filter(
+                EstoqueSaldo.estoque_id.in_(itens), EstoqueSaldo.unidade_id.in_(unidades)
+            )
+            if any(l['tipo'] == 'contagem' or l['quantidade'] < 0 for l in validas):
+                consulta = consulta.with_for_update()
+            saldos = {(e, u): q for e, u, q in consulta.all() if (e, u) in chaves}
+
+        agora = datetime.utcnow()
+        movimentos, precos, contados = [], {}, set()
+        for l in validas:
+            resultado = resultados[l['numero'] - 1]
+            chave = (l['estoque_id'], l['unidade_id'])
+            atual = saldos.get(chave, Decimal(0))
+            if l['estoque_id'] not in itens_existentes:
+                resultado.update(status='erro', erro="Item não encontrado.")
+                continue
+            if l['unidade_id'] not in unidades_ativas:
+                resultado.update(status='erro', erro="Unidade não encontrada ou inativa.")
+                continue
+            if l['tipo'] == 'contagem':
+                if chave in contados:
+                    resultado.update(status='erro', erro="Item contado mais de uma vez nesta unidade.")
+                    continue
+                contados.add(chave)
+                delta = l['quantidade'] - atual
+            else:
+                delta = l['quantidade']
+            if atual + delta < 0:
+                resultado.update(status='erro', erro=f"Saldo ficaria negativo (atual: {atual}).")
+                continue
+
+            saldos[chave] = atual + delta
+            resultado.update(estoque_id=l['estoque_id'], unidade_id=l['unidade_id'], delta=str(delta), saldo=str(atual + delta))
+            if l['valor_unitario'] is not None:
+                precos[l['estoque_id']] = l['valor_unitario']
+            if not delta:
+                resultado['status'] = 'sem_alteracao'
+                continue
+            movimentos.append({
+                'estoque_id': l['estoque_id'],
+                'usuario_id': usuario_id,
+                'unidade_id': l['unidade_id'],
+                # Contagem e quantidades negativas entram como ajuste assinado, como em repor_estoque
+                'tipo_movimentacao': 'entrada' if l['tipo'] == 'entrada' else 'ajuste',
+                'quantidade': delta,
+                'observacao': (l['motivo'] or ("Contagem de inventário" if l['tipo'] == 'contagem' else "Movimentação em lote"))[:255],
+                'data_movimentacao': agora
+            })
+
+        erros = sum(1 for r in resultados if r['status'] == 'erro')
+        resumo = {'linhas': len(linhas), 'movimentacoes': 0, 'erros': erros, 'aplicado': False, 'resultados': resultados}
+        # Sem parcial, qualquer erro cancela; com parcial, só quando nenhuma linha passou
+        if erros and (not parcial or erros == len(resultados)):
+            db.session.rollback()
+            return resumo
+
+        if precos:
+            tabela = Estoque.__table__
+            db.session.execute(
+                tabela.update().where(tabela.c.id == bindparam('b_id'))
+                .values(valor_unitario=bindparam('b_valor', type_=tabela.c.valor_unitario.type)),
+                [{'b_id': k, 'b_valor': v} for k, v in sorted(precos.items())]
+            )
+        if movimentos:
+            db.session.execute(insert(MovimentacaoEstoque), movimentos)
+            # O INSERT em lote não passa pelo flush: aplica a projeção e avisa caches/feed aqui
+            aplicar_deltas(db.session, *deltas_movimentacoes(movimentos))
+            marcar(db.session, 'estoque')
+        db.session.commit()
+
+        resumo.update(movimentacoes=len(movimentos), aplicado=True)
+        return resumo
+
+    @staticmethod
+    def _divergencias():
+        """
+        Projeções que não batem com a soma das movimentações:
+        (globais [(estoque_id, atual, esperado)],
+         saldos [(saldo_id, estoque_id, unidade_id, atual, esperado)],
+         faltantes [(estoque_id, unidade_id, esperado)] - saldo de unidade inexistente)
+        """
+        sinal = quantidade_assinada()
+
+        # Global: toda peça contra a soma de todas as movimentações
+        por_item = db.session.query(
+            MovimentacaoEstoque.estoque_id, func.sum(sinal).label('esperado')
+        ).group_by(MovimentacaoEstoque.estoque_id).subquery()
+        esperado_item = func.coalesce(por_item.c.esperado, 0)
+        globais = db.session.query(Estoque.id, Estoque.quantidade_atual, esperado_item).outerjoin(
+            por_item, por_item.c.estoque_id == Estoque.id
+        ).filter(Estoque.quantidade_atual != esperado_item).all()
+
+        # Por unidade: linhas de saldo divergentes e saldos que deveriam existir e não existem
+        por_unidade = db.session.query(
+            MovimentacaoEstoque.estoque_id, MovimentacaoEstoque.unidade_id, func.sum(sinal).label('esperado')
+        ).filter(MovimentacaoEstoque.unidade_id.isnot(None)).group_by(
+            MovimentacaoEstoque.estoque_id, MovimentacaoEstoque.unidade_id
+        ).subquery()
+        esperado_unidade = func.coalesce(por_unidade.c.esperado, 0)
+        saldos = db.session.query(
+            EstoqueSaldo.id, EstoqueSaldo.estoque_id, EstoqueSaldo.unidade_id, EstoqueSaldo.quantidade, esperado_unidade
+        ).outerjoin(por_unidade, and_(
+            por_unidade.c.estoque_id == EstoqueSaldo.estoque_id,
+            por_unidade.c.unidade_id == EstoqueSaldo.unidade_id
+        )).filter(EstoqueSaldo.quantidade != esperado_unidade).all()
+        faltantes = db.session.query(
+            por_unidade.c.estoque_id, por_unidade.c.unidade_id, por_unidade.c.esperado
+        ).outerjoin(EstoqueSaldo, and_(
+            EstoqueSaldo.estoque_id == por_unidade.c.estoque_id,
+            EstoqueSaldo.unidade_id == por_unidade.c.unidade_id
+        )).filter(EstoqueSaldo.id.is_(None), por_unidade.c.esperado != 0).all()
+        return globais, saldos, faltantes
+
+    @staticmethod
+    def abrir_saldos_ledger(usuario_id=None):
+        """
+        Registra movimentações 'ajuste' de abertura para que o ledger explique os
+        saldos existentes (itens criados com quantidade_atual, saldos copiados
+        por init_saldos_estoque.py...). Os saldos são tomados como verdade: uma
+        abertura por (item, unidade) = saldo - movimentações, mais uma sem unidade
+        para o que sobrar no global. Idempotente; as projeções não mudam.
+        """
+        globais, saldos, faltantes = EstoqueService._divergencias()
+        aberturas = {}
+        for _, estoque_id, unidade_id, atual, esperado in saldos:
+            aberturas[(estoque_id, unidade_id)] = Decimal(str(atual)) - Decimal(str(esperado))
+        for estoque_id, unidade_id, esperado in faltantes:
+            aberturas[(estoque_id, unidade_id)] = -Decimal(str(esperado))
+
+        # Global: o que as aberturas de unidade não explicam fica numa abertura sem unidade
+        itens = {i for i, _, _ in globais} | {e for e, _ in aberturas}
+        if itens:
+            sinal = quantidade_assinada()
+            por_item = db.session.query(
+                MovimentacaoEstoque.estoque_id, func.sum(sinal).label('esperado')
+            ).filter(MovimentacaoEstoque.estoque_id.in_(itens)).group_by(MovimentacaoEstoque.estoque_id).subquery()
+            for estoque_id, atual, esperado in db.session.query(
+                Estoque.id, Estoque.quantidade_atual, func.coalesce(por_item.c.esperado, 0)
+            ).outerjoin(por_item, por_item.c.estoque_id == Estoque.id).filter(Estoque.id.in_(itens)).all():
+                das_unidades = sum((q for (e, _), q in aberturas.items() if e == estoque_id), Decimal(0))
+                aberturas[(estoque_id, None)] = Decimal(str(atual)) - Decimal(str(esperado)) - das_unidades
+
+        aberturas = {k: q for k, q in aberturas.items() if q}
+        if not aberturas:
+            return {'aberturas': 0}
+
+        if usuario_id is None:
+            usuario_id = db.session.query(Usuario.id).order_by(
+                db.case((Usuario.tipo == 'admin', 0), else_=1), Usuario.id
+            ).limit(1).scalar()
+            if usuario_id is None:
+                raise ValueError("Cadastre um usuário antes de abrir os saldos do ledger.")
+
+        agora = datetime.utcnow()
+        # Os saldos já contêm essas quantidades: INSERT em lote, sem passar pela projeção
+        db.session.execute(insert(MovimentacaoEstoque), [{
+            'estoque_id': estoque_id,
+            'usuario_id': usuario_id,
+            'unidade_id': unidade_id,
+            'tipo_movimentacao': 'ajuste',
+            'quantidade': quantidade,
+            'observacao': EstoqueService.OBS_ABERTURA,
+            'data_movimentacao': agora
+        } for (estoque_id, unidade_id), quantidade in sorted(aberturas.items(), key=lambda a: (a[0][0], a[0][1] or 0))])
+        db.session.commit()
+        return {'aberturas': len(aberturas)}
+
+    @staticmethod
+    def reconciliar_saldos(reparar=False, amostra=20):
+        """
+        Compara as projeções (Estoque.quantidade_atual e EstoqueSaldo.quantidade)
+        com a soma das movimentações. Por padrão só relata; com reparar=True
+        regrava as divergentes em lote (um UPDATE por tabela, mais INSERT dos
+        saldos de unidade que faltam). Nunca grava saldo negativo: essas
+        divergências ficam em 'recusados' para correção manual.
+        """
+        sinal = quantidade_assinada()
+        globais, saldos, faltantes = EstoqueService._divergencias()
+
+        relatorio = {
+            'globais': len(globais),
+            'unidades': len(saldos),
+            'unidades_sem_saldo': len(faltantes),
+            'reparado': False,
+            'recusados': [],
+            'amostra': [
+                {'estoque_id': i, 'unidade_id': None, 'atual': str(a), 'esperado': str(e)} for i, a, e in globais[:amostra]
+            ] + [
+                {'estoque_id': e, 'unidade_id': u, 'atual': str(a), 'esperado': str(q)} for _, e, u, a, q in saldos[:amostra]
+            ] + [
+                {'estoque_id': e, 'unidade_id': u, 'atual': None, 'esperado': str(q)} for e, u, q in faltantes[:amostra]
+            ]
+        }
+        if not (globais or saldos or faltantes):
+            return relatorio
+
+        current_app.logger.warning(
+            f"Estoque divergente do ledger: {len(globais)} globais, {len(saldos)} por unidade, "
+            f"{len(faltantes)} saldos ausentes{' (reparando)' if reparar else ''}"
+        )
+        if not reparar:
+            return relatorio
+
+        # Ledger negativo indica saldo sem movimentação de origem (ver abrir_saldos_ledger): não grava
+        relatorio['recusados'] = [
+            {'estoque_id': i, 'unidade_id': None, 'esperado': str(e)} for i, _, e in globais if e < 0
+        ] + [
+            {'estoque_id': e, 'unidade_id': u, 'esperado': str(q)} for _, e, u, _, q in saldos if q < 0
+        ] + [
+            {'estoque_id': e, 'unidade_id': u, 'esperado': str(q)} for e, u, q in faltantes if q < 0
+        ]
+        globais = [g for g in globais if g[2] >= 0]
+        saldos = [s for s in saldos if s[4] >= 0]
+        faltantes = [f for f in faltantes if f[2] >= 0]
+        if relatorio['recusados']:
+            current_app.logger.warning(
+                f"Reconciliação de estoque: {len(relatorio['recusados'])} saldo(s) ficariam negativos e não foram reparados"
+            )
+
+        if globais:
+            recalculado = db.select(func.coalesce(func.sum(sinal), 0)).where(
+                MovimentacaoEstoque.estoque_id == Estoque.id
+            ).scalar_subquery()
+            db.session.execute(
+                update(Estoque).where(Estoque.id.in_([i for i, _, _ in globais]), recalculado >= 0)
+                .values(quantidade_atual=recalculado)
+                .execution_options(synchronize_session=False)
+            )
+        if saldos:
+            recalculado = db.select(func.coalesce(func.sum(sinal), 0)).where(
+                MovimentacaoEstoque.estoque_id == EstoqueSaldo.estoque_id,
+                MovimentacaoEstoque.unidade_id == EstoqueSaldo.unidade_id
+            ).scalar_subquery()
+            db.session.execute(
+                update(EstoqueSaldo).where(EstoqueSaldo.id.in_([s[0] for s in saldos]), recalculado >= 0)
+                .values(quantidade=recalculado)
+                .execution_options(synchronize_session=False)
+            )
+        if faltantes:
+            db.session.execute(EstoqueSaldo.__table__.insert(), [
+                {'estoque_id': e, 'unidade_id': u, 'quantidade': q} for e, u, q in faltantes
+            ])
+        db.session.commit()
+        relatorio['reparado'] = True
+        return relatorio
@@ -0,0 +1,154 @@
+import json
+import time
+import redis
+from datetime import datetime
+from flask import current_app, url_for
+from sqlalchemy import literal_column
+from app.models.estoque_models import OrdemServico, Estoque
+from app.services.agenda_prazos_service import AgendaPrazosService
+from app.utils.invalidacao import ao_alterar
+
+class FeedAlertasService:
+    """
+    Feed de alertas (OS vencendo/atrasadas e estoque baixo) calculado uma vez
+    e compartilhado por todas as abas abertas.
+    - O snapshot fica no Redis e é recalculado (task) quando OS ou estoque
+      mudam, com debounce, e quando a agenda de prazos emite um evento
+      (OS entrando na janela ou vencendo).
+    - Cada recálculo é publicado no canal pub/sub consumido pelo SSE de
+      /api/notifications/stream.
+    O texto ("vence em Xh") é montado na leitura, então o snapshot não envelhece.
+    """
+
+    CHAVE_SNAPSHOT = 'alertas:feed:snapshot'
+    CHAVE_AGENDADO = 'alertas:feed:agendado'
+    CANAL = 'alertas:feed:eventos'
+    DEBOUNCE_SEGUNDOS = 2
+
+    @staticmethod
+    def _get_redis():
+        return redis.from_url(current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+
+    @staticmethod
+    def calcular() -> dict:
+        """Consulta o banco e monta o snapshot (dados crus, sem texto)."""
+        agora = datetime.utcnow()
+        limite_os = current_app.config.get('ALERTAS_OS_LIMITE', 50)
+
+        # Estado pré-calculado pela agenda de prazos; sem ela, consulta o banco
+        em_alerta = AgendaPrazosService.em_alerta('os')
+        if em_alerta is not None:
+            oss = [{'id': o['id'], 'numero_os': o['numero'], 'prazo': o['prazo']} for o in em_alerta[:limite_os]]
+        else:
+            # Literal (não bind) para casar com o índice parcial ix_ordens_servico_nao_concluidas_prazo
+            oss = [{'id': o.id, 'numero_os': o.numero_os, 'prazo': o.prazo_conclusao.isoformat()}
+                   for o in OrdemServico.query.with_entities(
+                       OrdemServico.id, OrdemServico.numero_os, OrdemServico.prazo_conclusao
+                   ).filter(
+                       OrdemServico.status != literal_column("'concluida'"),
+                       OrdemServico.prazo_conclusao <= agora + AgendaPrazosService._janela('os')
+                   ).order_by(OrdemServico.prazo_conclusao).limit(limite_os).all()]
+
+        itens_baixo = Estoque.query.with_entities(
+            Estoque.nome, Estoque.quantidade_atual, Estoque.unidade_medida
+        ).filter(Estoque.quantidade_atual <= Estoque.quantidade_minima).limit(10).all()
+
+        return {
+            'versao': time.time_ns(),
+            'gerado_em': agora.isoformat(),
+            'os': oss,
+            'estoque': [{
+                'nome': e.nome,
+                'quantidade': str(e.quantidade_atual),
+                'unidade_medida': e.unidade_medida
+            } for e in itens_baixo]
+        }
+
+    @staticmethod
+    def links() -> dict:
+        """
+        Modelos de URL dos alertas, resolvidos uma vez com url_for (precisa de
+        contexto). O stream SSE os calcula na view e formata fora do contexto.
+        """
+        marcador = 987654321
+        return {
+            'os': url_for('os.detalhes', id=marcador).replace(str(marcador), '{id}'),
+            'estoque': url_for('os.painel_estoque'),
+        }
+
+    @staticmethod
+    def formatar(snapshot: dict, agora: datetime = None, links: dict = None) -> dict:
+        """Converte o snapshot no payload de /api/notifications ({count, alerts})."""
+        agora = agora or datetime.utcnow()
+        links = links or FeedAlertasService.links()
+        alerts = []
+
+        for os in snapshot.get('os', []):
+            prazo = datetime.fromisoformat(os['prazo'])
+            delta = prazo - agora
+            if delta.total_seconds() < 0:
+                msg = f"OS #{os['numero_os']} está ATRASADA!"
+                tipo = "urgent"
+            else:
+                horas = int(delta.total_seconds() // 3600)
+                msg = f"OS #{os['numero_os']} vence em {horas}h"
+                tipo = "warning"
+            alerts.append({
+                "type": tipo,
+                "message": msg,
+                "url": links['os'].format(id=os['id']),
+                "timestamp": os['prazo']
+            })
+
+        for item in snapshot.get('estoque', []):
+            alerts.append({
+                "type": "warning",
+                "message": f"Estoque baixo: {item['nome']} ({item['quantidade']} {item['unidade_medida']})",
+                "url": links['estoque'],
+                "timestamp": snapshot.get('gerado_em')
+            })
+
+        return {"count": len(alerts), "alerts": alerts, "versao": snapshot.get('versao')}
+
+    @staticmethod
+    def recalcular() -> dict:
+        """Recalcula, grava o snapshot e publica para os assinantes do SSE."""
+        snapshot = FeedAlertasService.calcular()
+        dados = json.dumps(snapshot)
+        try:
+            r = FeedAlertasService._get_redis()
+            r.set(FeedAlertasService.CHAVE_SNAPSHOT, dados)
+            r.publish(FeedAlertasService.CANAL, dados)
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: snapshot de alertas não publicado.")
+        return snapshot
+
+    @staticmethod
+    def snapshot() -> dict:
+        """Snapshot atual. Sem Redis, calcula direto no banco."""
+        try:
+            dados = FeedAlertasService._get_redis().get(FeedAlertasService.CHAVE_SNAPSHOT)
+            if dados is not None:
+                return json.loads(dados)
+            return FeedAlertasService.recalcular()
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: alertas calculados direto no banco.")
+            return FeedAlertasService.calcular()
+
+    @staticmethod
+    def agendar_recalculo():
+        """Agenda um recálculo; alterações em rajada dentro do debounce viram um só."""
+        try:
+            agendou = FeedAlertasService._get_redis().set(
+                FeedAlertasService.CHAVE_AGENDADO, 1, nx=True, ex=FeedAlertasService.DEBOUNCE_SEGUNDOS
+            )
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: recálculo do feed de alertas não agendado.")
+            return
+        if agendou:
+            from app.tasks.system_tasks import recalcular_feed_alertas
+            recalcular_feed_alertas.apply_async(countdown=FeedAlertasService.DEBOUNCE_SEGUNDOS)
+
+@ao_alterar('os', 'estoque')
+def _invalidar_feed(alteracoes):
+    FeedAlertasService.agendar_recalculo()
@@ -0,0 +1,123 @@
+import zlib
+import redis
+from contextlib import contextmanager
+from flask import current_app
+
+
+class RemetenteOcupadoError(Exception):
+    """Lock do remetente não foi obtido a tempo; a mensagem deve ser reprocessada."""
+
+class FilaService:
+    """
+    Roteamento das tasks Celery do WhatsApp para filas dedicadas.
+    - Inbound: particionado por remetente (hash estável do telefone), garantindo
+      processamento serial por contato e paralelismo entre contatos.
+    - Envio: três faixas (urgente, normal, lote) para que rajadas de lembretes
+      não atrasem alertas urgentes.
+    """
+
+    PREFIXO_INBOUND = 'whatsapp_inbound'
+
+    FILA_URGENTE = 'whatsapp_urgente'
+    FILA_NORMAL = 'whatsapp_normal'
+    FILA_LOTE = 'whatsapp_lote'
+    FILAS_ENVIO = (FILA_URGENTE, FILA_NORMAL, FILA_LOTE)
+
+    # Mesma regra do WhatsAppService: prioridade >= 2 ignora o rate limit
+    PRIORIDADE_URGENTE = 2
+
+    # Sub-listas que o transporte Redis do Celery cria para mensagens com prioridade
+    _SEP_PRIORIDADE = '\x06\x16'
+    _PASSOS_PRIORIDADE = (3, 6, 9)
+
+    @staticmethod
+    def _get_redis():
+        return redis.from_url(current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+
+    @staticmethod
+    def total_particoes_inbound() -> int:
+        return max(1, int(current_app.config.get('WHATSAPP_INBOUND_PARTICOES', 8)))
+
+    @staticmethod
+    def particao_inbound(remetente: str) -> int:
+        """
+        Partição do remetente. Usa CRC32 (e não hash()) para que todos os
+        processos web calculem a mesma partição para o mesmo telefone.
+        """
+        return zlib.crc32(str(remetente).encode()) % FilaService.total_particoes_inbound()
+
+    @staticmethod
+    def fila_inbound(remetente: str) -> str:
+        return f"{FilaService.PREFIXO_INBOUND}_{FilaService.particao_inbound(remetente)}"
+
+    @staticmethod
+    def filas_inbound() -> list:
+        return [f"{FilaService.PREFIXO_INBOUND}_{i}" for i in range(FilaService.total_particoes_inbound())]
+
+    @staticmethod
+    def fila_envio(prioridade: int = 0, lote: bool = False) -> str:
+        """
+        Faixa de envio de uma notificação. Urgência vence o modo lote:
+        um alerta urgente disparado numa campanha não fica atrás dela.
+        """
+        if (prioridade or 0) >= FilaService.PRIORIDADE_URGENTE:
+            return FilaService.FILA_URGENTE
+        if lote:
+            return FilaService.FILA_LOTE
+        return FilaService.FILA_NORMAL
+
+    @staticmethod
+    def profundidades() -> dict:
+        """
+        Mensagens aguardando em cada faixa de envio (LLEN no broker Redis).
+        Retorna None por faixa se o Redis estiver indisponível.
+        """
+        try:
+            r = FilaService._get_redis()
+            pipe = r.pipeline()
+            for fila in FilaService.FILAS_ENVIO:
+                pipe.llen(fila)
+                for passo in FilaService._PASSOS_PRIORIDADE:
+                    pipe.llen(f"{fila}{FilaService._SEP_PRIORIDADE}{passo}")
+            valores = pipe.execute()
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: profundidade das filas desconhecida.")
+            return {fila: None for fila in FilaService.FILAS_ENVIO}
+
+        por_fila = 1 + len(FilaService._PASSOS_PRIORIDADE)
+        return {
+            fila: sum(valores[i * por_fila:(i + 1) * por_fila])
+            for i, fila in enumerate(FilaService.FILAS_ENVIO)
+        }
+
+    @staticmethod
+    @contextmanager
+    def trava_remetente(remetente: str, timeout: int = 60, espera: int = 30):
+        """
+        Lock por telefone no Redis. Protege a ordem mesmo se um worker de partição
+        rodar com concurrency > 1 ou durante a troca do número de partições.
+        Nunca é global: remetentes diferentes não competem pelo mesmo lock.
+        Se o Redis estiver indisponível, segue sem lock (a partição já serializa).
+        Se o lock não vier dentro de `espera`, levanta RemetenteOcupadoError: quem
+        chama reenfileira em vez de processar fora de ordem.
+        """
+        lock = None
+        try:
+            r = FilaService._get_redis()
+            lock = r.lock(f"whatsapp:inbound:lock:{remetente}", timeout=timeout, blocking_timeout=espera)
+            if not lock.acquire():
+                current_app.logger.warning(f"Timeout aguardando lock do remetente {remetente}. Mensagem será reenfileirada.")
+                raise RemetenteOcupadoError(remetente)
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: processando inbound sem lock por remetente.")
+            lock = None
+
+        try:
+            yield
+        finally:
+            if lock is not None:
+                try:
+                    lock.release()
+                except (redis.exceptions.LockError, redis.exceptions.RedisError):
+                    # Lock expirou durante o processamento; nada a liberar
+                    pass
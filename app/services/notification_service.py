@@ -0,0 +1,94 @@
+import hashlib
+from datetime import datetime
+from celery import group
+from sqlalchemy import insert
+from app.extensions import db
+from app.models.terceirizados_models import HistoricoNotificacao
+from app.services.filas_service import FilaService
+from app.services.backlog_service import BacklogService
+
+class NotificationService:
+    """
+    Ponto único para registrar e enfileirar notificações WhatsApp (outbound).
+    Insere o histórico em lote (uma transação), devolve os IDs na ordem de
+    entrada e publica as tasks de envio em blocos, na faixa (urgente,
+    normal, lote) de cada notificação.
+    """
+
+    CHUNK_INSERT = 500
+    CHUNK_DISPATCH = 100
+
+    @staticmethod
+    def _linha(item: dict, agora: datetime) -> dict:
+        mensagem = item['mensagem']
+        return {
+            'chamado_id': item.get('chamado_id'),
+            'tipo': item.get('tipo', 'manual_outbound'),
+            'remetente': item.get('remetente'),
+            'destinatario': item['destinatario'],
+            'mensagem': mensagem,
+            'mensagem_hash': hashlib.sha256(mensagem.encode()).hexdigest(),
+            'prioridade': item.get('prioridade', 0),
+            'status_envio': 'pendente',
+            'direcao': 'outbound',
+            'tentativas': 0,
+            'criado_em': agora
+        }
+
+    @staticmethod
+    def enqueue_many(itens: list, lote: bool = False) -> list:
+        """
+        Registra N notificações e enfileira o envio.
+        Cada item: {'destinatario', 'mensagem', 'tipo', 'chamado_id', 'prioridade', 'remetente'}.
+        `lote=True` envia pela faixa de lote (campanhas em massa), exceto itens urgentes.
+        Retorna a lista de IDs de HistoricoNotificacao, na mesma ordem de `itens`.
+        """
+        if not itens:
+            return []
+
+        agora = datetime.utcnow()
+        linhas = [NotificationService._linha(item, agora) for item in itens]
+
+        stmt = insert(HistoricoNotificacao).returning(
+            HistoricoNotificacao.id, sort_by_parameter_order=True
+        )
+
+        ids = []
+        try:
+            for i in range(0, len(linhas), NotificationService.CHUNK_INSERT):
+                bloco = linhas[i:i + NotificationService.CHUNK_INSERT]
+                ids.extend(db.session.scalars(stmt, bloco).all())
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        BacklogService.incrementar(len(ids))
+
+        # Só publica depois do commit: o worker precisa enxergar as linhas
+        por_fila = {}
+        for notificacao_id, linha in zip(ids, linhas):
+            fila = FilaService.fila_envio(linha['prioridade'], lote)
+            por_fila.setdefault(fila, []).append(notificacao_id)
+
+        for fila, ids_fila in por_fila.items():
+            NotificationService.despachar(ids_fila, fila)
+        return ids
+
+    @staticmethod
+    def enqueue(destinatario: str, mensagem: str, **campos) -> int:
+        """Atalho para uma única notificação. Retorna o ID criado."""
+        campos.update(destinatario=destinatario, mensagem=mensagem)
+        return NotificationService.enqueue_many([campos])[0]
+
+    @staticmethod
+    def despachar(ids: list, fila: str = FilaService.FILA_NORMAL):
+        """Publica enviar_whatsapp_task em blocos, reaproveitando a conexão com o broker."""
+        # Import local: whatsapp_tasks importa serviços que dependem deste módulo
+        from app.tasks.whatsapp_tasks import enviar_whatsapp_task
+
+        for i in range(0, len(ids), NotificationService.CHUNK_DISPATCH):
+            bloco = ids[i:i + NotificationService.CHUNK_DISPATCH]
+            group(
+                enviar_whatsapp_task.s(notificacao_id).set(queue=fila) for notificacao_id in bloco
+            ).apply_async()
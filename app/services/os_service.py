@@ -4,6 +4,8 @@ from datetime import datetime
 from PIL import Image
 from werkzeug.utils import secure_filename
 from flask import current_app
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import joinedload
 from app.extensions import db
 from app.models.estoque_models import OrdemServico, AnexosOS
 
@@ -93,4 +95,62 @@ class OSService:
                     print(f"Erro ao processar imagem {file.filename}: {e}")
                     continue
         
-        return caminhos_json
\ No newline at end of file
+        return caminhos_json
+
+    @staticmethod
+    def item_listagem(os_obj) -> dict:
+        """Resumo serializável de uma OS para a listagem do painel (cache e JSON)."""
+        return {
+            'id': os_obj.id,
+            'numero_os': os_obj.numero_os,
+            'prioridade': os_obj.prioridade,
+            'status': os_obj.status,
+            'unidade': {'nome': os_obj.unidade.nome},
+            'equipamento_rel': {'nome': os_obj.equipamento_rel.nome} if os_obj.equipamento_rel else None
+        }
+
+    @staticmethod
+    def consulta_fila_tecnico(tecnico_id, cursor=None):
+        """Query ordenada da fila do técnico a partir do cursor (sem limite)."""
+        query = OrdemServico.query.options(
+            joinedload(OrdemServico.unidade), joinedload(OrdemServico.equipamento_rel)
+        ).filter(OrdemServico.tecnico_id == tecnico_id)
+
+        if cursor:
+            try:
+                encerrada, nivel, ultimo_id = (int(parte) for parte in cursor.split('.'))
+            except ValueError:
+                raise ValueError("Cursor inválido.")
+            if encerrada not in (0, 1):
+                raise ValueError("Cursor inválido.")
+            encerrada = bool(encerrada)
+            mesmo_grupo = OrdemServico.encerrada == encerrada
+            seguintes = [
+                and_(mesmo_grupo, OrdemServico.prioridade_nivel < nivel),
+                and_(mesmo_grupo, OrdemServico.prioridade_nivel == nivel, OrdemServico.id < ultimo_id)
+            ]
+            if not encerrada:
+                # Depois das abertas vêm todas as encerradas (Boolean não aceita '>')
+                seguintes.insert(0, OrdemServico.encerrada == True)
+            query = query.filter(or_(*seguintes))
+
+        return query.order_by(
+            OrdemServico.encerrada, OrdemServico.prioridade_nivel.desc(), OrdemServico.id.desc()
+        )
+
+    @staticmethod
+    def fila_tecnico(tecnico_id, cursor=None, limite=20):
+        """
+        OS do técnico: abertas primeiro, depois prioridade (urgente > baixa) e mais recentes.
+        Paginação por cursor (keyset) sobre ix_ordens_servico_tecnico_fila: o custo de cada
+        página não depende de quantas OS o técnico já teve.
+        Retorna (ordens, proximo_cursor); cursor None = última página.
+        """
+        ordens = OSService.consulta_fila_tecnico(tecnico_id, cursor).limit(limite + 1).all()
+
+        proximo = None
+        if len(ordens) > limite:
+            ordens = ordens[:limite]
+            ultima = ordens[-1]
+            proximo = f"{int(ultima.encerrada)}.{ultima.prioridade_nivel}.{ultima.id}"
+        return ordens, proximo
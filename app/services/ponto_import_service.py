@@ -0,0 +1,265 @@
+import bisect
+import csv
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from flask import current_app
+from sqlalchemy import or_
+from app.extensions import db
+from app.models.models import RegistroPonto, Usuario, Unidade
+from app.utils.invalidacao import marcar
+
+class PontoImportService:
+    """
+    Importação em massa de RegistroPonto (relógios de ponto, planilhas).
+    Lê CSV ou JSONL em streaming e processa em lotes: valida cada linha,
+    recusa sobreposição de turnos (com o banco e dentro do próprio arquivo),
+    grava com bulk_insert_mappings e faz commit por lote. A memória fica
+    limitada ao tamanho do lote, independente do tamanho do arquivo.
+
+    Campos: usuario_id ou username; unidade_id ou unidade (nome); entrada;
+    saida (opcional); ip, latitude, longitude, observacoes (opcionais).
+    Datas ISO 8601 (com ou sem fuso) ou dd/mm/aaaa HH:MM[:SS].
+    """
+
+    LOTE = 5000
+    MAX_TURNO = timedelta(hours=24)
+    MAX_ERROS_RELATORIO = 1000
+    FORMATOS_DATA = ('%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M')
+
+    @staticmethod
+    def ler_linhas(arquivo, formato='csv'):
+        """Gera (número da linha, dict) sem carregar o arquivo inteiro."""
+        if formato == 'jsonl':
+            for numero, texto in enumerate(arquivo, start=1):
+                if not texto.strip():
+                    continue
+                try:
+                    dados = json.loads(texto)
+                except ValueError as e:
+                    yield numero, ValueError(f"JSON inválido: {e}")
+                    continue
+                yield numero, dados if isinstance(dados, dict) else ValueError("Linha JSONL deve ser um objeto.")
+        elif formato == 'csv':
+            leitor = csv.DictReader(arquivo)
+            for numero, dados in enumerate(leitor, start=2):  # Linha 1 = cabeçalho
+                yield numero, dados
+        else:
+            raise ValueError(f"Formato não suportado: {formato}")
+
+    @staticmethod
+    def _data(valor, fuso):
+        if valor is None or str(valor).strip() == '':
+            return None
+        texto = str(valor).strip()
+        try:
+            data = datetime.fromisoformat(texto.replace('Z', '+00:00'))
+        except ValueError:
+            for formato in PontoImportService.FORMATOS_DATA:
+                try:
+                    data = datetime.strptime(texto, formato)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(f"Data inválida: '{texto}'")
+        if data.tzinfo is None:
+            data = data.replace(tzinfo=fuso)
+        # Gravado em UTC sem timezone, como no check-in
+        return data.astimezone(timezone.utc).replace(tzinfo=None)
+
+    @staticmethod
+    def _decimal(valor):
+        if valor is None or str(valor).strip() == '':
+            return None
+        return float(str(valor).replace(',', '.'))
+
+    @staticmethod
+    def _validar(dados, usuarios, unidades, fuso, agora):
+        """Linha -> mapping de RegistroPonto. ValueError com a mensagem do problema."""
+        usuario_id = None
+        if dados.get('usuario_id') not in (None, ''):
+            usuario_id = int(dados['usuario_id'])
+            if usuario_id not in usuarios['ids']:
+                raise ValueError(f"Usuário {usuario_id} não encontrado.")
+        elif dados.get('username'):
+            usuario_id = usuarios['username'].get(str(dados['username']).strip())
+            if usuario_id is None:
+                raise ValueError(f"Usuário '{dados['username']}' não encontrado.")
+        else:
+            raise ValueError("Informe usuario_id ou username.")
+
+        unidade_id = None
+        if dados.get('unidade_id') not in (None, ''):
+            unidade_id = int(dados['unidade_id'])
+            if unidade_id not in unidades['ids']:
+                raise ValueError(f"Unidade {unidade_id} não encontrada.")
+        elif dados.get('unidade'):
+            unidade_id = unidades['nome'].get(str(dados['unidade']).strip().lower())
+            if unidade_id is None:
+                raise ValueError(f"Unidade '{dados['unidade']}' não encontrada.")
+        else:
+            raise ValueError("Informe unidade_id ou unidade.")
+
+        entrada = PontoImportService._data(dados.get('entrada'), fuso)
+        if entrada is None:
+            raise ValueError("Entrada obrigatória.")
+        saida = PontoImportService._data(dados.get('saida'), fuso)
+        if entrada > agora:
+            raise ValueError("Entrada no futuro.")
+        if saida is not None:
+            if saida <= entrada:
+                raise ValueError("Saída anterior ou igual à entrada.")
+            if saida - entrada > PontoImportService.MAX_TURNO:
+                raise ValueError("Turno maior que 24 horas.")
+
+        ip = str(dados.get('ip') or 'importacao')[:45]
+        return {
+            'usuario_id': usuario_id,
+            'unidade_id': unidade_id,
+            'data_hora_entrada': entrada,
+            'data_hora_saida': saida,
+            'ip_origem_entrada': ip,
+            'ip_origem_saida': ip if saida else None,
+            'latitude': PontoImportService._decimal(dados.get('latitude')),
+            'longitude': PontoImportService._decimal(dados.get('longitude')),
+            'observacoes': dados.get('observacoes') or None
+        }
+
+    @staticmethod
+    def _sem_sobreposicao(candidatos):
+        """
+        Filtra os turnos do lote que se sobrepõem a registros existentes ou a
+        outro turno do lote (o primeiro por horário vence). Turno sem saída
+        (em aberto) ocupa até o infinito.
+        candidatos: [(linha, mapping)] -> (aceitos, [(linha, erro)])
+        """
+        if not candidatos:
+            return [], []
+        infinito = datetime.max
+        usuarios = {m['usuario_id'] for _, m in candidatos}
+        inicio = min(m['data_hora_entrada'] for _, m in candidatos)
+        fim = max(m['data_hora_saida'] or infinito for _, m in candidatos)
+
+        # Registros existentes que podem colidir (idx_usuario_data)
+        filtro_fim = [] if fim == infinito else [RegistroPonto.data_hora_entrada < fim]
+        existentes = db.session.query(
+            RegistroPonto.usuario_id, RegistroPonto.data_hora_entrada, RegistroPonto.data_hora_saida
+        ).filter(
+            RegistroPonto.usuario_id.in_(usuarios),
+            *filtro_fim,
+            or_(RegistroPonto.data_hora_saida == None, RegistroPonto.data_hora_saida > inicio)
+        ).all()
+
+        # Por usuário: intervalos ocupados disjuntos, ordenados (inícios, fins) para busca binária
+        ocupados = {}
+        for usuario_id, entrada, saida in sorted(existentes, key=lambda r: (r[0], r[1])):
+            inicios, fins = ocupados.setdefault(usuario_id, ([], []))
+            saida = saida or infinito
+            if inicios and entrada < fins[-1]:
+                fins[-1] = max(fins[-1], saida)  # Registros antigos já sobrepostos: mescla
+            else:
+                inicios.append(entrada)
+                fins.append(saida)
+
+        aceitos, erros = [], []
+        for linha, mapping in sorted(candidatos, key=lambda c: (c[1]['usuario_id'], c[1]['data_hora_entrada'])):
+            entrada, saida = mapping['data_hora_entrada'], mapping['data_hora_saida'] or infinito
+            inicios, fins = ocupados.setdefault(mapping['usuario_id'], ([], []))
+            posicao = bisect.bisect_right(inicios, entrada)
+            if (posicao > 0 and fins[posicao - 1] > entrada) or (posicao < len(inicios) and inicios[posicao] < saida):
+                erros.append((linha, "Sobrepõe outro registro de ponto do usuário."))
+                continue
+            inicios.insert(posicao, entrada)
+            fins.insert(posicao, saida)
+            aceitos.append(mapping)
+        return aceitos, erros
+
+    @staticmethod
+    def importar(arquivo, formato='csv', lote=None, fuso_horas=None, validar_apenas=False, erros_saida=None):
+        """
+        Importa o arquivo (objeto texto iterável). Retorna o resumo:
+        {lidas, importadas, rejeitadas, erros: [(linha, msg)] (primeiros), segundos}.
+        fuso_horas: fuso dos horários sem offset (padrão TIMESHEET_FUSO_HORAS).
+        erros_saida (opcional): objeto texto que recebe todas as rejeições em CSV.
+        Se a leitura falhar no meio do arquivo (ex.: encoding), os lotes já
+        gravados ficam e o resumo traz 'interrompido' com o motivo.
+        """
+        lote = lote or PontoImportService.LOTE
+        if fuso_horas is None:
+            fuso_horas = current_app.config.get('TIMESHEET_FUSO_HORAS', 0)
+        fuso = timezone(timedelta(hours=fuso_horas))
+        agora = datetime.utcnow()
+        inicio = time.perf_counter()
+
+        # Tabelas pequenas: resolvidas em memória uma vez
+        usuarios = {'ids': set(), 'username': {}}
+        for usuario_id, username in db.session.query(Usuario.id, Usuario.username):
+            usuarios['ids'].add(usuario_id)
+            usuarios['username'][username] = usuario_id
+        unidades = {'ids': set(), 'nome': {}}
+        for unidade_id, nome in db.session.query(Unidade.id, Unidade.nome):
+            unidades['ids'].add(unidade_id)
+            unidades['nome'][nome.strip().lower()] = unidade_id
+
+        escritor = csv.writer(erros_saida) if erros_saida else None
+        if escritor:
+            escritor.writerow(['linha', 'erro'])
+        resumo = {'lidas': 0, 'importadas': 0, 'rejeitadas': 0, 'erros': []}
+
+        def rejeitar(linha, mensagem):
+            resumo['rejeitadas'] += 1
+            if len(resumo['erros']) < PontoImportService.MAX_ERROS_RELATORIO:
+                resumo['erros'].append((linha, mensagem))
+            if escritor:
+                escritor.writerow([linha, mensagem])
+
+        linhas = PontoImportService.ler_linhas(arquivo, formato)
+        interrompido = None
+        while interrompido is None:
+            bloco = []
+            try:
+                bloco.extend(islice(linhas, lote))
+            except (ValueError, csv.Error) as e:
+                if not resumo['lidas'] and not bloco:
+                    raise ValueError(f"Arquivo inválido: {e}")
+                interrompido = str(e)
+            if not bloco:
+                break
+            resumo['lidas'] += len(bloco)
+
+            candidatos = []
+            for numero, dados in bloco:
+                if isinstance(dados, Exception):
+                    rejeitar(numero, str(dados))
+                    continue
+                try:
+                    candidatos.append((numero, PontoImportService._validar(dados, usuarios, unidades, fuso, agora)))
+                except (ValueError, TypeError) as e:
+                    rejeitar(numero, str(e))
+
+            aceitos, sobrepostos = PontoImportService._sem_sobreposicao(candidatos)
+            for numero, mensagem in sorted(sobrepostos):
+                rejeitar(numero, mensagem)
+
+            if aceitos and not validar_apenas:
+                db.session.bulk_insert_mappings(RegistroPonto, aceitos)
+                # bulk_insert não passa pelo flush: avisa caches/painéis do ponto
+                marcar(db.session, 'ponto')
+                db.session.commit()
+            elif aceitos:
+                # Validação: os aceitos deste lote contam como ocupados para os próximos
+                db.session.bulk_insert_mappings(RegistroPonto, aceitos)
+            resumo['importadas'] += len(aceitos)
+
+        if interrompido:
+            resumo['interrompido'] = interrompido
+        if validar_apenas:
+            db.session.rollback()
+        elif resumo['importadas']:
+            # Histórico pode cair em meses fechados (folha em cache)
+            from app.services.timesheet_service import TimesheetService
+            TimesheetService.invalidar()
+        resumo['segundos'] = round(time.perf_counter() - inicio, 2)
+        return resumo
@@ -0,0 +1,71 @@
+import random
+
+class RetryPolicy:
+    """
+    Política de retry do envio WhatsApp, por classe de erro.
+    Atraso com "full jitter": uniforme entre 0 e min(teto, base * 2^(tentativa-1)),
+    para que uma queda do provedor não gere ondas sincronizadas de retries.
+    Classes com max_tentativas = 1 não são retentadas: vão direto para a dead-letter.
+    """
+
+    # classe -> (max_tentativas, base_segundos, teto_segundos)
+    POLITICAS = {
+        'telefone_invalido': (1, 0, 0),      # Não adianta tentar de novo
+        'config': (1, 0, 0),                 # Corrigir a configuração e reprocessar a dead-letter
+        'http_4xx': (1, 0, 0),               # Requisição rejeitada pelo provedor
+        'timeout': (5, 5, 60),               # Falha transitória: retenta rápido
+        'rede': (4, 30, 600),
+        'http_429': (5, 60, 900),
+        'http_5xx': (5, 60, 1800),
+        'circuito_aberto': (6, 120, 1800),   # Espera o breaker chegar a HALF_OPEN
+        'desconhecido': (3, 60, 1500),
+    }
+
+    @staticmethod
+    def classificar(resposta) -> str:
+        """Classe de erro a partir da resposta de WhatsAppService.enviar_mensagem."""
+        if not isinstance(resposta, dict):
+            return 'desconhecido'
+
+        codigo = resposta.get('code')
+        if codigo == 'TELEFONE_INVALIDO':
+            return 'telefone_invalido'
+        if codigo == 'CONFIG_ERROR':
+            return 'config'
+        if codigo == 'TIMEOUT':
+            return 'timeout'
+        if codigo == 'REQUEST_ERROR':
+            return 'rede'
+        if codigo == 'CIRCUIT_OPEN':
+            return 'circuito_aberto'
+
+        status = resposta.get('status')
+        if isinstance(status, int):
+            if status == 429:
+                return 'http_429'
+            if status in (408, 504):
+                return 'timeout'
+            if 400 <= status < 500:
+                return 'http_4xx'
+            if status >= 500:
+                return 'http_5xx'
+        return 'desconhecido'
+
+    @staticmethod
+    def atraso(classe: str, tentativa: int) -> float:
+        """Segundos até a próxima tentativa (tentativa começa em 1)."""
+        _, base, teto = RetryPolicy.POLITICAS.get(classe, RetryPolicy.POLITICAS['desconhecido'])
+        limite = min(teto, base * (2 ** max(0, tentativa - 1)))
+        return random.uniform(0, limite)
+
+    @staticmethod
+    def decidir(resposta, tentativas: int):
+        """
+        Retorna (classe, countdown). countdown None = esgotou: mover para dead-letter.
+        `tentativas` já inclui a tentativa que acabou de falhar.
+        """
+        classe = RetryPolicy.classificar(resposta)
+        max_tentativas = RetryPolicy.POLITICAS.get(classe, RetryPolicy.POLITICAS['desconhecido'])[0]
+        if tentativas >= max_tentativas:
+            return classe, None
+        return classe, RetryPolicy.atraso(classe, tentativas)
@@ -42,18 +42,10 @@ class RoteamentoService:
             # For now, let's allow fallthrough to Commands if Input was not 'SIM'/'NAO'
         
         # 3. Parse Command
+        # ComandoExecutores registra os comandos no parser ao ser importado
         comando = ComandoParser.parse(texto)
         if comando:
-            cmd_key = comando['comando']
-            if cmd_key == 'COMPRA':
-                res = ComandoExecutores.executar_compra(comando['params'], terceirizado)
-            elif cmd_key == 'STATUS':
-                res = ComandoExecutores.executar_status(terceirizado)
-            elif cmd_key == 'AJUDA':
-                res = ComandoExecutores.executar_ajuda()
-            else:
-                res = {'sucesso': False, 'resposta': 'Comando desconhecido.'}
-            
+            res = ComandoParser.executar(comando, terceirizado)
             return {'acao': 'responder', 'resposta': res['resposta']}
         
         # 4. Automation Rules
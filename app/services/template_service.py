@@ -1,8 +1,23 @@
+import time
+from string import Formatter
+from flask import current_app
+from sqlalchemy import event
+from app.models.whatsapp_models import TemplateMensagem
+
 class TemplateService:
     """
     Renders message templates with provided variables.
+    Templates come from the database (whatsapp_templates, per locale) and fall
+    back to the built-in TEMPLATES below. Each template is compiled once
+    (stripped, variables extracted) and cached per (name, locale) until it is
+    edited or the TTL expires.
     """
-    
+
+    LOCALE_PADRAO = 'pt_BR'
+    # Limita a defasagem entre processos: edições invalidam o cache do processo
+    # que salvou; os demais recarregam após o TTL.
+    CACHE_TTL = 300
+
     TEMPLATES = {
         'novo_chamado': """
 🔧 *Novo Chamado GMM*
@@ -16,16 +31,16 @@ class TemplateService:
 Para aceitar: {link_aceite}
 Ou responda: SIM
         """,
-        
+
         'lembrete': """
 ⏰ *Lembrete GMM*
 
 *Chamado:* {numero_chamado}
-*Prazo:* {prazo} (em 48h)
+*Prazo:* {prazo} (em {horas}h)
 
 Tudo certo? 👍
         """,
-        
+
         'cobranca': """
 🚨 *Prazo Vencido*
 
@@ -35,20 +50,160 @@ Precisamos de atualização urgente!
 Qual a previsão?
         """
     }
-    
+
+    # Variáveis que cada chamador fornece; templates salvos só podem usar estas
+    VARIAVEIS = {
+        'novo_chamado': frozenset({'numero_chamado', 'titulo', 'prazo', 'descricao', 'link_aceite'}),
+        'lembrete': frozenset({'numero_chamado', 'prazo', 'horas'}),
+        'cobranca': frozenset({'numero_chamado'}),
+    }
+
+    # Erros possíveis de format_map com um template mal formado
+    ERROS_RENDER = (ValueError, KeyError, IndexError, AttributeError, TypeError)
+
+    # (nome, locale) -> (compilado, expira_em)
+    _cache = {}
+
     @staticmethod
-    def render(template_name: str, **kwargs) -> str:
+    def _compilar(texto: str) -> dict:
         """
-        Renders a template by name using the provided keyword arguments.
-        Returns the rendered string or the template name if not found.
+        Parses the template once. Rendering is then a single C-level
+        format_map call plus a set check for missing variables.
+        """
+        texto = texto.strip()
+        campos = set()
+        for _, campo, _, _ in Formatter().parse(texto):
+            if campo:
+                # {chamado.numero} / {itens[0]} dependem apenas da raiz
+                campos.add(campo.split('.')[0].split('[')[0])
+        return {'render': texto.format_map, 'campos': frozenset(campos)}
+
+    @staticmethod
+    def validar(template_name: str, texto: str):
+        """
+        Checks a template before it is saved. Raises ValueError for positional
+        or empty fields ({} / {0}), for variables the caller never supplies and
+        for anything that would only fail at render time.
         """
-        template_text = TemplateService.TEMPLATES.get(template_name)
-        if not template_text:
-            return f"Template {template_name} not found."
-            
+        campos = []
+        for _, campo, _, _ in Formatter().parse(texto.strip()):
+            if campo is None:
+                continue
+            raiz = campo.split('.')[0].split('[')[0]
+            if not raiz or raiz.isdigit():
+                raise ValueError("Campos posicionais ou vazios ({} / {0}) não são permitidos.")
+            campos.append(raiz)
+
+        permitidas = TemplateService.VARIAVEIS.get(template_name)
+        if permitidas is None:
+            return
+        desconhecidas = set(campos).difference(permitidas)
+        if desconhecidas:
+            raise ValueError(
+                f"Variável(is) {', '.join(sorted(desconhecidas))} não disponível(is) para {template_name}. "
+                f"Use: {', '.join(sorted(permitidas))}."
+            )
         try:
-            return template_text.strip().format(**kwargs)
-        except KeyError as e:
-            return f"Error: Missing variable {str(e)} for template {template_name}"
-        except Exception as e:
-            return f"Error rendering template: {str(e)}"
+            texto.strip().format_map({v: '0' for v in permitidas})
+        except TemplateService.ERROS_RENDER as e:
+            raise ValueError(f"Formatação inválida: {e}")
+
+    @staticmethod
+    def _carregar(template_name: str, locale: str):
+        """Resolves DB (locale) -> DB (default locale) -> built-in."""
+        locales = [locale] if locale == TemplateService.LOCALE_PADRAO else [locale, TemplateService.LOCALE_PADRAO]
+        registros = TemplateMensagem.query.filter(
+            TemplateMensagem.nome == template_name,
+            TemplateMensagem.locale.in_(locales),
+            TemplateMensagem.ativo == True
+        ).all()
+        por_locale = {r.locale: r.conteudo for r in registros}
+
+        for loc in locales:
+            if loc in por_locale:
+                try:
+                    return TemplateService._compilar(por_locale[loc])
+                except ValueError as e:
+                    current_app.logger.error(f"Template {template_name} ({loc}) inválido no banco, usando o embutido: {e}")
+                    break
+
+        texto = TemplateService.TEMPLATES.get(template_name)
+        return TemplateService._compilar(texto) if texto else None
+
+    @staticmethod
+    def obter(template_name: str, locale: str = None) -> dict:
+        """Returns the compiled template, using the per-locale cache."""
+        locale = locale or TemplateService.LOCALE_PADRAO
+        chave = (template_name, locale)
+        agora = time.monotonic()
+
+        entrada = TemplateService._cache.get(chave)
+        if entrada and entrada[1] > agora:
+            compilado = entrada[0]
+        else:
+            compilado = TemplateService._carregar(template_name, locale)
+            TemplateService._cache[chave] = (compilado, agora + TemplateService.CACHE_TTL)
+
+        if compilado is None:
+            raise ValueError(f"Template {template_name} not found.")
+        return compilado
+
+    @staticmethod
+    def invalidar(template_name: str = None):
+        """Drops cached templates (all locales of one name, or everything)."""
+        if template_name is None:
+            TemplateService._cache.clear()
+            return
+        for chave in [c for c in TemplateService._cache if c[0] == template_name]:
+            TemplateService._cache.pop(chave, None)
+
+    @staticmethod
+    def _aplicar(compilado: dict, template_name: str, valores: dict) -> str:
+        faltando = compilado['campos'].difference(valores)
+        if faltando:
+            raise ValueError(f"Missing variable(s) {', '.join(sorted(faltando))} for template {template_name}")
+        return compilado['render'](valores)
+
+    @staticmethod
+    def render(template_name: str, locale: str = None, **kwargs) -> str:
+        """
+        Renders a template by name using the provided keyword arguments.
+        Raises ValueError if the template does not exist or a variable is missing.
+        """
+        compilado = TemplateService.obter(template_name, locale)
+        return TemplateService._aplicar(compilado, template_name, kwargs)
+
+    @staticmethod
+    def render_lote(template_name: str, lista_variaveis: list, locale: str = None) -> list:
+        """
+        Renders the same template for many recipients (e.g. a reminder run).
+        The template is resolved and compiled once for the whole batch.
+        An item the stored template cannot render falls back to the built-in
+        one; if that fails too it comes back as None (caller skips it), so one
+        bad edit or record never aborts the whole batch.
+        """
+        compilado = TemplateService.obter(template_name, locale)
+        embutido = None
+        mensagens = []
+        for valores in lista_variaveis:
+            try:
+                mensagens.append(TemplateService._aplicar(compilado, template_name, valores))
+                continue
+            except TemplateService.ERROS_RENDER as e:
+                current_app.logger.error(f"Falha ao renderizar {template_name}: {e}")
+
+            if embutido is None and template_name in TemplateService.TEMPLATES:
+                embutido = TemplateService._compilar(TemplateService.TEMPLATES[template_name])
+            try:
+                mensagens.append(TemplateService._aplicar(embutido, template_name, valores) if embutido else None)
+            except TemplateService.ERROS_RENDER as e:
+                current_app.logger.error(f"Item ignorado no lote {template_name}: {e}")
+                mensagens.append(None)
+        return mensagens
+
+@event.listens_for(TemplateMensagem, 'after_insert')
+@event.listens_for(TemplateMensagem, 'after_update')
+@event.listens_for(TemplateMensagem, 'after_delete')
+def invalidar_template_editado(mapper, connection, target):
+    # Edições são raras: limpa tudo (cobre renomeação de template)
+    TemplateService.invalidar()
@@ -0,0 +1,259 @@
+import json
+import calendar
+import redis
+from datetime import datetime, date, time, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, func, case, extract
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models.models import Usuario, RegistroPonto
+from app.utils.invalidacao import ao_alterar
+
+class TimesheetService:
+    """
+    Folha de ponto agregada por trabalhador-dia, calculada no banco.
+    - Um GROUP BY (usuario, dia) para o período inteiro, de todos os usuários:
+      horas, primeira entrada, última saída, turnos em aberto e status
+      (insuficiente/normal/extra) via CASE com os limites da configuração.
+    - O dia é o do início do turno no fuso local (TIMESHEET_FUSO_HORAS):
+      um turno 22h-06h conta inteiro no dia em que começou.
+    - Meses fechados quase não mudam: o resultado fica no Redis. Uma batida
+      corrigida num mês fechado incrementa só a versão daquele mês
+      (timesheet:v:AAAA-MM); importações de histórico incrementam timesheet:v.
+    """
+
+    VERSAO = 'timesheet:v'
+    VERSAO_MES = 'timesheet:v:{}'
+    CHAVE = 'timesheet:{}:{}:{}:{}'
+
+    @staticmethod
+    def _get_redis():
+        return redis.from_url(current_app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379/0'))
+
+    @staticmethod
+    def _limites():
+        config = current_app.config
+        return (
+            config.get('TIMESHEET_FUSO_HORAS', 0),
+            config.get('TIMESHEET_JORNADA_HORAS', 8.0),
+            config.get('TIMESHEET_MIN_HORAS', 7.8),
+            config.get('TIMESHEET_MAX_HORAS', 8.5),
+        )
+
+    # ---- Agregação (SQL) ----
+
+    @staticmethod
+    def _expressoes(fuso):
+        """Dia local do início do turno e duração em segundos, conforme o banco."""
+        entrada, saida = RegistroPonto.data_hora_entrada, RegistroPonto.data_hora_saida
+        if db.session.get_bind().dialect.name == 'sqlite':
+            dia = func.date(entrada, f"{fuso:+d} hours")
+            segundos = (func.julianday(saida) - func.julianday(entrada)) * 86400
+        else:
+            dia = func.date(entrada + timedelta(hours=fuso))
+            segundos = extract('epoch', saida - entrada)
+        return dia, segundos
+
+    @staticmethod
+    def agregar(dia_inicio: date, dia_fim: date, usuario_ids=None, unidade_id=None) -> list:
+        """
+        Linhas por usuário-dia entre dia_inicio e dia_fim (inclusive, dias locais),
+        ordenadas por usuário e dia.
+        """
+        fuso, jornada, minimo, maximo = TimesheetService._limites()
+        dia, segundos = TimesheetService._expressoes(fuso)
+
+        horas = func.coalesce(func.sum(segundos), 0) / 3600.0
+        status = case(
+            (func.count(RegistroPonto.data_hora_saida) < func.count(RegistroPonto.id), 'em_aberto'),
+            (horas < minimo, 'insuficiente'),
+            (horas > maximo, 'extra'),
+            else_='normal'
+        )
+
+        # Filtro em UTC sobre data_hora_entrada (usa idx_usuario_data / idx_unidade_data)
+        utc_inicio = datetime.combine(dia_inicio, time()) - timedelta(hours=fuso)
+        utc_fim = datetime.combine(dia_fim + timedelta(days=1), time()) - timedelta(hours=fuso)
+        query = db.session.query(
+            RegistroPonto.usuario_id,
+            dia.label('dia'),
+            func.min(RegistroPonto.data_hora_entrada).label('entrada'),
+            func.max(RegistroPonto.data_hora_saida).label('saida'),
+            func.count(RegistroPonto.id).label('registros'),
+            horas.label('horas'),
+            case((horas > jornada, horas - jornada), else_=0).label('horas_extra'),
+            case((horas < jornada, jornada - horas), else_=0).label('horas_faltantes'),
+            status.label('status')
+        ).filter(
+            RegistroPonto.data_hora_entrada >= utc_inicio,
+            RegistroPonto.data_hora_entrada < utc_fim
+        )
+        if usuario_ids is not None:
+            query = query.filter(RegistroPonto.usuario_id.in_(usuario_ids))
+        if unidade_id:
+            query = query.filter(RegistroPonto.unidade_id == unidade_id)
+
+        linhas = query.group_by(RegistroPonto.usuario_id, dia).order_by(RegistroPonto.usuario_id, dia).all()
+
+        local = timedelta(hours=fuso)
+        return [{
+            'usuario_id': l.usuario_id,
+            'dia': str(l.dia),
+            'entrada': (l.entrada + local).strftime('%H:%M'),
+            'saida': (l.saida + local).strftime('%H:%M') if l.saida and l.status != 'em_aberto' else None,
+            'registros': l.registros,
+            'horas': round(float(l.horas), 2),
+            'horas_extra': round(float(l.horas_extra), 2),
+            'horas_faltantes': round(float(l.horas_faltantes), 2),
+            'status': l.status
+        } for l in linhas]
+
+    # ---- Meses (com cache dos fechados) ----
+
+    @staticmethod
+    def mes_fechado(ano: int, mes: int) -> bool:
+        """Fechado um dia após o fim do mês (turnos da última noite já encerrados)."""
+        ultimo_dia = date(ano, mes, calendar.monthrange(ano, mes)[1])
+        return datetime.utcnow().date() > ultimo_dia + timedelta(days=1)
+
+    @staticmethod
+    def mes(ano: int, mes: int, unidade_id=None) -> list:
+        """Linhas usuário-dia do mês inteiro (todos os usuários)."""
+        inicio = date(ano, mes, 1)
+        fim = date(ano, mes, calendar.monthrange(ano, mes)[1])
+        if not TimesheetService.mes_fechado(ano, mes):
+            return TimesheetService.agregar(inicio, fim, unidade_id=unidade_id)
+
+        limites = ':'.join(str(v) for v in TimesheetService._limites())
+        try:
+            r = TimesheetService._get_redis()
+            referencia = f"{ano}-{mes:02d}"
+            versoes = r.mget(TimesheetService.VERSAO, TimesheetService.VERSAO_MES.format(referencia))
+            versao = '.'.join((v or b'0').decode() for v in versoes)
+            chave = TimesheetService.CHAVE.format(referencia, unidade_id or 'todas', limites, versao)
+            dados = r.get(chave)
+            if dados is not None:
+                return json.loads(dados)
+            linhas = TimesheetService.agregar(inicio, fim, unidade_id=unidade_id)
+            r.set(chave, json.dumps(linhas), ex=current_app.config.get('TIMESHEET_CACHE_TTL', 30 * 86400))
+            return linhas
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: folha de ponto calculada sem cache.")
+            return TimesheetService.agregar(inicio, fim, unidade_id=unidade_id)
+
+    @staticmethod
+    def periodo(dia_inicio: date, dia_fim: date, usuario_ids=None, unidade_id=None) -> list:
+        """
+        Linhas usuário-dia de um intervalo qualquer: meses fechados vêm do
+        cache (filtrados), o trecho aberto é agregado direto.
+        """
+        linhas = []
+        cursor = date(dia_inicio.year, dia_inicio.month, 1)
+        while cursor <= dia_fim:
+            fim_mes = date(cursor.year, cursor.month, calendar.monthrange(cursor.year, cursor.month)[1])
+            de, ate = max(cursor, dia_inicio), min(fim_mes, dia_fim)
+            if TimesheetService.mes_fechado(cursor.year, cursor.month):
+                ids = set(usuario_ids) if usuario_ids is not None else None
+                linhas.extend(
+                    l for l in TimesheetService.mes(cursor.year, cursor.month, unidade_id)
+                    if de.isoformat() <= l['dia'] <= ate.isoformat() and (ids is None or l['usuario_id'] in ids)
+                )
+            else:
+                linhas.extend(TimesheetService.agregar(de, ate, usuario_ids, unidade_id))
+            cursor = fim_mes + timedelta(days=1)
+        return linhas
+
+    @staticmethod
+    def folha_equipe(ano: int, mes: int, unidade_id=None) -> dict:
+        """Folha mensal de toda a equipe numa chamada: dias e totais por usuário."""
+        linhas = TimesheetService.mes(ano, mes, unidade_id)
+        ids = sorted({l['usuario_id'] for l in linhas})
+        nomes = dict(db.session.query(Usuario.id, Usuario.nome).filter(Usuario.id.in_(ids)).all()) if ids else {}
+
+        usuarios = {}
+        for l in linhas:
+            u = usuarios.setdefault(l['usuario_id'], {
+                'usuario_id': l['usuario_id'],
+                'nome': nomes.get(l['usuario_id'], '?'),
+                'dias_trabalhados': 0,
+                'total_horas': 0.0,
+                'horas_extra': 0.0,
+                'horas_faltantes': 0.0,
+                'dias_com_alerta': 0,
+                'dias': []
+            })
+            u['dias_trabalhados'] += 1
+            u['total_horas'] += l['horas']
+            u['horas_extra'] += l['horas_extra']
+            u['horas_faltantes'] += l['horas_faltantes']
+            u['dias_com_alerta'] += l['status'] != 'normal'
+            u['dias'].append(l)
+
+        for u in usuarios.values():
+            for campo in ('total_horas', 'horas_extra', 'horas_faltantes'):
+                u[campo] = round(u[campo], 2)
+
+        return {
+            'periodo': f"{ano}-{mes:02d}",
+            'fechado': TimesheetService.mes_fechado(ano, mes),
+            'usuarios': sorted(usuarios.values(), key=lambda u: u['nome'])
+        }
+
+    @staticmethod
+    def invalidar(meses=None):
+        """
+        Descarta a folha em cache dos meses [(ano, mes), ...] informados ou,
+        sem meses, de todos (ex.: histórico importado).
+        """
+        try:
+            r = TimesheetService._get_redis()
+            if meses is None:
+                r.incr(TimesheetService.VERSAO)
+            else:
+                pipe = r.pipeline()
+                for ano, mes in meses:
+                    pipe.incr(TimesheetService.VERSAO_MES.format(f"{ano}-{mes:02d}"))
+                pipe.execute()
+        except (redis.exceptions.ConnectionError, redis.exceptions.RedisError):
+            current_app.logger.warning("Redis Unavailable: cache da folha de ponto não invalidado.")
+
+# Batidas do mês corrente (check-in/check-out do dia) não tocam o cache: só
+# entram no flush os meses fechados das batidas alteradas, pela entrada antiga
+# e pela nova, e só esses são invalidados após o commit.
+
+@event.listens_for(Session, 'after_flush')
+def _anotar_meses_ponto(session, flush_context):
+    if not has_app_context():
+        return
+    fuso = None
+    meses = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, RegistroPonto):
+            continue
+        if fuso is None:
+            fuso = timedelta(hours=TimesheetService._limites()[0])
+        historico = inspect(obj).attrs.data_hora_entrada.history
+        for entrada in list(historico.added) + list(historico.unchanged) + list(historico.deleted):
+            if entrada is None:
+                continue
+            dia = (entrada + fuso).date()
+            if TimesheetService.mes_fechado(dia.year, dia.month):
+                meses.add((dia.year, dia.month))
+    if meses:
+        session.info.setdefault('timesheet_meses', set()).update(meses)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidar_meses_ponto(session):
+    meses = session.info.pop('timesheet_meses', None)
+    if meses and has_app_context():
+        TimesheetService.invalidar(sorted(meses))
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_meses_ponto(session):
+    session.info.pop('timesheet_meses', None)
+
+@ao_alterar('ponto')
+def _invalidar_folha_em_massa(alteracoes):
+    # UPDATE em massa anotado com marcar() (sem ids): meses desconhecidos
+    if None in alteracoes['ponto']:
+        TimesheetService.invalidar()
@@ -6,6 +6,7 @@ import logging
 from flask import current_app
 from app.services.circuit_breaker import CircuitBreaker
 from app.services.rate_limiter import RateLimiter
+from app.utils.metricas import RATE_LIMIT_REJEICOES
 
 logger = logging.getLogger(__name__)
 
@@ -17,17 +18,18 @@ class WhatsAppService:
         return bool(re.match(r'^55\d{11}$', str(telefone)))
 
     @classmethod
-    def enviar_mensagem(cls, telefone: str, texto: str, prioridade: int = 0, notificacao_id: int = None):
+    def enviar_mensagem(cls, telefone: str, texto: str, prioridade: int = 0, notificacao_id: int = None, fila: str = None):
         """
         Envia mensagem via MegaAPI com resiliência:
         1. Validação de Telefone
         2. Circuit Breaker check
         3. Rate Limiting check (exceto para prioridade 2/Urgente)
         4. API Request com Error Handling
+        `fila`: faixa de origem, para reenfileirar na mesma faixa quando limitado.
         """
         # 1. Validação
         if not cls.validar_telefone(telefone):
-            return False, {"error": "Telefone inválido"}
+            return False, {"error": "Telefone inválido", "code": "TELEFONE_INVALIDO"}
 
         # 2. Circuit Breaker
         if not CircuitBreaker.should_attempt():
@@ -37,11 +39,17 @@ class WhatsAppService:
         if prioridade < 2:
             pode_enviar, restantes = RateLimiter.check_limit()
             if not pode_enviar:
+                RATE_LIMIT_REJEICOES.inc()
                 logger.info(f"Rate limit reached. Enqueueing notification {notificacao_id} for later.")
                 if notificacao_id:
                     # Circular import avoidance: import inside method
                     from app.tasks.whatsapp_tasks import enviar_whatsapp_task
-                    enviar_whatsapp_task.apply_async(args=[notificacao_id], countdown=60)
+                    from app.services.filas_service import FilaService
+                    enviar_whatsapp_task.apply_async(
+                        args=[notificacao_id],
+                        countdown=60,
+                        queue=fila or FilaService.fila_envio(prioridade)
+                    )
                 return True, {"status": "enfileirado"}
 
         # 4. Get Credentials
@@ -55,13 +63,13 @@ class WhatsAppService:
                 url = current_app.config.get('MEGA_API_URL')
             except Exception as e:
                 logger.error(f"Error decrypting API Key: {str(e)}")
-                return False, {"error": "Decryption failed"}
+                return False, {"error": "Decryption failed", "code": "CONFIG_ERROR"}
         else:
             url = current_app.config.get('MEGA_API_URL')
             api_key = current_app.config.get('MEGA_API_KEY')
 
         if not url or not api_key:
-            return False, {"error": "MegaAPI configuration missing"}
+            return False, {"error": "MegaAPI configuration missing", "code": "CONFIG_ERROR"}
 
         # 5. API Request
         try:
@@ -81,7 +89,11 @@ class WhatsAppService:
                 logger.warning(f"MegaAPI failure: {response.status_code} - {response.text}")
                 return False, {"status": response.status_code, "text": response.text}
                 
+        except requests.exceptions.Timeout as e:
+            CircuitBreaker.record_failure()
+            logger.error(f"MegaAPI timeout: {str(e)}")
+            return False, {"error": str(e), "code": "TIMEOUT"}
         except requests.exceptions.RequestException as e:
             CircuitBreaker.record_failure()
             logger.error(f"MegaAPI request exception: {str(e)}")
-            return False, {"error": str(e)}
\ No newline at end of file
+            return False, {"error": str(e), "code": "REQUEST_ERROR"}
\ No newline at end of file
@@ -1,9 +1,16 @@
-from app.tasks.whatsapp_tasks import enviar_whatsapp_task, limpar_estados_expirados, agregar_metricas_horarias
-from app.tasks.system_tasks import lembretes_automaticos_task
+from app.tasks.whatsapp_tasks import enviar_whatsapp_task, limpar_estados_expirados, agregar_metricas_horarias, reconciliar_backlog_whatsapp, arquivar_historico_notificacoes
+from app.tasks.system_tasks import lembretes_automaticos_task, recalcular_feed_alertas, sincronizar_prazos_task, processar_prazos_task, reconstruir_agenda_prazos_task, reconciliar_estoque_task
 
 __all__ = [
     'enviar_whatsapp_task',
     'limpar_estados_expirados',
     'agregar_metricas_horarias',
-    'lembretes_automaticos_task'
+    'reconciliar_backlog_whatsapp',
+    'arquivar_historico_notificacoes',
+    'lembretes_automaticos_task',
+    'recalcular_feed_alertas',
+    'sincronizar_prazos_task',
+    'processar_prazos_task',
+    'reconstruir_agenda_prazos_task',
+    'reconciliar_estoque_task'
 ]
@@ -1,37 +1,105 @@
 from datetime import datetime, timedelta
 from celery import shared_task
-from app.extensions import db
-from app.models.terceirizados_models import ChamadoExterno, HistoricoNotificacao
-from app.tasks.whatsapp_tasks import enviar_whatsapp_task
+from flask import current_app
+from app.models.terceirizados_models import ChamadoExterno
+from app.services.template_service import TemplateService
+from app.services.notification_service import NotificationService
+from app.services.feed_alertas_service import FeedAlertasService
+from app.services.agenda_prazos_service import AgendaPrazosService
+from app.services.dashboard_cache_service import DashboardCacheService
+from app.services.estoque_service import EstoqueService
 
 @shared_task
-def lembretes_automaticos_task():
+def lembretes_automaticos_task(chamado_ids=None):
     """
-    Periodic task to check for upcoming deadlines and send WhatsApp reminders.
+    Send WhatsApp reminders for tickets close to their deadline.
+    Com chamado_ids (eventos 'aviso' da agenda de prazos), lembra só esses;
+    sem ids, varre os chamados que vencem dentro de PRAZO_AVISO_CHAMADO_HORAS.
     """
     hoje = datetime.utcnow()
-    limite = hoje + timedelta(days=2)
+    limite = hoje + timedelta(hours=current_app.config.get('PRAZO_AVISO_CHAMADO_HORAS', 48))
     
     # Chamados 'aguardando' ou 'em_andamento' próximos do prazo
-    chamados = ChamadoExterno.query.filter(
-        ChamadoExterno.status.notin_(['concluido', 'cancelado']),
-        ChamadoExterno.prazo_combinado <= limite,
-        ChamadoExterno.prazo_combinado >= hoje
-    ).all()
+    filtros = [ChamadoExterno.status.notin_(['concluido', 'cancelado']), ChamadoExterno.prazo_combinado >= hoje]
+    if chamado_ids is not None:
+        filtros.append(ChamadoExterno.id.in_(chamado_ids))
+    else:
+        filtros.append(ChamadoExterno.prazo_combinado <= limite)
+    chamados = ChamadoExterno.query.filter(*filtros).all()
     
-    for ch in chamados:
-        msg = f"🔧 Lembrete GMM\n\nChamado: {ch.numero_chamado} vence em breve.\nPrazo: {ch.prazo_combinado.strftime('%d/%m %H:%M')}"
-        
-        # Cria registro de notificação
-        notif = HistoricoNotificacao(
-            chamado_id=ch.id,
-            tipo='lembrete',
-            destinatario=ch.terceirizado.telefone,
-            mensagem=msg,
-            prioridade=1 # Alta prioridade para lembretes
-        )
-        db.session.add(notif)
-        db.session.commit()
-        
-        # Dispara envio assíncrono (nova versão que usa apenas o ID)
-        enviar_whatsapp_task.delay(notif.id)
+    # Template compilado uma única vez para todo o lote
+    mensagens = TemplateService.render_lote('lembrete', [{
+        'numero_chamado': ch.numero_chamado,
+        'prazo': ch.prazo_combinado.strftime('%d/%m %H:%M'),
+        'horas': int((ch.prazo_combinado - hoje).total_seconds() // 3600)
+    } for ch in chamados])
+    
+    # Uma transação para todos os registros; lembretes têm prazo, então vão pela
+    # faixa normal (a de lote fica atrás de campanhas em massa)
+    NotificationService.enqueue_many([{
+        'chamado_id': ch.id,
+        'tipo': 'lembrete',
+        'destinatario': ch.terceirizado.telefone,
+        'mensagem': msg,
+        'prioridade': 1 # Alta prioridade para lembretes
+    } for ch, msg in zip(chamados, mensagens) if msg is not None])
+
+@shared_task
+def recalcular_feed_alertas():
+    """
+    Recalcula o feed de alertas e publica para os navegadores conectados (SSE).
+    Agendada após alterações em OS/estoque e pelo beat (OS entrando na janela de 24h).
+    """
+    snapshot = FeedAlertasService.recalcular()
+    return {'os': len(snapshot['os']), 'estoque': len(snapshot['estoque'])}
+
+@shared_task
+def sincronizar_prazos_task(alteracoes=None):
+    """
+    Atualiza a agenda de prazos após criação/edição de OS e chamados
+    (alteracoes = {'os': [ids], 'chamado': [ids]}; None reconstrói tudo).
+    """
+    if alteracoes is None:
+        totais = AgendaPrazosService.reconstruir()
+        FeedAlertasService.recalcular()
+        return totais
+
+    mudancas = {tipo: AgendaPrazosService.sincronizar(tipo, ids) for tipo, ids in alteracoes.items()}
+    if mudancas.get('os'):
+        # OS saiu da janela de alerta (concluída, prazo estendido...)
+        FeedAlertasService.recalcular()
+    return mudancas
+
+@shared_task
+def processar_prazos_task():
+    """
+    Emite os eventos de prazo vencidos na agenda ('aviso' ao entrar na janela,
+    'atraso' ao vencer), cada um uma única vez.
+    """
+    if not AgendaPrazosService._get_redis().exists(AgendaPrazosService.CONSTRUIDA):
+        AgendaPrazosService.reconstruir()
+
+    eventos = AgendaPrazosService.processar()
+    if any(tipo == 'os' for tipo, _, _ in eventos):
+        FeedAlertasService.recalcular()
+        DashboardCacheService.invalidar('os')
+
+    lembrar = [item_id for tipo, item_id, fase in eventos if tipo == 'chamado' and fase == 'aviso']
+    if lembrar:
+        lembretes_automaticos_task(chamado_ids=lembrar)
+    return {'eventos': len(eventos), 'lembretes': len(lembrar)}
+
+@shared_task
+def reconstruir_agenda_prazos_task():
+    """Reconstrução diária da agenda (corrige deriva de alterações fora do ORM)."""
+    totais = AgendaPrazosService.reconstruir()
+    FeedAlertasService.recalcular()
+    return totais
+
+@shared_task
+def reconciliar_estoque_task(reparar=False):
+    """
+    Confere os saldos (global e por unidade) contra o ledger de movimentações.
+    O agendamento diário só relata; reparar=True regrava as divergências.
+    """
+    return EstoqueService.reconciliar_saldos(reparar=reparar)
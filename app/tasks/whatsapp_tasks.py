@@ -4,9 +4,13 @@ import json
 import hashlib
 from app.extensions import db
 from app.models.terceirizados_models import HistoricoNotificacao
-from app.models.whatsapp_models import EstadoConversa, MetricasWhatsApp
+from app.models.whatsapp_models import EstadoConversa, MetricasWhatsApp, NotificacaoDeadLetter
 from app.services.whatsapp_service import WhatsAppService
 from app.services.roteamento_service import RoteamentoService
+from app.services.filas_service import FilaService, RemetenteOcupadoError
+from app.services.backlog_service import BacklogService
+from app.services.arquivo_service import ArquivoService
+from app.services.retry_policy import RetryPolicy
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,11 +22,26 @@ def verificar_saude_whatsapp():
     """Verifica saúde do sistema e dispara alertas."""
     AlertaService.verificar_saude()
 
-@shared_task
-def processar_mensagem_inbound(remetente: str, texto: str, timestamp: float):
+@shared_task(bind=True, max_retries=10)
+def processar_mensagem_inbound(self, remetente: str, texto: str, timestamp: float):
     """
     Processa mensagem recebida (Inbound) assincronamente.
+    Enfileirada na partição do remetente (FilaService.fila_inbound), então
+    mensagens do mesmo telefone são processadas em ordem.
+    Se outro worker segura o lock do remetente, volta para a mesma partição
+    com countdown em vez de processar em paralelo.
     """
+    try:
+        with FilaService.trava_remetente(remetente):
+            _processar_inbound(remetente, texto)
+    except RemetenteOcupadoError as e:
+        raise self.retry(
+            exc=e,
+            countdown=5 * (self.request.retries + 1),
+            queue=FilaService.fila_inbound(remetente)
+        )
+
+def _processar_inbound(remetente: str, texto: str):
     try:
         # Rotear
         resultado = RoteamentoService.processar(remetente, texto)
@@ -49,14 +68,16 @@ def processar_mensagem_inbound(remetente: str, texto: str, timestamp: float):
         logger.error(f"Erro ao processar inbound: {e}")
         WhatsAppService.enviar_mensagem(remetente, "❌ Erro ao processar sua mensagem. Tente novamente.")
 
-@shared_task(bind=True, max_retries=3)
+# max_retries=None: o limite de tentativas vem da RetryPolicy (por classe de erro)
+@shared_task(bind=True, max_retries=None)
 def enviar_whatsapp_task(self, notificacao_id: int):
     """
     Task assíncrona para envio de WhatsApp.
     - Busca notificação no banco
     - Chama WhatsAppService.enviar_mensagem()
     - Atualiza status e tentativas
-    - Retry com backoff exponencial: 1min, 5min, 25min (baseado na fórmula do PRD)
+    - Retry com backoff exponencial e jitter, conforme a classe do erro (RetryPolicy)
+    - Esgotadas as tentativas, registra na dead-letter (whatsapp_dead_letter)
     """
     notificacao = HistoricoNotificacao.query.get(notificacao_id)
     if not notificacao:
@@ -66,11 +87,15 @@ def enviar_whatsapp_task(self, notificacao_id: int):
     if not notificacao.mensagem_hash:
         notificacao.mensagem_hash = hashlib.sha256(notificacao.mensagem.encode()).hexdigest()
 
+    # Faixa em que a task chegou (urgente/normal/lote); None em modo eager
+    delivery_info = self.request.delivery_info or {}
+
     sucesso, resposta = WhatsAppService.enviar_mensagem(
         telefone=notificacao.destinatario,
         texto=notificacao.mensagem,
         prioridade=notificacao.prioridade,
-        notificacao_id=notificacao.id
+        notificacao_id=notificacao.id,
+        fila=delivery_info.get('routing_key')
     )
 
     # Se foi enfileirado pelo Rate Limiter, a task atual termina com sucesso
@@ -82,20 +107,48 @@ def enviar_whatsapp_task(self, notificacao_id: int):
     notificacao.resposta_api = json.dumps(resposta) if isinstance(resposta, dict) else str(resposta)
 
     if sucesso:
-        notificacao.status_envio = 'enviado'
-        notificacao.enviado_em = datetime.utcnow()
-        db.session.commit()
+        _sair_de_pendente(notificacao, status_envio='enviado', enviado_em=datetime.utcnow())
         return {"status": "success", "notificacao_id": notificacao_id}
     else:
-        # Retry logic: 1min, 5min, 25min
-        if notificacao.tentativas < self.max_retries:
-            delay = 60 * (5 ** (notificacao.tentativas - 1))
+        classe, delay = RetryPolicy.decidir(resposta, notificacao.tentativas)
+        if delay is not None:
             db.session.commit()
             raise self.retry(countdown=delay)
         else:
-            notificacao.status_envio = 'falhou'
-            db.session.commit()
-            return {"status": "failed", "error": resposta}
+            dead_letter = NotificacaoDeadLetter(
+                notificacao_id=notificacao.id,
+                classe_erro=classe,
+                erro=notificacao.resposta_api,
+                tentativas=notificacao.tentativas
+            )
+            _sair_de_pendente(notificacao, dead_letter=dead_letter, status_envio='falhou')
+            return {"status": "failed", "classe": classe, "error": resposta}
+
+def _sair_de_pendente(notificacao, dead_letter=None, **valores):
+    """
+    Transição pendente -> estado final via UPDATE condicional.
+    Só quem efetivamente tirou a linha de 'pendente' decrementa o contador
+    do backlog (entregas duplicadas da task não contam duas vezes) e grava
+    a entrada de dead-letter, na mesma transação.
+    """
+    db.session.flush()
+    alteradas = HistoricoNotificacao.query.filter_by(
+        id=notificacao.id, status_envio='pendente'
+    ).update(valores, synchronize_session=False)
+    if alteradas and dead_letter is not None:
+        db.session.add(dead_letter)
+    db.session.commit()
+    BacklogService.decrementar(alteradas)
+
+@shared_task
+def reconciliar_backlog_whatsapp():
+    """Recalcula o contador de pendentes a partir do banco (corrige deriva)."""
+    return {"pendentes": BacklogService.reconciliar()}
+
+@shared_task
+def arquivar_historico_notificacoes():
+    """Move notificações além da retenção (ARQUIVO_HISTORICO_DIAS) para o arquivo gzip."""
+    return ArquivoService.arquivar()
 
 @shared_task
 def limpar_estados_expirados():
@@ -1,16 +1,15 @@
 from functools import wraps
-from flask import request, abort, flash, redirect, url_for
+from flask import request, abort, flash, redirect, url_for, current_app
 from flask_login import current_user
 from app.models.models import Unidade
+from app.utils.ip_allowlist import ip_do_cliente, lista_em_cache, compilar_unidade
 
 def get_real_ip():
     """
-    Obtém o IP real do cliente, considerando proxies (X-Forwarded-For).
+    Obtém o IP real do cliente, considerando só proxies confiáveis (TRUSTED_PROXIES)
+    no X-Forwarded-For.
     """
-    if request.headers.getlist("X-Forwarded-For"):
-        # Pega o primeiro IP da lista (o do cliente original)
-        return request.headers.getlist("X-Forwarded-For")[0].split(',')[0].strip()
-    return request.remote_addr
+    return ip_do_cliente()
 
 def require_unit_ip(f):
     @wraps(f)
@@ -25,24 +24,24 @@ def require_unit_ip(f):
         if not unidade_id:
              return f(*args, **kwargs)
 
-        unidade = Unidade.query.get(unidade_id)
-        if not unidade:
+        try:
+            unidade_id = int(unidade_id)
+        except ValueError:
             abort(404)
 
+        # Allow-list compilada em cache: só consulta a unidade no miss
+        faixas = lista_em_cache(unidade_id)
+        if faixas is None:
+            unidade = Unidade.query.get(unidade_id)
+            if not unidade:
+                abort(404)
+            faixas = compilar_unidade(unidade)
+
         user_ip = get_real_ip()
-        
-        # Lógica de Range
-        faixas_permitidas = [ip.strip() for ip in unidade.faixa_ip_permitida.split(',')]
-        
-        ip_valido = False
-        for faixa in faixas_permitidas:
-            # Suporta correspondência exata ou sub-rede simples (startswith)
-            if user_ip.startswith(faixa):
-                ip_valido = True
-                break
+        ip_valido = faixas.contem(user_ip)
         
         # Permite localhost para testes se configurado
-        if user_ip in ['127.0.0.1', '::1']:
+        if user_ip in ['127.0.0.1', '::1'] and current_app.config.get('IP_ALLOWLIST_PERMITIR_LOCALHOST', True):
             ip_valido = True
 
         if not ip_valido:
@@ -0,0 +1,80 @@
+"""
+Invalidação orientada a eventos.
+Os models alterados num flush são anotados por tópico em session.info e, só
+depois do commit, os handlers registrados para o tópico são chamados com os
+ids afetados. Rollback descarta as anotações.
+
+Handlers rodam fora da transação: devem apenas tocar Redis ou agendar tasks,
+nunca consultar/alterar o banco pela mesma sessão.
+
+Uso:
+    @ao_alterar('os', 'estoque')
+    def invalidar(alteracoes):  # {'os': {1, 2}, 'estoque': {7}}
+        ...
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Tabela -> tópico de invalidação
+TOPICOS = {
+    'ordens_servico': 'os',
+    'estoque': 'estoque',
+    'estoque_saldo': 'estoque',
+    'movimentacoes_estoque': 'estoque',
+    'chamados_externos': 'chamado',
+    'registros_ponto': 'ponto',
+    'unidades': 'unidade',
+}
+
+_handlers = []
+_instalado = False
+
+def ao_alterar(*topicos):
+    """Registra um handler chamado após o commit quando algum dos tópicos mudar."""
+    def decorador(funcao):
+        _handlers.append((set(topicos), funcao))
+        return funcao
+    return decorador
+
+def _anotar(session, flush_context):
+    alteracoes = session.info.setdefault('invalidacao', {})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        topico = TOPICOS.get(getattr(obj, '__tablename__', None))
+        if topico is None:
+            continue
+        if obj in session.dirty and not session.is_modified(obj):
+            continue
+        alteracoes.setdefault(topico, set()).add(getattr(obj, 'id', None))
+
+def _despachar(session):
+    alteracoes = session.info.pop('invalidacao', None)
+    if not alteracoes:
+        return
+    for topicos, funcao in _handlers:
+        selecionadas = {t: ids for t, ids in alteracoes.items() if t in topicos}
+        if not selecionadas:
+            continue
+        try:
+            funcao(selecionadas)
+        except Exception as e:
+            # Invalidação nunca derruba a requisição que já fez commit
+            if has_app_context():
+                current_app.logger.error(f"Falha no handler de invalidação {funcao.__name__}: {e}")
+
+def _descartar(session, *args):
+    session.info.pop('invalidacao', None)
+
+def marcar(session, topico, *ids):
+    """Anota manualmente (ex.: UPDATE em massa via query.update, que não passa pelo flush)."""
+    session.info.setdefault('invalidacao', {}).setdefault(topico, set()).update(ids or {None})
+
+def init_invalidacao(app):
+    """Instala os listeners de sessão (uma vez por processo)."""
+    global _instalado
+    if _instalado:
+        return
+    event.listen(Session, 'after_flush', _anotar)
+    event.listen(Session, 'after_commit', _despachar)
+    event.listen(Session, 'after_rollback', _descartar)
+    _instalado = True
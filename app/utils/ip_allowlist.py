@@ -0,0 +1,149 @@
+"""
+Allow-list de IPs por unidade (check-in do ponto).
+- Entradas aceitas em faixa_ip_permitida (separadas por vírgula):
+  IP único (10.0.0.5, 2001:db8::1), CIDR (10.0.0.0/24, 2001:db8::/48),
+  intervalo (10.0.0.10-10.0.0.50), curinga (192.168.1.*) e o prefixo legado
+  por octetos ("192.168.1" ou "192.168.1." = 192.168.1.0/24; "10.0.1" não casa com 10.0.10.x)
+- Compilada em intervalos inteiros ordenados e mesclados: consulta por bisect, O(log n)
+- Cache por unidade no processo (TTL IP_ALLOWLIST_TTL), invalidado no commit que edita a unidade
+- IP do cliente via X-Forwarded-For só através de proxies confiáveis (TRUSTED_PROXIES)
+"""
+import bisect
+import ipaddress
+import threading
+import time
+from flask import current_app, request
+from app.utils.invalidacao import ao_alterar
+
+# Só loopback: a faixa do balanceador precisa vir explícita em TRUSTED_PROXIES,
+# senão qualquer host da rede privada forjaria o IP do check-in via X-Forwarded-For
+PROXIES_PADRAO = '127.0.0.0/8, ::1'
+
+def _rede(entrada: str):
+    """Uma entrada da faixa -> (versão, início, fim) inteiros. ValueError se inválida."""
+    entrada = entrada.strip()
+    if '-' in entrada:
+        inicio, fim = (ipaddress.ip_address(parte.strip()) for parte in entrada.split('-', 1))
+        if inicio.version != fim.version or int(fim) < int(inicio):
+            raise ValueError(f"Intervalo inválido: {entrada}")
+        return inicio.version, int(inicio), int(fim)
+
+    if ':' not in entrada and '/' not in entrada:
+        octetos = [o for o in entrada.rstrip('.').split('.') if o != '*']
+        if len(octetos) < 4 or entrada.endswith('*'):
+            # Prefixo legado / curinga: completa com zeros e usa o prefixo dos octetos informados
+            if not octetos:
+                raise ValueError(f"Faixa inválida: {entrada}")
+            entrada = '.'.join(octetos + ['0'] * (4 - len(octetos))) + f"/{8 * len(octetos)}"
+
+    rede = ipaddress.ip_network(entrada, strict=False)
+    return rede.version, int(rede.network_address), int(rede.broadcast_address)
+
+class ListaIPs:
+    """Conjunto de faixas compilado em intervalos [início, fim] por versão de IP."""
+
+    def __init__(self, intervalos):
+        self._inicios = {}
+        self._fins = {}
+        for versao in (4, 6):
+            mesclados = []
+            for inicio, fim in sorted((i, f) for v, i, f in intervalos if v == versao):
+                if mesclados and inicio <= mesclados[-1][1] + 1:
+                    mesclados[-1][1] = max(mesclados[-1][1], fim)
+                else:
+                    mesclados.append([inicio, fim])
+            self._inicios[versao] = [i for i, _ in mesclados]
+            self._fins[versao] = [f for _, f in mesclados]
+
+    @classmethod
+    def compilar(cls, faixas: str, estrito: bool = False):
+        """
+        Compila a string da unidade. Entradas inválidas são ignoradas (com log),
+        ou levantam ValueError com estrito=True (validação no cadastro).
+        """
+        intervalos = []
+        for entrada in (faixas or '').split(','):
+            if not entrada.strip():
+                continue
+            try:
+                intervalos.append(_rede(entrada))
+            except ValueError:
+                if estrito:
+                    raise ValueError(f"Faixa de IP inválida: '{entrada.strip()}'")
+                current_app.logger.warning(f"Faixa de IP inválida ignorada: '{entrada.strip()}'")
+        return cls(intervalos)
+
+    def contem(self, ip) -> bool:
+        try:
+            endereco = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        if endereco.version == 6 and endereco.ipv4_mapped:
+            endereco = endereco.ipv4_mapped
+        inicios = self._inicios[endereco.version]
+        posicao = bisect.bisect_right(inicios, int(endereco)) - 1
+        return posicao >= 0 and int(endereco) <= self._fins[endereco.version][posicao]
+
+# ---- Cache por unidade ----
+
+_cache = {}
+_cache_lock = threading.Lock()
+_proxies = {}
+
+def lista_em_cache(unidade_id):
+    """Lista já compilada (sem consultar o banco), ou None se ausente/expirada."""
+    with _cache_lock:
+        item = _cache.get(unidade_id)
+    if item and item[1] > time.monotonic():
+        return item[0]
+    return None
+
+def compilar_unidade(unidade):
+    """Compila a faixa da unidade e guarda no cache do processo."""
+    lista = ListaIPs.compilar(unidade.faixa_ip_permitida)
+    with _cache_lock:
+        _cache[unidade.id] = (lista, time.monotonic() + current_app.config.get('IP_ALLOWLIST_TTL', 60))
+    return lista
+
+def invalidar(*unidade_ids):
+    with _cache_lock:
+        if not unidade_ids or None in unidade_ids:
+            _cache.clear()
+        for unidade_id in unidade_ids:
+            _cache.pop(unidade_id, None)
+
+@ao_alterar('unidade')
+def _invalidar_unidades(alteracoes):
+    # Outros processos convergem pelo TTL
+    invalidar(*alteracoes['unidade'])
+
+# ---- IP real do cliente ----
+
+def proxies_confiaveis() -> ListaIPs:
+    faixas = current_app.config.get('TRUSTED_PROXIES') or PROXIES_PADRAO
+    lista = _proxies.get(faixas)
+    if lista is None:
+        lista = _proxies[faixas] = ListaIPs.compilar(faixas)
+    return lista
+
+def ip_do_cliente() -> str:
+    """
+    Percorre X-Forwarded-For da direita para a esquerda enquanto o salto for um
+    proxy confiável; o primeiro IP não confiável é o cliente. Sem proxy
+    confiável na frente, o cabeçalho é ignorado (poderia ser forjado).
+    """
+    proxies = proxies_confiaveis()
+    ip = request.remote_addr
+    if not ip or not proxies.contem(ip):
+        return ip
+
+    saltos = [s.strip() for valor in request.headers.getlist('X-Forwarded-For') for s in valor.split(',')]
+    for salto in reversed([s for s in saltos if s]):
+        try:
+            ipaddress.ip_address(salto)
+        except ValueError:
+            break
+        ip = salto
+        if not proxies.contem(salto):
+            break
+    return ip
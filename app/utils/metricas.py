@@ -0,0 +1,184 @@
+"""
+Métricas Prometheus (exposição em /metrics).
+- Latência HTTP por endpoint (histograma) e contagem por status
+- Duração e resultado das tasks Celery (sinais task_prerun/postrun/retry/failure)
+- Conexões do pool SQLAlchemy em uso (eventos checkout/checkin)
+- Rejeições do rate limiter do WhatsApp
+- No scrape: estado do circuit breaker, profundidade das filas de envio,
+  backlog de pendentes e clientes conectados no Redis
+
+Com vários workers gunicorn/Celery, defina PROMETHEUS_MULTIPROC_DIR (diretório
+vazio e gravável, limpo a cada deploy): cada processo grava seus valores lá e
+/metrics agrega todos. Ver gunicorn.conf.py.
+"""
+import os
+import time
+from flask import g, request, Response, current_app, abort
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+
+MULTIPROCESSO = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+HTTP_LATENCIA = Histogram(
+    'gmm_http_request_duration_seconds', 'Latência dos requests HTTP',
+    ['endpoint', 'metodo'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+HTTP_REQUESTS = Counter(
+    'gmm_http_requests_total', 'Requests HTTP por status',
+    ['endpoint', 'metodo', 'status']
+)
+TASK_DURACAO = Histogram(
+    'gmm_celery_task_duration_seconds', 'Duração das tasks Celery',
+    ['task'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+TASK_RESULTADO = Counter(
+    'gmm_celery_task_total', 'Execuções de tasks Celery por resultado',
+    ['task', 'resultado']  # sucesso, falha, retry
+)
+DB_POOL_EM_USO = Gauge(
+    'gmm_db_pool_connections_in_use', 'Conexões do pool SQLAlchemy em uso',
+    multiprocess_mode='livesum'
+)
+DB_POOL_TAMANHO = Gauge(
+    'gmm_db_pool_size', 'Tamanho configurado do pool SQLAlchemy',
+    multiprocess_mode='livesum'
+)
+RATE_LIMIT_REJEICOES = Counter(
+    'gmm_whatsapp_rate_limit_rejections_total', 'Envios adiados pelo rate limiter do WhatsApp'
+)
+
+ESTADOS_CIRCUITO = {'CLOSED': 0, 'HALF_OPEN': 1, 'OPEN': 2}
+
+_inicio_tasks = {}
+_instalado = False
+
+class ColetorScrape:
+    """
+    Valores lidos do Redis no momento do scrape (iguais para todos os processos,
+    por isso não passam pelo modo multiprocesso).
+    """
+
+    def collect(self):
+        from app.services.backlog_service import BacklogService
+        from app.services.circuit_breaker import CircuitBreaker
+        from app.services.filas_service import FilaService
+
+        estado = GaugeMetricFamily(
+            'gmm_whatsapp_circuit_breaker_state', 'Circuit breaker (0=CLOSED, 1=HALF_OPEN, 2=OPEN)'
+        )
+        estado.add_metric([], ESTADOS_CIRCUITO.get(CircuitBreaker.get_state(), 0))
+        yield estado
+
+        filas = GaugeMetricFamily('gmm_whatsapp_queue_depth', 'Mensagens aguardando por faixa de envio', labels=['fila'])
+        for fila, total in FilaService.profundidades().items():
+            if total is not None:
+                filas.add_metric([fila], total)
+        yield filas
+
+        pendentes = GaugeMetricFamily('gmm_whatsapp_backlog_pending', 'Notificações com status pendente')
+        pendentes.add_metric([], BacklogService.pendentes())
+        yield pendentes
+
+        try:
+            info = FilaService._get_redis().info('clients')
+        except Exception:
+            return
+        clientes = GaugeMetricFamily('gmm_redis_clients', 'Clientes do Redis (broker)', labels=['estado'])
+        clientes.add_metric(['conectados'], info.get('connected_clients', 0))
+        clientes.add_metric(['bloqueados'], info.get('blocked_clients', 0))
+        if info.get('maxclients'):
+            clientes.add_metric(['maximo'], info['maxclients'])
+        yield clientes
+
+# ---- HTTP ----
+
+def _iniciar_request():
+    g._metricas_inicio = time.perf_counter()
+
+def _finalizar_request(response):
+    inicio = g.pop('_metricas_inicio', None)
+    endpoint = request.endpoint or 'nao_encontrado'
+    if inicio is None or endpoint in ('metricas', 'static'):
+        return response
+    HTTP_LATENCIA.labels(endpoint, request.method).observe(time.perf_counter() - inicio)
+    HTTP_REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+def expor_metricas():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        abort(403)
+
+    if MULTIPROCESSO:
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    saida = generate_latest(registro)
+
+    scrape = CollectorRegistry()
+    scrape.register(ColetorScrape())
+    saida += generate_latest(scrape)
+    return Response(saida, mimetype=CONTENT_TYPE_LATEST)
+
+# ---- Celery ----
+
+def _task_prerun(task_id=None, task=None, **kwargs):
+    _inicio_tasks[task_id] = time.perf_counter()
+
+def _task_postrun(task_id=None, task=None, state=None, **kwargs):
+    inicio = _inicio_tasks.pop(task_id, None)
+    if inicio is not None:
+        TASK_DURACAO.labels(task.name).observe(time.perf_counter() - inicio)
+    if state == 'SUCCESS':
+        TASK_RESULTADO.labels(task.name, 'sucesso').inc()
+
+def _task_retry(sender=None, **kwargs):
+    TASK_RESULTADO.labels(sender.name, 'retry').inc()
+
+def _task_failure(sender=None, **kwargs):
+    TASK_RESULTADO.labels(sender.name, 'falha').inc()
+
+def _worker_process_shutdown(pid=None, **kwargs):
+    if MULTIPROCESSO:
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+# ---- Pool do banco ----
+
+def _pool_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_EM_USO.inc()
+
+def _pool_checkin(dbapi_connection, connection_record):
+    DB_POOL_EM_USO.dec()
+
+def init_metricas(app):
+    """Registra hooks HTTP, sinais Celery, eventos de pool e a rota /metrics."""
+    global _instalado
+    if not _instalado:
+        from celery.signals import task_prerun, task_postrun, task_retry, task_failure, worker_process_shutdown
+        task_prerun.connect(_task_prerun, weak=False)
+        task_postrun.connect(_task_postrun, weak=False)
+        task_retry.connect(_task_retry, weak=False)
+        task_failure.connect(_task_failure, weak=False)
+        worker_process_shutdown.connect(_worker_process_shutdown, weak=False)
+
+        event.listen(Pool, 'checkout', _pool_checkout)
+        event.listen(Pool, 'checkin', _pool_checkin)
+        _instalado = True
+
+    from app.extensions import db
+    with app.app_context():
+        pool = db.engine.pool
+        if hasattr(pool, 'size'):
+            DB_POOL_TAMANHO.set(pool.size())
+
+    app.before_request(_iniciar_request)
+    app.after_request(_finalizar_request)
+    app.add_url_rule('/metrics', 'metricas', expor_metricas)
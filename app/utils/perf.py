@@ -0,0 +1,154 @@
+"""
+Instrumentação de SQL por requisição.
+- Conta statements e tempo de banco de cada request (hooks globais do Engine)
+- Detecta N+1: o mesmo statement (normalizado) repetido muitas vezes no request
+- Devolve Server-Timing (db / app) para o DevTools do navegador
+- Loga queries acima de SQL_SLOW_QUERY_MS
+- Guarda os últimos requests num buffer circular exibido em /admin/perf
+"""
+import re
+import time
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from flask import g, request, has_request_context, has_app_context, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LISTA_PARAMS = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)")
+_ESPACOS = re.compile(r"\s+")
+
+_historico = deque(maxlen=200)
+_historico_lock = threading.Lock()
+_instalado = False
+
+def fingerprint(statement: str) -> str:
+    """Normaliza o SQL (literais e listas IN) para agrupar execuções repetidas."""
+    sql = _LITERAIS.sub('?', statement)
+    sql = _LISTA_PARAMS.sub('(?)', sql)
+    return _ESPACOS.sub(' ', sql).strip()
+
+def _antes_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('perf_inicio', []).append(time.perf_counter())
+
+def _depois_execute(conn, cursor, statement, parameters, context, executemany):
+    pilha = conn.info.get('perf_inicio')
+    if not pilha:
+        return
+    duracao_ms = (time.perf_counter() - pilha.pop()) * 1000
+
+    if not has_app_context():
+        return
+
+    if duracao_ms >= current_app.config.get('SQL_SLOW_QUERY_MS', 200):
+        origem = request.endpoint if has_request_context() else 'fora de request'
+        current_app.logger.warning(f"Slow query ({duracao_ms:.0f}ms) em {origem}: {statement[:500]}")
+
+    stats = g.get('_perf') if has_request_context() else None
+    if stats is None:
+        return
+    stats['queries'] += 1
+    stats['tempo_db_ms'] += duracao_ms
+    stats['fingerprints'][fingerprint(statement)] += 1
+    if duracao_ms >= current_app.config.get('SQL_SLOW_QUERY_MS', 200):
+        stats['lentas'].append({'sql': statement[:500], 'ms': round(duracao_ms, 1)})
+
+def _erro_execute(contexto):
+    # Statement que falhou não chega ao after_cursor_execute
+    if contexto.connection is not None:
+        pilha = contexto.connection.info.get('perf_inicio')
+        if pilha:
+            pilha.pop()
+
+def _iniciar_request():
+    g._perf = {
+        'inicio': time.perf_counter(),
+        'queries': 0,
+        'tempo_db_ms': 0.0,
+        'fingerprints': Counter(),
+        'lentas': []
+    }
+
+def _finalizar_request(response):
+    stats = g.pop('_perf', None)
+    if stats is None or request.endpoint == 'static':
+        return response
+
+    total_ms = (time.perf_counter() - stats['inicio']) * 1000
+    limiar = current_app.config.get('PERF_N_MAIS_1_LIMIAR', 5)
+    repetidas = [(sql, n) for sql, n in stats['fingerprints'].most_common(5) if n >= limiar]
+
+    if repetidas:
+        current_app.logger.warning(
+            f"Possível N+1 em {request.endpoint}: {repetidas[0][1]}x {repetidas[0][0][:200]}"
+        )
+
+    if current_app.config.get('PERF_SERVER_TIMING', True):
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats["tempo_db_ms"]:.1f};desc="{stats["queries"]} queries", '
+            f'app;dur={max(0.0, total_ms - stats["tempo_db_ms"]):.1f}'
+        )
+
+    registro = {
+        'quando': datetime.now(),
+        'metodo': request.method,
+        'endpoint': request.endpoint,
+        'path': request.path,
+        'status': response.status_code,
+        'duracao_ms': round(total_ms, 1),
+        'queries': stats['queries'],
+        'tempo_db_ms': round(stats['tempo_db_ms'], 1),
+        'n_mais_1': repetidas,
+        'lentas': stats['lentas'][:5]
+    }
+    with _historico_lock:
+        _historico.append(registro)
+    return response
+
+def historico() -> list:
+    """Requests recentes, mais novos primeiro."""
+    with _historico_lock:
+        return list(reversed(_historico))
+
+def resumo_por_endpoint() -> list:
+    """Agrega o buffer por endpoint: média/máximo de queries e tempo."""
+    grupos = {}
+    for r in historico():
+        grupo = grupos.setdefault(r['endpoint'], {'endpoint': r['endpoint'], 'requests': 0, 'queries': 0, 'max_queries': 0, 'duracao_ms': 0.0, 'tempo_db_ms': 0.0})
+        grupo['requests'] += 1
+        grupo['queries'] += r['queries']
+        grupo['max_queries'] = max(grupo['max_queries'], r['queries'])
+        grupo['duracao_ms'] += r['duracao_ms']
+        grupo['tempo_db_ms'] += r['tempo_db_ms']
+
+    resumo = []
+    for grupo in grupos.values():
+        n = grupo['requests']
+        resumo.append({
+            'endpoint': grupo['endpoint'],
+            'requests': n,
+            'media_queries': round(grupo['queries'] / n, 1),
+            'max_queries': grupo['max_queries'],
+            'media_ms': round(grupo['duracao_ms'] / n, 1),
+            'media_db_ms': round(grupo['tempo_db_ms'] / n, 1)
+        })
+    return sorted(resumo, key=lambda r: r['media_queries'], reverse=True)
+
+def init_perf(app):
+    """Registra os hooks (Engine global + before/after_request do app)."""
+    global _historico, _instalado
+    if not _instalado:
+        event.listen(Engine, 'before_cursor_execute', _antes_execute)
+        event.listen(Engine, 'after_cursor_execute', _depois_execute)
+        event.listen(Engine, 'handle_error', _erro_execute)
+        _instalado = True
+
+    tamanho = app.config.get('PERF_HISTORICO', 200)
+    if _historico.maxlen != tamanho:
+        with _historico_lock:
+            _historico = deque(_historico, maxlen=tamanho)
+
+    app.before_request(_iniciar_request)
+    app.after_request(_finalizar_request)
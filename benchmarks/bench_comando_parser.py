@@ -0,0 +1,71 @@
+"""
+Micro-benchmark do ComandoParser.
+
+Compara o parser de padrão único (ComandoParser.parse) com a abordagem
+sequencial antiga (um re.match por comando) em entradas típicas e adversariais.
+
+Uso:
+    python benchmarks/bench_comando_parser.py [--repeticoes 200000]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.comando_parser import ComandoParser
+import app.services.comando_executores  # noqa: F401 - registra os comandos
+
+LEGADO = {
+    '#COMPRA': r'#COMPRA\s+([A-Z0-9\-]+)\s+(\d+\.?\d*)',
+    '#STATUS': r'#STATUS',
+    '#AJUDA': r'#AJUDA'
+}
+
+def parse_legado(texto):
+    if not texto:
+        return None
+    texto = texto.strip().upper()
+    for cmd, pattern in LEGADO.items():
+        if re.match(pattern, texto):
+            return cmd
+    return None
+
+ENTRADAS = {
+    # Típicas
+    'compra': '#COMPRA CABO-10MM 50',
+    'status': '#status',
+    'ajuda': '#AJUDA',
+    'resposta_sim': 'SIM',
+    'texto_livre': 'Bom dia, o técnico chega que horas amanhã?',
+    # Adversariais
+    'compra_sem_qtd_longa': '#COMPRA ' + 'A' * 5000,
+    'compra_separadores': '#COMPRA ' + 'A-' * 2500 + ' X',
+    'hashtag_repetida': '#' * 10000,
+    'texto_gigante': 'lorem ipsum ' * 2000,
+    'espacos': ' ' * 10000 + '#STATUS',
+}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--repeticoes', type=int, default=200000)
+    args = ap.parse_args()
+
+    # Sanidade: os dois parsers concordam no comando identificado
+    for nome, texto in ENTRADAS.items():
+        novo = ComandoParser.parse(texto)
+        legado = parse_legado(texto)
+        assert (novo['comando'] if novo else None) == (legado.replace('#', '') if legado else None), nome
+
+    print(f"{'entrada':<24}{'novo (us)':>12}{'legado (us)':>14}{'ganho':>8}")
+    for nome, texto in ENTRADAS.items():
+        # Entradas longas rodam menos vezes para manter o tempo total razoável
+        n = args.repeticoes if len(texto) < 200 else max(1, args.repeticoes // 200)
+        t_novo = timeit.timeit(lambda: ComandoParser.parse(texto), number=n) / n * 1e6
+        t_legado = timeit.timeit(lambda: parse_legado(texto), number=n) / n * 1e6
+        print(f"{nome:<24}{t_novo:>12.3f}{t_legado:>14.3f}{t_legado / t_novo:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
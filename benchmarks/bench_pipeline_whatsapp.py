@@ -0,0 +1,310 @@
+"""
+Teste de carga do pipeline de notificações WhatsApp.
+
+Sobe uma MegaAPI falsa local (latência e taxa de erro configuráveis) e mede:
+- outbound: NotificationService.enqueue_many -> enviar_whatsapp_task -> MegaAPI
+- inbound:  POST /webhook/whatsapp -> processar_mensagem_inbound -> RoteamentoService
+            -> WhatsAppService.enviar_mensagem -> MegaAPI
+
+Relata mensagens/s, latência p50/p95/p99 e queries SQL por mensagem.
+
+Modos:
+- eager (padrão): Celery em modo eager (tudo no processo do benchmark).
+  Redis via fakeredis[lua] (o lock por remetente usa scripts Lua), ou
+  --redis-url para um Redis local.
+- worker: publica no broker (--redis-url) e espera workers reais consumirem.
+  Latência = criado_em -> enviado_em de cada notificação. Os workers precisam
+  usar o mesmo banco (--db) e MEGA_API_URL apontando para a API falsa.
+
+Uso:
+    python benchmarks/bench_pipeline_whatsapp.py [--mensagens 500] [--latencia-ms 50]
+        [--taxa-erro 0.0] [--modo eager|worker] [--redis-url redis://localhost:6379/15]
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# ---- MegaAPI falsa ----
+
+class MegaAPIFalsa:
+    """Servidor HTTP local que imita o endpoint de envio da MegaAPI."""
+
+    def __init__(self, latencia_ms=50, jitter_ms=10, taxa_erro=0.0, taxa_timeout=0.0):
+        self.latencia_ms = latencia_ms
+        self.jitter_ms = jitter_ms
+        self.taxa_erro = taxa_erro
+        self.taxa_timeout = taxa_timeout
+        self.recebidas = 0
+        self.erros = 0
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with api._lock:
+                    api.recebidas += 1
+                sorteio = random.random()
+                if sorteio < api.taxa_timeout:
+                    time.sleep(6)  # Acima do timeout de 5s do WhatsAppService
+                else:
+                    time.sleep(max(0, api.latencia_ms + random.uniform(-api.jitter_ms, api.jitter_ms)) / 1000)
+
+                if sorteio < api.taxa_timeout + api.taxa_erro:
+                    with api._lock:
+                        api.erros += 1
+                    status, corpo = 500, {'error': 'falha simulada'}
+                else:
+                    status, corpo = 200, {'status': 'sent', 'id': f"fake-{api.recebidas}"}
+
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def iniciar(self) -> str:
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._servidor.server_port}/v1/messages/send"
+
+    def parar(self):
+        if self._servidor:
+            self._servidor.shutdown()
+
+# ---- Medição ----
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, int(round(p / 100 * (len(ordenados) - 1)))))
+    return ordenados[k]
+
+class ContadorQueries:
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.total += 1
+
+def relatorio(nome, mensagens, duracao, latencias, queries):
+    print(f"\n== {nome} ==")
+    print(f"mensagens:          {mensagens}")
+    print(f"vazão:              {mensagens / duracao if duracao else 0:.1f} msg/s ({duracao:.2f}s)")
+    print(f"latência p50/p95/p99: {percentil(latencias, 50) * 1000:.1f} / "
+          f"{percentil(latencias, 95) * 1000:.1f} / {percentil(latencias, 99) * 1000:.1f} ms")
+    print(f"queries/mensagem:   {queries / mensagens if mensagens else 0:.1f}")
+
+# ---- Ambiente ----
+
+def preparar_ambiente(args):
+    """Banco SQLite temporário, Redis (fakeredis ou real) e app Flask/Celery."""
+    caminho_db = args.db or os.path.join(tempfile.mkdtemp(prefix='bench_whatsapp_'), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{caminho_db}"
+    if args.redis_url:
+        os.environ['CELERY_BROKER_URL'] = args.redis_url
+        os.environ['CELERY_RESULT_BACKEND'] = args.redis_url
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            sys.exit("fakeredis não instalado: pip install 'fakeredis[lua]', ou use --redis-url")
+        try:
+            import lupa  # noqa: F401
+        except ImportError:
+            # Sem Lua o release do lock por remetente falha e cada inbound
+            # espera o lock expirar: a vazão medida não significaria nada.
+            sys.exit("fakeredis sem suporte a Lua: pip install 'fakeredis[lua]', ou use --redis-url")
+        import redis
+        servidor = fakeredis.FakeServer()
+        redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(server=servidor)
+
+    from app import create_app
+    from app.extensions import db
+    from app.services.rate_limiter import RateLimiter
+
+    app = create_app()
+    app.config['MEGA_API_URL'] = args.api_url
+    app.config['MEGA_API_KEY'] = 'bench'
+    if args.modo == 'eager':
+        app.celery.conf.CELERY_ALWAYS_EAGER = True
+        app.celery.conf.CELERY_EAGER_PROPAGATES_EXCEPTIONS = False
+    # O benchmark mede o pipeline, não o limite de 60 msg/min
+    RateLimiter.LIMIT = 10 ** 9
+
+    with app.app_context():
+        db.create_all()
+    return app, caminho_db
+
+def telefones(n):
+    return [f"55119{i:08d}" for i in range(n)]
+
+# ---- Cenários ----
+
+def bench_outbound(app, args):
+    from celery.signals import task_prerun, task_postrun
+    from app.extensions import db
+    from app.models.terceirizados_models import HistoricoNotificacao
+    from app.services.notification_service import NotificationService
+
+    itens = [{
+        'destinatario': tel,
+        'mensagem': f"Lembrete de carga #{i}",
+        'tipo': 'lembrete'
+    } for i, tel in enumerate(telefones(args.mensagens))]
+
+    inicio_task = {}
+    latencias = []
+
+    def ao_iniciar(task_id=None, task=None, **kwargs):
+        if task.name.endswith('enviar_whatsapp_task'):
+            inicio_task[task_id] = time.perf_counter()
+
+    def ao_terminar(task_id=None, task=None, **kwargs):
+        if task_id in inicio_task:
+            latencias.append(time.perf_counter() - inicio_task.pop(task_id))
+
+    task_prerun.connect(ao_iniciar, weak=False)
+    task_postrun.connect(ao_terminar, weak=False)
+
+    with app.app_context():
+        contador = ContadorQueries()
+        from sqlalchemy import event
+        event.listen(db.engine, 'before_cursor_execute', contador)
+        try:
+            inicio = time.perf_counter()
+            ids = NotificationService.enqueue_many(itens, lote=True)
+
+            if args.modo == 'worker':
+                # Espera os workers drenarem a fila
+                while True:
+                    db.session.expire_all()
+                    restantes = HistoricoNotificacao.query.filter(
+                        HistoricoNotificacao.id.in_(ids),
+                        HistoricoNotificacao.status_envio == 'pendente'
+                    ).count()
+                    if not restantes or time.perf_counter() - inicio > args.timeout:
+                        break
+                    time.sleep(0.5)
+            duracao = time.perf_counter() - inicio
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contador)
+            task_prerun.disconnect(ao_iniciar)
+            task_postrun.disconnect(ao_terminar)
+
+        if args.modo == 'worker':
+            latencias = [
+                (n.enviado_em - n.criado_em).total_seconds()
+                for n in HistoricoNotificacao.query.filter(HistoricoNotificacao.id.in_(ids)).all()
+                if n.enviado_em
+            ]
+
+        status = dict(db.session.query(
+            HistoricoNotificacao.status_envio, db.func.count(HistoricoNotificacao.id)
+        ).filter(HistoricoNotificacao.id.in_(ids)).group_by(HistoricoNotificacao.status_envio).all())
+
+    relatorio('outbound (enqueue_many -> enviar_whatsapp_task)', len(ids), duracao, latencias, contador.total)
+    print(f"status finais:      {status}")
+
+def bench_inbound(app, args):
+    from app.extensions import db
+    from app.models.terceirizados_models import Terceirizado
+
+    remetentes = telefones(args.remetentes)
+    with app.app_context():
+        if not Terceirizado.query.filter(Terceirizado.telefone.in_(remetentes)).count():
+            db.session.add_all([
+                Terceirizado(nome=f"Prestador {i}", telefone=tel) for i, tel in enumerate(remetentes)
+            ])
+            db.session.commit()
+
+    segredo = app.config.get('WEBHOOK_SECRET', 'default-secret-dev')
+    textos = ['#STATUS', '#AJUDA', 'Bom dia, chego às 14h']
+    cliente = app.test_client()
+
+    latencias = []
+    with app.app_context():
+        contador = ContadorQueries()
+        from sqlalchemy import event
+        event.listen(db.engine, 'before_cursor_execute', contador)
+        try:
+            inicio = time.perf_counter()
+            for i in range(args.mensagens):
+                corpo = json.dumps({
+                    'data': {'from': remetentes[i % len(remetentes)], 'text': textos[i % len(textos)]}
+                }).encode()
+                assinatura = hmac.new(segredo.encode(), corpo, hashlib.sha256).hexdigest()
+                t0 = time.perf_counter()
+                resposta = cliente.post(
+                    '/webhook/whatsapp', data=corpo,
+                    headers={'Content-Type': 'application/json', 'X-Webhook-Signature': assinatura}
+                )
+                latencias.append(time.perf_counter() - t0)
+                if resposta.status_code != 200:
+                    print(f"webhook respondeu {resposta.status_code}: {resposta.get_data(as_text=True)[:200]}")
+            duracao = time.perf_counter() - inicio
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contador)
+
+    titulo = 'inbound (webhook -> processar_mensagem_inbound -> resposta)'
+    if args.modo == 'worker':
+        titulo = 'inbound (apenas webhook; processamento nos workers)'
+    relatorio(titulo, args.mensagens, duracao, latencias, contador.total)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--mensagens', type=int, default=500)
+    ap.add_argument('--remetentes', type=int, default=20)
+    ap.add_argument('--latencia-ms', type=float, default=50)
+    ap.add_argument('--jitter-ms', type=float, default=10)
+    ap.add_argument('--taxa-erro', type=float, default=0.0)
+    ap.add_argument('--taxa-timeout', type=float, default=0.0)
+    ap.add_argument('--modo', choices=['eager', 'worker'], default='eager')
+    ap.add_argument('--redis-url', default=None)
+    ap.add_argument('--db', default=None, help='Arquivo SQLite (padrão: temporário)')
+    ap.add_argument('--cenario', choices=['todos', 'outbound', 'inbound'], default='todos')
+    ap.add_argument('--timeout', type=float, default=600, help='Espera máxima no modo worker (s)')
+    args = ap.parse_args()
+
+    if args.modo == 'worker' and not args.redis_url:
+        sys.exit("--modo worker precisa de --redis-url (broker compartilhado com os workers)")
+
+    api = MegaAPIFalsa(args.latencia_ms, args.jitter_ms, args.taxa_erro, args.taxa_timeout)
+    args.api_url = api.iniciar()
+    print(f"MegaAPI falsa em {args.api_url} (latência {args.latencia_ms}ms, erro {args.taxa_erro:.0%})")
+
+    app, caminho_db = preparar_ambiente(args)
+    print(f"Banco: {caminho_db} | modo: {args.modo}")
+
+    try:
+        if args.cenario in ('todos', 'outbound'):
+            bench_outbound(app, args)
+        if args.cenario in ('todos', 'inbound'):
+            bench_inbound(app, args)
+    finally:
+        api.parar()
+    print(f"\nMegaAPI falsa: {api.recebidas} requisições, {api.erros} erros simulados")
+
+if __name__ == '__main__':
+    main()
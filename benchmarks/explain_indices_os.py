@@ -0,0 +1,269 @@
+"""
+Verificação de planos (EXPLAIN) das consultas quentes de Ordens de Serviço.
+
+Executa EXPLAIN em cada consulta (as mesmas das rotas/serviços) e falha se
+alguma fizer varredura completa de ordens_servico em vez de usar um dos
+índices esperados. Serve como teste de regressão ao mexer nos filtros ou
+nos índices do model. Também percorre a fila do técnico página a página
+(OSService.fila_tecnico) e confere que as páginas reproduzem a fila inteira.
+
+- SQLite (padrão): banco temporário criado com db.create_all()
+- Postgres: --database-url postgresql://... (banco descartável; num banco
+  existente rode `flask db upgrade` antes). Roda com enable_seqscan=off,
+  pois em tabela pequena o Postgres prefere seq scan mesmo com índice.
+
+Uso:
+    python benchmarks/explain_indices_os.py [--database-url URL] [--verbose]
+
+Sai com código 1 se alguma consulta não usar índice ou a paginação divergir.
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+def consultas_quentes():
+    """(nome, query, índices aceitos) espelhando as consultas de produção."""
+    from sqlalchemy import func, literal_column
+    from app.extensions import db
+    from app.models.estoque_models import OrdemServico
+    from app.services.os_service import OSService
+
+    agora = datetime.utcnow()
+    inicio_periodo = agora - timedelta(days=30)
+
+    return [
+        (
+            'notifications.get_notifications (OS não concluídas vencendo)',
+            OrdemServico.query.filter(
+                OrdemServico.status != literal_column("'concluida'"),
+                OrdemServico.prazo_conclusao <= agora + timedelta(hours=24)
+            ).order_by(OrdemServico.prazo_conclusao),
+            {'ix_ordens_servico_nao_concluidas_prazo'}
+        ),
+        (
+            'ponto.index alertas (abertas por prazo, top 5)',
+            OrdemServico.query.filter(
+                OrdemServico.status == 'aberta',
+                OrdemServico.prazo_conclusao != None,
+                OrdemServico.prazo_conclusao <= agora + timedelta(hours=24)
+            ).order_by(OrdemServico.prazo_conclusao).limit(5),
+            {'ix_ordens_servico_status_prazo'}
+        ),
+        (
+            'OSService.fila_tecnico (primeira página)',
+            OSService.consulta_fila_tecnico(1).limit(21),
+            {'ix_ordens_servico_tecnico_fila'}
+        ),
+        (
+            'OSService.fila_tecnico (cursor nas abertas)',
+            OSService.consulta_fila_tecnico(1, '0.2.500').limit(21),
+            {'ix_ordens_servico_tecnico_fila', 'ix_ordens_servico_tecnico_status_conclusao'}
+        ),
+        (
+            'OSService.fila_tecnico (cursor nas encerradas)',
+            OSService.consulta_fila_tecnico(1, '1.1.9').limit(21),
+            {'ix_ordens_servico_tecnico_fila', 'ix_ordens_servico_tecnico_status_conclusao'}
+        ),
+        (
+            'painel pendências do técnico',
+            db.session.query(func.count(OrdemServico.id)).filter_by(tecnico_id=1, status='aberta'),
+            {'ix_ordens_servico_tecnico_status_conclusao'}
+        ),
+        (
+            'ponto.index minhas_os (admin, 20 mais recentes)',
+            OrdemServico.query.order_by(OrdemServico.data_abertura.desc()).limit(20),
+            {'ix_ordens_servico_data_abertura'}
+        ),
+        (
+            'admin.dashboard MTTR corretivas',
+            OrdemServico.query.filter(
+                OrdemServico.status == 'concluida',
+                OrdemServico.tipo_manutencao == 'corretiva',
+                OrdemServico.data_conclusao != None
+            ),
+            {'ix_ordens_servico_status_conclusao', 'ix_ordens_servico_status_prazo'}
+        ),
+        (
+            'AnalyticsService.get_kpi_geral MTTR (por unidade)',
+            db.session.query(func.avg(OrdemServico.data_conclusao - OrdemServico.data_abertura)).filter(
+                OrdemServico.status == 'concluida',
+                OrdemServico.data_conclusao.isnot(None),
+                OrdemServico.data_abertura >= inicio_periodo,
+                OrdemServico.unidade_id == 1
+            ),
+            {'ix_ordens_servico_status_conclusao', 'ix_ordens_servico_unidade_abertura',
+             'ix_ordens_servico_data_abertura', 'ix_ordens_servico_status_prazo'}
+        ),
+        (
+            'AnalyticsService.get_kpi_geral total_os (período)',
+            db.session.query(func.count(OrdemServico.id)).filter(OrdemServico.data_abertura >= inicio_periodo),
+            {'ix_ordens_servico_data_abertura'}
+        ),
+        (
+            'AnalyticsService.get_kpi_geral backlog crítico',
+            db.session.query(func.count(OrdemServico.id)).filter(
+                OrdemServico.status == 'aberta',
+                OrdemServico.data_abertura <= agora - timedelta(days=7)
+            ),
+            {'ix_ordens_servico_status_prazo', 'ix_ordens_servico_status_conclusao',
+             'ix_ordens_servico_data_abertura'}
+        ),
+        (
+            'AnalyticsService produtividade por técnico',
+            OrdemServico.query.filter(
+                OrdemServico.tecnico_id == 1,
+                OrdemServico.status == 'concluida',
+                OrdemServico.data_conclusao >= inicio_periodo,
+                OrdemServico.data_conclusao <= agora
+            ),
+            {'ix_ordens_servico_tecnico_status_conclusao'}
+        ),
+    ]
+
+# ---- Paginação da fila do técnico ----
+
+def verificar_paginacao_fila(por_pagina=7):
+    """
+    Percorre a fila de um técnico página a página (cursor devolvido por
+    OSService.fila_tecnico) e compara com a fila inteira numa consulta só.
+    Retorna o número de falhas. Os dados semeados são descartados (rollback).
+    """
+    from app.extensions import db
+    from app.models.models import Unidade, Usuario
+    from app.models.estoque_models import OrdemServico
+    from app.services.os_service import OSService
+
+    unidade = Unidade(nome='Explain fila', faixa_ip_permitida='127.0.0.1')
+    tecnico = Usuario(nome='Técnico fila', username='explain_fila', senha_hash='x', tipo='tecnico')
+    db.session.add_all([unidade, tecnico])
+    db.session.flush()
+
+    prioridades = ('baixa', 'media', 'alta', 'urgente')
+    status = ('aberta', 'em_andamento', 'concluida', 'cancelada')
+    prazo = datetime.utcnow() + timedelta(days=1)
+    db.session.add_all([OrdemServico(
+        numero_os=f"EXPL-{i}", tecnico_id=tecnico.id, unidade_id=unidade.id,
+        tipo_manutencao='corretiva', descricao_problema='fila', prazo_conclusao=prazo,
+        prioridade=prioridades[i % 4], status=status[(i // 3) % 4]
+    ) for i in range(45)])
+    db.session.flush()
+
+    esperado = [o.id for o in OSService.consulta_fila_tecnico(tecnico.id).all()]
+    obtido, cursor, paginas = [], None, 0
+    while True:
+        ordens, cursor = OSService.fila_tecnico(tecnico.id, cursor, por_pagina)
+        obtido.extend(o.id for o in ordens)
+        paginas += 1
+        if cursor is None or paginas > len(esperado):
+            break
+
+    ok = obtido == esperado and paginas > 1
+    print(f"[{'OK' if ok else 'FALHOU'}] OSService.fila_tecnico paginação por cursor: "
+          f"{paginas} páginas, {len(obtido)}/{len(esperado)} OS na ordem esperada")
+    return 0 if ok else 1
+
+# ---- EXPLAIN ----
+
+class CapturaExplain:
+    """Prefixa o próximo statement com EXPLAIN (parâmetros processados pelo próprio SQLAlchemy)."""
+
+    def __init__(self, prefixo):
+        self.prefixo = prefixo
+        self.ativo = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.ativo:
+            statement = f"{self.prefixo} {statement}"
+        return statement, parameters
+
+def analisar_plano(dialeto, linhas, aceitos):
+    """Retorna (ok, índices usados, texto do plano)."""
+    if dialeto == 'sqlite':
+        detalhes = [str(linha[-1]) for linha in linhas]
+        usados = set()
+        varredura = False
+        for detalhe in detalhes:
+            achado = re.search(r'USING (?:COVERING )?INDEX (\w+)', detalhe)
+            if 'ordens_servico' not in detalhe:
+                continue
+            if achado:
+                usados.add(achado.group(1))
+            elif detalhe.startswith('SCAN'):
+                varredura = True
+    else:
+        detalhes = [str(linha[0]) for linha in linhas]
+        usados = set()
+        varredura = False
+        for detalhe in detalhes:
+            usados.update(re.findall(r'(?:Index Scan|Index Only Scan) using (\w+)', detalhe))
+            usados.update(re.findall(r'Bitmap Index Scan on (\w+)', detalhe))
+            if 'Seq Scan on ordens_servico' in detalhe:
+                varredura = True
+
+    ok = not varredura and bool(usados & aceitos)
+    return ok, usados, '\n'.join(detalhes)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--database-url', default=None, help='Padrão: SQLite temporário')
+    ap.add_argument('--verbose', action='store_true', help='Mostra o plano de todas as consultas')
+    args = ap.parse_args()
+
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        caminho = os.path.join(tempfile.mkdtemp(prefix='explain_os_'), 'explain.db')
+        os.environ['DATABASE_URL'] = f"sqlite:///{caminho}"
+
+    from sqlalchemy import event, text
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        dialeto = db.engine.dialect.name
+        captura = CapturaExplain('EXPLAIN QUERY PLAN' if dialeto == 'sqlite' else 'EXPLAIN')
+        event.listen(db.engine, 'before_cursor_execute', captura, retval=True)
+
+        if dialeto == 'sqlite':
+            db.session.execute(text('ANALYZE'))
+        else:
+            db.session.execute(text('ANALYZE ordens_servico'))
+            db.session.execute(text('SET LOCAL enable_seqscan = off'))
+
+        falhas = 0
+        try:
+            for nome, query, aceitos in consultas_quentes():
+                captura.ativo = True
+                try:
+                    linhas = db.session.execute(query.statement).all()
+                finally:
+                    captura.ativo = False
+
+                ok, usados, plano = analisar_plano(dialeto, linhas, aceitos)
+                print(f"[{'OK' if ok else 'FALHOU'}] {nome}: {', '.join(sorted(usados)) or 'sem índice'}")
+                if not ok:
+                    falhas += 1
+                if not ok or args.verbose:
+                    print('    ' + plano.replace('\n', '\n    '))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', captura)
+            db.session.rollback()
+
+        try:
+            falhas += verificar_paginacao_fila()
+        finally:
+            db.session.rollback()
+
+    print(f"\n{dialeto}: {falhas} falha(s)")
+    sys.exit(1 if falhas else 0)
+
+if __name__ == '__main__':
+    main()
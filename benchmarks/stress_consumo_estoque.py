@@ -0,0 +1,177 @@
+"""
+Teste de concorrência da baixa de estoque (EstoqueService.consumir_item).
+
+Vários workers em paralelo consomem a mesma peça na mesma unidade, com mais
+tentativas do que saldo disponível. Verifica que não há venda a descoberto:
+- consumos aceitos * quantidade <= saldo inicial
+- saldo final da unidade = saldo inicial - consumido (nunca negativo)
+- movimentações de consumo e saldo global (Estoque.quantidade_atual) batem
+
+Relata consumos/s e latência p50/p95/p99.
+
+- SQLite (padrão): banco temporário. As escritas são serializadas pelo próprio
+  SQLite; o teste valida a lógica, não a escala.
+- Postgres: --database-url postgresql://... (banco descartável) para
+  concorrência real entre conexões.
+
+Uso:
+    python benchmarks/stress_consumo_estoque.py [--workers 32] [--tentativas 2000]
+        [--saldo 500] [--quantidade 1] [--database-url URL]
+
+Sai com código 1 se algum invariante falhar.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, int(round(p / 100 * (len(ordenados) - 1)))))
+    return ordenados[k]
+
+def preparar_ambiente(args):
+    """Banco (SQLite temporário ou --database-url), Redis falso se disponível e app."""
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        caminho = os.path.join(tempfile.mkdtemp(prefix='stress_estoque_'), 'stress.db')
+        os.environ['DATABASE_URL'] = f"sqlite:///{caminho}"
+
+    try:
+        import fakeredis
+        import redis
+        servidor = fakeredis.FakeServer()
+        redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(server=servidor)
+    except ImportError:
+        print("fakeredis não instalado: caches/feed vão registrar 'Redis Unavailable' (não afeta o teste)")
+
+    from app import create_app
+    from app.extensions import db
+
+    app = create_app()
+    app.celery.conf.CELERY_ALWAYS_EAGER = True
+    app.celery.conf.CELERY_EAGER_PROPAGATES_EXCEPTIONS = False
+    with app.app_context():
+        db.create_all()
+    return app
+
+def semear(app, args):
+    """Unidade, técnico, peça com saldo inicial e OS abertas para consumir."""
+    from datetime import datetime, timedelta
+    from app.extensions import db
+    from app.models.models import Unidade, Usuario
+    from app.models.estoque_models import Estoque, EstoqueSaldo, OrdemServico
+
+    sufixo = str(int(time.time()))
+    with app.app_context():
+        unidade = Unidade(nome=f"Stress {sufixo}", faixa_ip_permitida='127.0.0.1')
+        tecnico = Usuario(nome='Técnico Stress', username=f"stress{sufixo}", senha_hash='x', tipo='tecnico')
+        saldo = Decimal(args.saldo)
+        peca = Estoque(codigo=f"STR{sufixo}"[:20], nome='Peça de stress', unidade_medida='un', quantidade_atual=saldo)
+        db.session.add_all([unidade, tecnico, peca])
+        db.session.flush()
+
+        db.session.add(EstoqueSaldo(estoque_id=peca.id, unidade_id=unidade.id, quantidade=saldo))
+        ordens = [OrdemServico(
+            numero_os=f"S{sufixo}-{i}"[:20], tecnico_id=tecnico.id, unidade_id=unidade.id,
+            tipo_manutencao='corretiva', descricao_problema='stress', status='aberta',
+            prazo_conclusao=datetime.utcnow() + timedelta(days=1)
+        ) for i in range(args.ordens)]
+        db.session.add_all(ordens)
+        db.session.commit()
+        return unidade.id, tecnico.id, peca.id, [o.id for o in ordens]
+
+def verificar(app, args, unidade_id, peca_id, aceitos):
+    from app.extensions import db
+    from app.models.estoque_models import Estoque, EstoqueSaldo, MovimentacaoEstoque
+
+    inicial = Decimal(args.saldo)
+    consumido = Decimal(args.quantidade) * aceitos
+    with app.app_context():
+        saldo = EstoqueSaldo.query.filter_by(estoque_id=peca_id, unidade_id=unidade_id).one().quantidade
+        global_ = db.session.get(Estoque, peca_id).quantidade_atual
+        movimentado = db.session.query(db.func.coalesce(db.func.sum(MovimentacaoEstoque.quantidade), 0)).filter(
+            MovimentacaoEstoque.estoque_id == peca_id,
+            MovimentacaoEstoque.tipo_movimentacao == 'consumo'
+        ).scalar()
+
+    checagens = [
+        ('consumido <= saldo inicial', consumido <= inicial, f"{consumido} <= {inicial}"),
+        ('saldo da unidade não negativo', saldo >= 0, f"{saldo}"),
+        ('saldo da unidade = inicial - consumido', saldo == inicial - consumido, f"{saldo} = {inicial - consumido}"),
+        ('movimentações de consumo = consumido', Decimal(movimentado) == consumido, f"{movimentado} = {consumido}"),
+        ('saldo global = inicial - consumido', global_ == inicial - consumido, f"{global_} = {inicial - consumido}"),
+    ]
+    # Com mais demanda que saldo, o estoque tem que ter sido esgotado
+    if args.tentativas * args.quantidade >= args.saldo:
+        checagens.append(('saldo esgotado', inicial - consumido < Decimal(args.quantidade), f"restante {inicial - consumido}"))
+
+    falhas = 0
+    for nome, ok, detalhe in checagens:
+        print(f"[{'OK' if ok else 'FALHOU'}] {nome}: {detalhe}")
+        falhas += not ok
+    return falhas
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--workers', type=int, default=32)
+    ap.add_argument('--tentativas', type=int, default=2000)
+    ap.add_argument('--saldo', type=int, default=500)
+    ap.add_argument('--quantidade', type=int, default=1)
+    ap.add_argument('--ordens', type=int, default=20, help='OS abertas entre as quais os consumos se distribuem')
+    ap.add_argument('--database-url', default=None, help='Padrão: SQLite temporário')
+    args = ap.parse_args()
+
+    app = preparar_ambiente(args)
+    unidade_id, tecnico_id, peca_id, ordens = semear(app, args)
+
+    from app.extensions import db
+    from app.services.estoque_service import EstoqueService
+
+    contagem = {'aceitos': 0, 'recusados': 0, 'erros': 0}
+    latencias = []
+    lock = threading.Lock()
+
+    def consumir(i):
+        with app.app_context():
+            t0 = time.perf_counter()
+            try:
+                EstoqueService.consumir_item(ordens[i % len(ordens)], peca_id, args.quantidade, tecnico_id)
+                resultado = 'aceitos'
+            except ValueError:
+                resultado = 'recusados'
+            except Exception as e:
+                db.session.rollback()
+                resultado = 'erros'
+                print(f"erro inesperado: {e}")
+            duracao = time.perf_counter() - t0
+        with lock:
+            contagem[resultado] += 1
+            latencias.append(duracao)
+
+    print(f"{args.workers} workers, {args.tentativas} tentativas de {args.quantidade} un. sobre saldo {args.saldo}")
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        list(executor.map(consumir, range(args.tentativas)))
+    duracao = time.perf_counter() - inicio
+
+    print(f"\naceitos/recusados/erros: {contagem['aceitos']} / {contagem['recusados']} / {contagem['erros']}")
+    print(f"vazão:              {args.tentativas / duracao if duracao else 0:.1f} ops/s ({duracao:.2f}s)")
+    print(f"latência p50/p95/p99: {percentil(latencias, 50) * 1000:.1f} / "
+          f"{percentil(latencias, 95) * 1000:.1f} / {percentil(latencias, 99) * 1000:.1f} ms\n")
+
+    falhas = verificar(app, args, unidade_id, peca_id, contagem['aceitos'])
+    sys.exit(1 if falhas or contagem['erros'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -23,4 +23,51 @@ class Config:
     
     FERNET_KEY = os.environ.get('FERNET_KEY') or '00000000000000000000000000000000'
     
-    CELERY_IMPORTS = ('app.tasks',)
\ No newline at end of file
+    CELERY_IMPORTS = ('app.tasks',)
+    
+    # Filas particionadas do inbound WhatsApp (um worker com -c 1 por partição)
+    WHATSAPP_INBOUND_PARTICOES = int(os.environ.get('WHATSAPP_INBOUND_PARTICOES', 8))
+    
+    # Faixas de envio (urgente/normal/lote). Chamadas diretas a .delay caem na normal.
+    CELERY_ROUTES = {
+        'app.tasks.whatsapp_tasks.enviar_whatsapp_task': {'queue': 'whatsapp_normal'},
+    }
+    # Um envio por vez por processo: evita que um worker reserve uma rajada de lote
+    CELERYD_PREFETCH_MULTIPLIER = 1
+    
+    # Arquivamento do historico_notificacoes (gzip JSONL por mês)
+    ARQUIVO_HISTORICO_DIR = os.environ.get('ARQUIVO_HISTORICO_DIR')  # Padrão: instance/arquivo_historico
+    ARQUIVO_HISTORICO_DIAS = int(os.environ.get('ARQUIVO_HISTORICO_DIAS', 90))
+    
+    # Instrumentação de SQL (app/utils/perf.py)
+    SQL_SLOW_QUERY_MS = int(os.environ.get('SQL_SLOW_QUERY_MS', 200))
+    PERF_N_MAIS_1_LIMIAR = int(os.environ.get('PERF_N_MAIS_1_LIMIAR', 5))  # Mesmo statement N vezes no request
+    PERF_HISTORICO = 200  # Requests guardados por processo para /admin/perf
+    PERF_SERVER_TIMING = True
+    
+    # /metrics: se definido, exige "Authorization: Bearer <token>"
+    # (agregação multiprocesso: variável de ambiente PROMETHEUS_MULTIPROC_DIR)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Feed de alertas (/api/notifications e SSE em /api/notifications/stream)
+    ALERTAS_OS_LIMITE = int(os.environ.get('ALERTAS_OS_LIMITE', 50))
+    # Agenda de prazos: antecedência do evento 'aviso' (horas antes do prazo)
+    PRAZO_AVISO_OS_HORAS = int(os.environ.get('PRAZO_AVISO_OS_HORAS', 24))
+    PRAZO_AVISO_CHAMADO_HORAS = int(os.environ.get('PRAZO_AVISO_CHAMADO_HORAS', 48))
+    
+    # Check-in por IP (app/utils/ip_allowlist.py)
+    # Proxies cujo X-Forwarded-For é aceito (CIDRs separados por vírgula); padrão: só loopback.
+    # Atrás de um balanceador, configure a faixa dele aqui (ex.: 10.0.5.0/24)
+    TRUSTED_PROXIES = os.environ.get('TRUSTED_PROXIES')
+    IP_ALLOWLIST_TTL = int(os.environ.get('IP_ALLOWLIST_TTL', 60))  # Segundos até recompilar a faixa da unidade
+    IP_ALLOWLIST_PERMITIR_LOCALHOST = os.environ.get('IP_ALLOWLIST_PERMITIR_LOCALHOST', 'true').lower() == 'true'
+    # Movimentação de estoque em lote (/os/api/estoque/lote)
+    ESTOQUE_LOTE_MAX = int(os.environ.get('ESTOQUE_LOTE_MAX', 5000))
+    # Folha de ponto (app/services/timesheet_service.py)
+    TIMESHEET_FUSO_HORAS = int(os.environ.get('TIMESHEET_FUSO_HORAS', -3))  # Registros em UTC; dia = dia local do início do turno
+    TIMESHEET_JORNADA_HORAS = float(os.environ.get('TIMESHEET_JORNADA_HORAS', 8.0))
+    TIMESHEET_MIN_HORAS = float(os.environ.get('TIMESHEET_MIN_HORAS', 7.8))  # Abaixo: insuficiente
+    TIMESHEET_MAX_HORAS = float(os.environ.get('TIMESHEET_MAX_HORAS', 8.5))  # Acima: extra
+    TIMESHEET_CACHE_TTL = 30 * 86400  # Meses fechados
+    SSE_MAX_SEGUNDOS = int(os.environ.get('SSE_MAX_SEGUNDOS', 300))  # Depois disso o EventSource reconecta
+    SSE_HEARTBEAT_SEGUNDOS = 15
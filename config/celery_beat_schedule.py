@@ -12,5 +12,25 @@ CELERYBEAT_SCHEDULE = {
     'agregar-metricas': {
         'task': 'app.tasks.whatsapp_tasks.agregar_metricas_horarias',
         'schedule': crontab(minute=5, hour='*'),  # xx:05
+    },
+    'reconciliar-backlog-whatsapp': {
+        'task': 'app.tasks.whatsapp_tasks.reconciliar_backlog_whatsapp',
+        'schedule': crontab(minute=30, hour='*'),  # xx:30
+    },
+    'arquivar-historico-notificacoes': {
+        'task': 'app.tasks.whatsapp_tasks.arquivar_historico_notificacoes',
+        'schedule': crontab(minute=15, hour=3),  # Diário às 03:15
+    },
+    'processar-prazos': {
+        'task': 'app.tasks.system_tasks.processar_prazos_task',
+        'schedule': crontab(minute='*'),  # Eventos de prazo (aviso/atraso) de OS e chamados
+    },
+    'reconstruir-agenda-prazos': {
+        'task': 'app.tasks.system_tasks.reconstruir_agenda_prazos_task',
+        'schedule': crontab(minute=45, hour=3),  # Diário às 03:45
+    },
+    'reconciliar-estoque': {
+        'task': 'app.tasks.system_tasks.reconciliar_estoque_task',
+        'schedule': crontab(minute=15, hour=4),  # Diário às 04:15 (só relata divergências)
     }
 }
@@ -0,0 +1,41 @@
+# Configuração do gunicorn.
+# Uso: PROMETHEUS_MULTIPROC_DIR=/tmp/gmm_metrics gunicorn -c gunicorn.conf.py run:app
+import glob
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+# Threads: cada aba aberta mantém uma conexão SSE (/api/notifications/stream)
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+timeout = 60
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Existe, mas é de outro usuário
+    return True
+
+def on_starting(server):
+    # Métricas multiprocesso: o diretório é compartilhado com os workers Celery.
+    # Remove só os arquivos de processos que já morreram (workers gunicorn de
+    # execuções anteriores); os .db de workers Celery vivos ficam intactos.
+    caminho = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if caminho:
+        os.makedirs(caminho, exist_ok=True)
+        for arquivo in glob.glob(os.path.join(caminho, '*.db')):
+            pid = os.path.basename(arquivo)[:-3].rsplit('_', 1)[-1]
+            if pid.isdigit() and not _processo_vivo(int(pid)):
+                try:
+                    os.remove(arquivo)
+                except OSError:
+                    pass
+
+def child_exit(server, worker):
+    # Remove os gauges "live" do worker que saiu
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
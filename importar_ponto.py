@@ -0,0 +1,53 @@
+"""
+Importação em massa de registros de ponto (histórico de relógios/planilhas).
+
+Uso:
+    python importar_ponto.py registros.csv [--formato csv|jsonl] [--lote 5000]
+        [--fuso -3] [--erros rejeitados.csv] [--validar]
+
+Colunas: usuario_id ou username; unidade_id ou unidade; entrada; saida;
+ip, latitude, longitude, observacoes (opcionais). Horários sem fuso são
+interpretados com --fuso (horas em relação ao UTC; padrão TIMESHEET_FUSO_HORAS).
+"""
+import argparse
+import sys
+from app import create_app, db
+from app.services.ponto_import_service import PontoImportService
+
+ap = argparse.ArgumentParser()
+ap.add_argument('arquivo')
+ap.add_argument('--formato', choices=['csv', 'jsonl'], default=None, help='Padrão: pela extensão')
+ap.add_argument('--lote', type=int, default=PontoImportService.LOTE)
+ap.add_argument('--fuso', type=int, default=None, help='Fuso dos horários sem offset (padrão: TIMESHEET_FUSO_HORAS)')
+ap.add_argument('--erros', default=None, help='Grava todas as linhas rejeitadas neste CSV')
+ap.add_argument('--validar', action='store_true', help='Só valida (nada é gravado)')
+args = ap.parse_args()
+
+formato = args.formato or ('jsonl' if args.arquivo.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+
+app = create_app()
+
+with app.app_context():
+    fuso = app.config['TIMESHEET_FUSO_HORAS'] if args.fuso is None else args.fuso
+    print(f"Importando {args.arquivo} ({formato}, lotes de {args.lote}, fuso {fuso:+d}h)...")
+    saida_erros = open(args.erros, 'w', newline='', encoding='utf-8') if args.erros else None
+    try:
+        with open(args.arquivo, newline='', encoding='utf-8-sig') as arquivo:
+            resumo = PontoImportService.importar(
+                arquivo, formato=formato, lote=args.lote, fuso_horas=fuso,
+                validar_apenas=args.validar, erros_saida=saida_erros
+            )
+    finally:
+        if saida_erros:
+            saida_erros.close()
+
+    acao = 'válidas' if args.validar else 'importadas'
+    print(f"Linhas lidas: {resumo['lidas']} | {acao}: {resumo['importadas']} | rejeitadas: {resumo['rejeitadas']} "
+          f"| {resumo['segundos']}s")
+    if resumo.get('interrompido'):
+        print(f"Leitura interrompida após a linha {resumo['lidas']}: {resumo['interrompido']}")
+    for linha, erro in resumo['erros'][:20]:
+        print(f"  linha {linha}: {erro}")
+    if resumo['rejeitadas'] > 20:
+        print(f"  ... (veja {args.erros})" if args.erros else "  ... (use --erros para o relatório completo)")
+    sys.exit(1 if resumo['rejeitadas'] and not resumo['importadas'] else 0)
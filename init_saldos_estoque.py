@@ -1,6 +1,7 @@
 from app import create_app, db
 from app.models.estoque_models import Estoque, EstoqueSaldo
 from app.models.models import Unidade
+from app.services.estoque_service import EstoqueService
 
 app = create_app()
 
@@ -48,4 +49,11 @@ with app.app_context():
     else:
         print("\nNenhum item precisou de migração (todos já possuem saldo definido).")
 
+    # 4. Movimentações de abertura: o ledger passa a explicar os saldos (idempotente)
+    try:
+        resultado = EstoqueService.abrir_saldos_ledger()
+        print(f"Aberturas registradas no ledger: {resultado['aberturas']}")
+    except ValueError as e:
+        print(f"ERRO: {e}")
+
     print("Script finalizado.")
\ No newline at end of file
@@ -0,0 +1,57 @@
+"""Indices do backlog de notificacoes
+
+Revision ID: c3a7e1f04d21
+Revises: b11566da95ba
+Create Date: 2026-10-19 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a7e1f04d21'
+down_revision = 'b11566da95ba'
+branch_labels = None
+depends_on = None
+
+
+TABELA = 'historico_notificacoes'
+
+
+def _indices_existentes():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABELA):
+        return None
+    return {ix['name'] for ix in inspector.get_indexes(TABELA)}
+
+
+def upgrade():
+    existentes = _indices_existentes()
+    if existentes is None:
+        # Tabela criada via db.create_all() já nasce com os índices do model
+        return
+
+    if 'ix_historico_notificacoes_pendentes' not in existentes:
+        op.create_index(
+            'ix_historico_notificacoes_pendentes', TABELA, ['criado_em'],
+            unique=False,
+            sqlite_where=sa.text("status_envio = 'pendente'"),
+            postgresql_where=sa.text("status_envio = 'pendente'")
+        )
+    if 'ix_historico_notificacoes_direcao_criado' not in existentes:
+        op.create_index('ix_historico_notificacoes_direcao_criado', TABELA, ['direcao', 'criado_em'], unique=False)
+    if 'ix_historico_notificacoes_status_enviado' not in existentes:
+        op.create_index('ix_historico_notificacoes_status_enviado', TABELA, ['status_envio', 'enviado_em'], unique=False)
+
+
+def downgrade():
+    existentes = _indices_existentes()
+    if existentes is None:
+        return
+
+    for nome in ('ix_historico_notificacoes_status_enviado',
+                 'ix_historico_notificacoes_direcao_criado',
+                 'ix_historico_notificacoes_pendentes'):
+        if nome in existentes:
+            op.drop_index(nome, table_name=TABELA)
@@ -0,0 +1,64 @@
+"""Indices das consultas de OS (prazos e filtros)
+
+Revision ID: d84b2c6e9a17
+Revises: c3a7e1f04d21
+Create Date: 2026-10-19 14:03:27.551904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd84b2c6e9a17'
+down_revision = 'c3a7e1f04d21'
+branch_labels = None
+depends_on = None
+
+
+TABELA = 'ordens_servico'
+
+INDICES = [
+    ('ix_ordens_servico_status_prazo', ['status', 'prazo_conclusao']),
+    ('ix_ordens_servico_tecnico_status_conclusao', ['tecnico_id', 'status', 'data_conclusao']),
+    ('ix_ordens_servico_status_conclusao', ['status', 'data_conclusao']),
+    ('ix_ordens_servico_data_abertura', ['data_abertura']),
+    ('ix_ordens_servico_unidade_abertura', ['unidade_id', 'data_abertura']),
+]
+
+
+def _indices_existentes():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABELA):
+        return None
+    return {ix['name'] for ix in inspector.get_indexes(TABELA)}
+
+
+def upgrade():
+    existentes = _indices_existentes()
+    if existentes is None:
+        # Tabela criada via db.create_all() já nasce com os índices do model
+        return
+
+    if 'ix_ordens_servico_nao_concluidas_prazo' not in existentes:
+        op.create_index(
+            'ix_ordens_servico_nao_concluidas_prazo', TABELA, ['prazo_conclusao'],
+            unique=False,
+            sqlite_where=sa.text("status <> 'concluida'"),
+            postgresql_where=sa.text("status <> 'concluida'")
+        )
+    for nome, colunas in INDICES:
+        if nome not in existentes:
+            op.create_index(nome, TABELA, colunas, unique=False)
+
+
+def downgrade():
+    existentes = _indices_existentes()
+    if existentes is None:
+        return
+
+    for nome, _ in reversed(INDICES):
+        if nome in existentes:
+            op.drop_index(nome, table_name=TABELA)
+    if 'ix_ordens_servico_nao_concluidas_prazo' in existentes:
+        op.drop_index('ix_ordens_servico_nao_concluidas_prazo', table_name=TABELA)
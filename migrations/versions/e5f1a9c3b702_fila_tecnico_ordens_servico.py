@@ -0,0 +1,66 @@
+"""Fila do tecnico: prioridade_nivel, encerrada e indice
+
+Revision ID: e5f1a9c3b702
+Revises: d84b2c6e9a17
+Create Date: 2026-10-19 16:41:08.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5f1a9c3b702'
+down_revision = 'd84b2c6e9a17'
+branch_labels = None
+depends_on = None
+
+
+TABELA = 'ordens_servico'
+INDICE = 'ix_ordens_servico_tecnico_fila'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABELA):
+        # Tabela criada via db.create_all() já nasce com as colunas e o índice do model
+        return
+
+    colunas = {c['name'] for c in inspector.get_columns(TABELA)}
+    with op.batch_alter_table(TABELA) as batch_op:
+        if 'prioridade_nivel' not in colunas:
+            batch_op.add_column(sa.Column('prioridade_nivel', sa.SmallInteger(), nullable=False, server_default='1'))
+        if 'encerrada' not in colunas:
+            batch_op.add_column(sa.Column('encerrada', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    # Backfill (novas gravações são mantidas pelo listener sincronizar_ordenacao_os)
+    op.execute(
+        "UPDATE ordens_servico SET prioridade_nivel = CASE prioridade "
+        "WHEN 'baixa' THEN 0 WHEN 'alta' THEN 2 WHEN 'urgente' THEN 3 ELSE 1 END"
+    )
+    ordens = sa.table('ordens_servico', sa.column('status', sa.String), sa.column('encerrada', sa.Boolean))
+    op.execute(ordens.update().values(
+        encerrada=sa.case((ordens.c.status.in_(['concluida', 'cancelada']), sa.true()), else_=sa.false())
+    ))
+
+    if INDICE not in {ix['name'] for ix in inspector.get_indexes(TABELA)}:
+        op.create_index(
+            INDICE, TABELA,
+            ['tecnico_id', 'encerrada', sa.text('prioridade_nivel DESC'), sa.text('id DESC')],
+            unique=False
+        )
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(TABELA):
+        return
+
+    if INDICE in {ix['name'] for ix in inspector.get_indexes(TABELA)}:
+        op.drop_index(INDICE, table_name=TABELA)
+    colunas = {c['name'] for c in inspector.get_columns(TABELA)}
+    with op.batch_alter_table(TABELA) as batch_op:
+        if 'encerrada' in colunas:
+            batch_op.drop_column('encerrada')
+        if 'prioridade_nivel' in colunas:
+            batch_op.drop_column('prioridade_nivel')
@@ -0,0 +1,105 @@
+"""Ledger de estoque: movimentacoes de abertura para os saldos existentes
+
+Revision ID: f2c8d4a6b913
+Revises: e5f1a9c3b702
+Create Date: 2026-10-19 18:12:40.517203
+
+"""
+from datetime import datetime
+from decimal import Decimal
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d4a6b913'
+down_revision = 'e5f1a9c3b702'
+branch_labels = None
+depends_on = None
+
+
+OBSERVACAO = 'Saldo de abertura (ledger)'
+SINAL = "CASE WHEN {p}tipo_movimentacao IN ('consumo', 'saida') THEN -{p}quantidade ELSE {p}quantidade END"
+
+movimentacoes = sa.table(
+    'movimentacoes_estoque',
+    sa.column('estoque_id', sa.Integer),
+    sa.column('usuario_id', sa.Integer),
+    sa.column('unidade_id', sa.Integer),
+    sa.column('tipo_movimentacao', sa.String),
+    sa.column('quantidade', sa.Numeric(10, 3)),
+    sa.column('observacao', sa.String),
+    sa.column('data_movimentacao', sa.DateTime),
+)
+
+
+def _decimal(valor):
+    return Decimal(str(valor or 0)).quantize(Decimal('0.001'))
+
+
+def upgrade():
+    # Itens e saldos legados (seed_modulo2.py, init_saldos_estoque.py) não têm
+    # movimentações: a partir daqui o ledger é a fonte da verdade, então cada
+    # saldo existente ganha um 'ajuste' de abertura = saldo - movimentações.
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not all(inspector.has_table(t) for t in ('estoque', 'estoque_saldo', 'movimentacoes_estoque', 'usuarios')):
+        return
+
+    aberturas = {}
+    for estoque_id, unidade_id, diferenca in bind.execute(sa.text(
+        "SELECT s.estoque_id, s.unidade_id, s.quantidade - COALESCE(m.total, 0) "
+        "FROM estoque_saldo s LEFT JOIN ("
+        f"  SELECT estoque_id, unidade_id, SUM({SINAL.format(p='')}) AS total FROM movimentacoes_estoque "
+        "   WHERE unidade_id IS NOT NULL GROUP BY estoque_id, unidade_id"
+        ") m ON m.estoque_id = s.estoque_id AND m.unidade_id = s.unidade_id"
+    )):
+        aberturas[(estoque_id, unidade_id)] = _decimal(diferenca)
+
+    # Movimentações de unidade sem linha de saldo: o saldo vigente é zero
+    for estoque_id, unidade_id, total in bind.execute(sa.text(
+        f"SELECT m.estoque_id, m.unidade_id, SUM({SINAL.format(p='m.')}) "
+        "FROM movimentacoes_estoque m LEFT JOIN estoque_saldo s "
+        "  ON s.estoque_id = m.estoque_id AND s.unidade_id = m.unidade_id "
+        "WHERE m.unidade_id IS NOT NULL AND s.id IS NULL GROUP BY m.estoque_id, m.unidade_id"
+    )):
+        aberturas[(estoque_id, unidade_id)] = -_decimal(total)
+
+    # Global: o que as aberturas de unidade não explicam fica numa abertura sem unidade
+    das_unidades = {}
+    for (estoque_id, _), quantidade in aberturas.items():
+        das_unidades[estoque_id] = das_unidades.get(estoque_id, Decimal(0)) + quantidade
+    for estoque_id, diferenca in bind.execute(sa.text(
+        "SELECT e.id, e.quantidade_atual - COALESCE(m.total, 0) FROM estoque e LEFT JOIN ("
+        f"  SELECT estoque_id, SUM({SINAL.format(p='')}) AS total FROM movimentacoes_estoque GROUP BY estoque_id"
+        ") m ON m.estoque_id = e.id"
+    )):
+        aberturas[(estoque_id, None)] = _decimal(diferenca) - das_unidades.get(estoque_id, Decimal(0))
+
+    linhas = [(chave, quantidade) for chave, quantidade in aberturas.items() if quantidade]
+    if not linhas:
+        return
+
+    usuario_id = bind.execute(sa.text(
+        "SELECT id FROM usuarios ORDER BY CASE WHEN tipo = 'admin' THEN 0 ELSE 1 END, id LIMIT 1"
+    )).scalar()
+    if usuario_id is None:
+        raise RuntimeError("Há saldos de estoque sem movimentação, mas nenhum usuário para registrar a abertura.")
+
+    agora = datetime.utcnow()
+    op.bulk_insert(movimentacoes, [{
+        'estoque_id': estoque_id,
+        'usuario_id': usuario_id,
+        'unidade_id': unidade_id,
+        'tipo_movimentacao': 'ajuste',
+        'quantidade': quantidade,
+        'observacao': OBSERVACAO,
+        'data_movimentacao': agora,
+    } for (estoque_id, unidade_id), quantidade in sorted(linhas, key=lambda l: (l[0][0], l[0][1] or 0))])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('movimentacoes_estoque'):
+        return
+    op.execute(movimentacoes.delete().where(movimentacoes.c.observacao == OBSERVACAO))
@@ -1,6 +1,7 @@
 from decimal import Decimal
 from app import create_app, db
 from app.models.estoque_models import CategoriaEstoque, Estoque
+from app.services.estoque_service import EstoqueService
 
 app = create_app()
 
@@ -41,4 +42,10 @@ with app.app_context():
             db.session.add(item)
     
     db.session.commit()
-    print("Estoque populado com sucesso!")
\ No newline at end of file
+    print("Estoque populado com sucesso!")
+
+    # Saldo inicial vira movimentação de abertura (o ledger é a fonte da verdade dos saldos)
+    try:
+        print(f"Aberturas no ledger: {EstoqueService.abrir_saldos_ledger()['aberturas']}")
+    except ValueError as e:
+        print(f"Aberturas no ledger pendentes: {e} Depois rode init_saldos_estoque.py.")
\ No newline at end of file